@@ -32,6 +32,8 @@ const corsOptions = {
 // Use the cors middleware with our options. This will handle preflight requests.
 app.use(cors(corsOptions));
 
+// Event batches from the proctoring service are larger than the default 100kb limit
+app.use('/api/interview/proctoring-events/bulk', express.json({ limit: '5mb' }));
 app.use(express.json());
 
 
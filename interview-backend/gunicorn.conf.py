@@ -0,0 +1,24 @@
+"""gunicorn settings for the proctoring service: gunicorn -c gunicorn.conf.py proctor_api:app
+
+The master imports proctor_api once (PROCTOR_STARTUP=preload), loading the libraries
+and the OpenCV nets, and forks the workers, which share those pages copy-on-write.
+Each worker then creates its MediaPipe graphs, warms up and reports ready on GET /ready.
+"""
+import os
+
+os.environ.setdefault('PROCTOR_STARTUP', 'preload')
+os.environ.setdefault('PROCTOR_INFERENCE_WORKERS', 'auto')
+
+bind = os.environ.get('PROCTOR_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('PROCTOR_GUNICORN_WORKERS', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('PROCTOR_GUNICORN_THREADS', 32))
+preload_app = True
+# Leave room for the warm-up that runs in each worker after the fork
+timeout = int(os.environ.get('PROCTOR_GUNICORN_TIMEOUT', 60))
+
+
+def post_fork(server, worker):
+    import proctor_api
+    if proctor_api.STARTUP_MODE == 'preload':
+        proctor_api.start_worker()
@@ -0,0 +1,332 @@
+"""Offline proctoring analysis of finished recordings.
+
+Stream-decodes recordings (default: uploads/*.webm) frame by frame, samples them
+at --sample-fps and replays the samples through the /proctor infraction logic on
+the recording's own timeline. Files are spread over a pool of worker processes.
+Every finished recording is appended as one JSON line to --output, and a run
+that is started again skips the recordings already in that file.
+
+Each line has an `ingest` object with the body that
+POST /api/interview/sessions/:sessionId/complete accepts
+(terminated, terminationReason, warningCount, proctoringEventLog, ...).
+
+    python proctor_analyze.py --workers 4 --sample-fps 2
+    python proctor_analyze.py uploads/6852d9fa6a257ec790c82301-1750659770262.webm --output audit.jsonl
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Settings of the proctoring module inside worker processes: a private in-memory
+# session store, no inference threads, no session timers or event journal (recordings
+# replay past timelines) and room for every event of a long recording
+WORKER_ENV = {
+    'PROCTOR_SESSION_STORE': 'memory',
+    'PROCTOR_INFERENCE_WORKERS': '0',
+    'PROCTOR_INFERENCE_BATCH_SIZE': '1',
+    'PROCTOR_MODEL_POOL_SIZE': '1',
+    'PROCTOR_EVENT_LOG_CAP': '65535',
+    'PROCTOR_PROFILE_SLOW_MS': '0',
+    'PROCTOR_SESSION_TIMERS': '0',
+    'PROCTOR_EVENT_JOURNAL_DIR': '',
+}
+
+# Statuses that are final; recordings with any other status are retried on resume
+FINAL_STATUSES = ('done', 'no_video')
+
+# Recordings are saved as <sessionId>-<start time in ms>.webm
+RECORDING_NAME = re.compile(r'^(?P<session_id>[0-9a-fA-F]{24})-(?P<started_ms>\d{10,})\.')
+
+_api = None
+_progress = None
+
+
+def recording_identity(path):
+    """(session_id, start time in seconds) from a recording's file name. Unknown names give no
+    session id and the file's modification time."""
+    match = RECORDING_NAME.match(os.path.basename(path))
+    if match is None:
+        return None, os.path.getmtime(path)
+    return match.group('session_id'), int(match.group('started_ms')) / 1000.0
+
+
+def sampled_frames(path, sample_fps):
+    """(seconds into the recording, BGR frame) at about ``sample_fps`` (0 keeps every frame).
+
+    Frames are decoded one at a time; skipped frames are only grabbed, not converted.
+    """
+    capture = cv2.VideoCapture(path)
+    try:
+        interval = 1.0 / sample_fps if sample_fps > 0 else 0.0
+        next_sample = 0.0
+        while capture.grab():
+            position = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if position + 1e-6 < next_sample:
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                break
+            next_sample = max(next_sample + interval, position)
+            yield position, frame
+    finally:
+        capture.release()
+
+
+def _init_worker(progress, env):
+    global _api, _progress
+    os.environ.update(env)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    import proctor_api
+    _api = proctor_api
+    _progress = progress
+
+
+def _report(name, state, frames=0, position=0.0):
+    if _progress is not None:
+        _progress.put({'recording': name, 'state': state, 'frames': frames, 'seconds': round(position, 2)})
+
+
+def analyze_recording(path, sample_fps):
+    """Replay one recording through the infraction logic (runs in a worker process)"""
+    name = os.path.basename(path)
+    session_id, started_at = recording_identity(path)
+    analysis_id = f'analysis:{os.getpid()}:{name}'
+    started = time.perf_counter()
+    frames = 0
+    position = 0.0
+    result = None
+    _report(name, 'running')
+    try:
+        for position, frame in sampled_frames(path, sample_fps):
+            frame_time = started_at + position
+            result = _api.evaluate_frame(analysis_id, frame, None, frames, frame_time, frame_time)
+            frames += 1
+            if frames % 25 == 0:
+                _report(name, 'running', frames, position)
+            if result['terminated']:
+                break
+        session = _api.session_store.get(analysis_id)
+        record = {
+            'recording': name,
+            'status': 'done' if frames else 'no_video',
+            'session_id': session_id,
+            'started_at': started_at,
+            'sample_fps': sample_fps,
+            'frames': frames,
+            'seconds': round(position, 2),
+            'analysis_seconds': round(time.perf_counter() - started, 2),
+        }
+        if session is not None:
+            event_log = session.event_log(include_spilled=True)
+            record['correction_window_history'] = session.correction_history(include_spilled=True)
+            record['ingest'] = {
+                'terminated': session.terminated,
+                'terminationReason': session.termination_reason,
+                'proctoringInfractions': session.infractions(include_spilled=True),
+                'warningCount': session.warning_count,
+                'proctoringEventLog': event_log,
+            }
+        _report(name, record['status'], frames, position)
+        return record
+    finally:
+        _api.session_store.delete(analysis_id)
+        if _api.frame_tracker is not None:
+            _api.frame_tracker.discard(analysis_id)
+
+
+def completed_recordings(output):
+    """Names of the recordings already analyzed in an output file"""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if record.get('status') in FINAL_STATUSES:
+                done.add(record['recording'])
+    return done
+
+
+def run_batch(paths, output, workers=1, sample_fps=2.0, on_progress=None):
+    """Analyze recordings on ``workers`` processes, appending each result to ``output``.
+
+    Recordings already finished in ``output`` are skipped. ``on_progress(event)`` is
+    called from a background thread with {'recording', 'state', 'frames', 'seconds'}.
+    Returns the number of recordings analyzed by this run.
+    """
+    done = completed_recordings(output)
+    todo = [path for path in paths if os.path.basename(path) not in done]
+    if on_progress is not None:
+        for path in paths:
+            if os.path.basename(path) in done:
+                on_progress({'recording': os.path.basename(path), 'state': 'skipped', 'frames': 0, 'seconds': 0.0})
+    if not todo:
+        return 0
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    # Workers load their own models; spawn keeps them clear of this process's threads
+    context = multiprocessing.get_context('spawn')
+    progress = context.Queue()
+
+    def forward_progress():
+        while True:
+            event = progress.get()
+            if event is None:
+                break
+            if on_progress is not None:
+                on_progress(event)
+
+    listener = threading.Thread(target=forward_progress, name='analysis-progress', daemon=True)
+    listener.start()
+    try:
+        with ProcessPoolExecutor(max(1, min(workers, len(todo))), mp_context=context,
+                                 initializer=_init_worker, initargs=(progress, WORKER_ENV)) as pool:
+            futures = {pool.submit(analyze_recording, path, sample_fps): path for path in todo}
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except Exception as e:
+                    record = {'recording': os.path.basename(futures[future]), 'status': 'error', 'error': str(e)}
+                    if on_progress is not None:
+                        on_progress({'recording': record['recording'], 'state': 'error', 'frames': 0, 'seconds': 0.0})
+                with open(output, 'a') as f:
+                    f.write(json.dumps(record) + '\n')
+    finally:
+        progress.put(None)
+        listener.join()
+    return len(todo)
+
+
+class AnalysisJob:
+    """Runs this script in a child process for the API and tracks per-recording progress.
+
+    The batch runs in its own process, so its worker processes never import the
+    service's main module and a crash cannot take the service down.
+    """
+
+    def __init__(self, job_id, paths, output, workers=1, sample_fps=2.0):
+        self.job_id = job_id
+        self.paths = list(paths)
+        self.output = output
+        self.workers = workers
+        self.sample_fps = sample_fps
+        self.status = 'queued'
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._progress = {os.path.basename(path): {'state': 'queued', 'frames': 0, 'seconds': 0.0} for path in self.paths}
+        self._thread = threading.Thread(target=self._run, name=f'analysis-{job_id}', daemon=True)
+
+    def start(self):
+        self.status = 'running'
+        self._thread.start()
+        return self
+
+    def _run(self):
+        command = [sys.executable, os.path.abspath(__file__), *self.paths, '--output', self.output,
+                   '--workers', str(self.workers), '--sample-fps', str(self.sample_fps), '--json-progress']
+        try:
+            process = subprocess.Popen(command, cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True)
+            for line in process.stdout:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                with self._lock:
+                    self._progress[event['recording']] = {'state': event['state'], 'frames': event['frames'], 'seconds': event['seconds']}
+            returncode = process.wait()
+            self.status = 'done' if returncode == 0 else 'failed'
+            if returncode != 0:
+                self.error = f'Analysis exited with status {returncode}'
+        except OSError as e:
+            self.status = 'failed'
+            self.error = str(e)
+        if self.error:
+            print(f'Recording analysis {self.job_id} failed: {self.error}')
+        self.finished_at = time.time()
+
+    def running(self):
+        return self._thread.is_alive()
+
+    def results(self):
+        """Finished records of this job's recordings, from its output file"""
+        names = set(self._progress)
+        results = []
+        if os.path.exists(self.output):
+            with open(self.output) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get('recording') in names:
+                        results.append(record)
+        return results
+
+    def to_dict(self, include_results=False):
+        with self._lock:
+            progress = {name: dict(state) for name, state in self._progress.items()}
+        job = {
+            'job_id': self.job_id,
+            'status': self.status,
+            'error': self.error,
+            'sample_fps': self.sample_fps,
+            'workers': self.workers,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'recordings': progress,
+        }
+        if include_results:
+            job['results'] = self.results()
+        return job
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline proctoring analysis of finished recordings')
+    parser.add_argument('recordings', nargs='*', help='recordings to analyze (default: uploads/*.webm)')
+    parser.add_argument('--sample-fps', type=float, default=2.0, help='frames analyzed per second of video (0 = every frame)')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2), help='worker processes')
+    parser.add_argument('--output', default='analysis-results.jsonl', help='JSON lines file results are appended to')
+    parser.add_argument('--restart', action='store_true', help='discard the output file instead of resuming from it')
+    parser.add_argument('--json-progress', action='store_true', help='print progress as JSON lines')
+    args = parser.parse_args(argv)
+
+    paths = args.recordings or sorted(glob.glob(os.path.join(BACKEND_DIR, 'uploads', '*.webm')))
+    if not paths:
+        print('No recordings to analyze.')
+        return 1
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+
+    def print_progress(event):
+        if args.json_progress:
+            print(json.dumps(event), flush=True)
+        else:
+            print(f"{event['recording']}: {event['state']} ({event['frames']} frames, {event['seconds']:.1f} s)", flush=True)
+
+    started = time.perf_counter()
+    analyzed = run_batch(paths, args.output, args.workers, args.sample_fps, print_progress)
+    if not args.json_progress:
+        print(f'Analyzed {analyzed} of {len(paths)} recordings in {time.perf_counter() - started:.1f} s; results in {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
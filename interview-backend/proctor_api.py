@@ -1,22 +1,58 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import cv2
 import numpy as np
 import base64
+import json
 from flask_cors import CORS
+from flask_sock import Sock
 import os
 import sys
 import time
 import threading
-import mediapipe as mp
-import requests
+import atexit
+import functools
+import glob
+import uuid
+from contextlib import nullcontext
 # Ensure this path is correct for your project structure
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'src')))
+from proctoring.model_pool import ModelPool
+from proctoring.batching import InferenceBatcher
+from proctoring.pipeline import DetectionPipeline, Stage
+from proctoring.debug_frames import DebugFrameBuffer
+from proctoring.session_record import SessionRecord
+from proctoring.session_store import create_session_store
+from proctoring.stream import StreamState
+from proctoring.head_pose import estimate_head_poses, face_keypoints, landmarks_array
+from proctoring.tracking import FrameTracker, roi_landmarks_to_frame
+from proctoring.normalize import InputNormalizer
+from proctoring.executor import FrameExecutor, FrameRejected
+from proctoring.frame_ring import FrameRing
+from proctoring.inference_processes import InferenceProcesses
+from proctoring.sequencing import FrameDropped, FrameSequencer, parse_frame_order
+from proctoring.metrics import ActiveSessions, MetricsRegistry
+from proctoring.profiler import SlowRequestProfiler
+from proctoring.frame_cache import FrameResultCache, dhash
+from proctoring.frame_io import IMAGE_CONTENT_TYPES, FrameTooLargeError, decode_data_url, decode_frame, jpeg_size, read_stream
+from proctoring.startup import StartupReport
+from proctoring.infractions import InfractionEngine
+from proctoring.backends import SSD_INPUTS, ModelBackend
+from proctoring.timers import SessionSubscribers, TimerWheel
+
+# --- Startup ---
+# eager: create and warm up the models at import. background: do it on a thread so the
+# server binds at once (GET /ready answers 503 until warm). preload: the importing parent
+# (gunicorn --preload, see gunicorn.conf.py) only loads the OpenCV nets and the MediaPipe
+# modules, then every forked worker calls start_worker(); MediaPipe graphs start threads,
+# so they are created after the fork.
+STARTUP_MODE = os.environ.get('PROCTOR_STARTUP', 'eager')
+startup_report = StartupReport(STARTUP_MODE)
+startup_report.mark('imports')
 
 app = Flask(__name__)
 CORS(app)
+sock = Sock(app)
 
-# Enhanced session tracking with unique issue-based warnings
-session_data = {}
 MAX_WARNINGS = 4  # Changed to 4 warnings max
 
 # Define warning types
@@ -26,76 +62,415 @@ WARNING_TYPES = {
     'PROFILE_FACE': 'profile_face'
 }
 
-# 6-point indices for pose estimation
-LANDMARK_IDXS = [1, 152, 263, 33, 61, 291]  # nose tip, chin, left eye left, right eye right, left mouth, right mouth
-MODEL_POINTS = np.array([
-    (0.0, 0.0, 0.0),        # Nose tip
-    (0.0, -63.6, -12.5),    # Chin (approximate)
-    (-43.3, 32.7, -26.0),   # Left eye left corner
-    (43.3, 32.7, -26.0),    # Right eye right corner
-    (-28.9, -28.9, -24.1),  # Left mouth corner
-    (28.9, -28.9, -24.1)    # Right mouth corner
-])
+# Change correction window duration
+CORRECTION_WINDOW_DURATION = 8  # seconds
+
+# --- Model variants ---
+# Model files are read from the backend directory (see proctoring.backends for the file names).
+# PROCTOR_SSD_VARIANT (caffe, fp16, onnx or int8) picks the SSD files, PROCTOR_DNN_BACKEND and
+# PROCTOR_DNN_TARGET where OpenCV runs them, and PROCTOR_MODEL_TIER (lite, standard or full) the
+# FaceMesh refinement and Holistic complexity. proctor_models.py compares variants on local frames.
+model_backend = ModelBackend.from_env(os.path.dirname(os.path.abspath(__file__)))
+
+# --- Model pools ---
+# Models are expensive to build, so each worker creates them on first use and hands
+# them out to one request at a time. Size the pools to the worker's thread count.
+MODEL_POOL_SIZE = int(os.environ.get('PROCTOR_MODEL_POOL_SIZE', 2))
+MODEL_WARMUP = os.environ.get('PROCTOR_MODEL_WARMUP', '1') != '0'
+# The two Caffe SSDs batch frames from concurrent sessions into one forward pass.
+# A batch closes when it is full or INFERENCE_BATCH_WAIT_MS after its first frame;
+# a batch size of 1 falls back to a plain model pool.
+INFERENCE_BATCH_SIZE = int(os.environ.get('PROCTOR_INFERENCE_BATCH_SIZE', 8))
+INFERENCE_BATCH_WAIT_MS = float(os.environ.get('PROCTOR_INFERENCE_BATCH_WAIT_MS', 4))
+# Threads that run the vision work of /proctor and /proctor-stream frames ('auto' = one per
+# core). 0 runs each frame on its request thread without any load shedding.
+INFERENCE_WORKERS = os.environ.get('PROCTOR_INFERENCE_WORKERS', '0')
+INFERENCE_WORKERS = (os.cpu_count() or 1) if INFERENCE_WORKERS == 'auto' else int(INFERENCE_WORKERS)
+MODEL_POOL_SIZE = max(MODEL_POOL_SIZE, INFERENCE_WORKERS)
+# Child processes that run the detection instead of this one (0 = none). Each loads its own
+# models and reads decoded frames in place from a shared-memory ring of PROCTOR_FRAME_RING_SLOTS
+# slots of up to PROCTOR_FRAME_SLOT_SIZE pixels (larger frames are refused with a 413).
+INFERENCE_PROCESSES = int(os.environ.get('PROCTOR_INFERENCE_PROCESSES', 0))
+FRAME_RING_SLOTS = int(os.environ.get('PROCTOR_FRAME_RING_SLOTS', max(8, 4 * INFERENCE_PROCESSES)))
+FRAME_SLOT_WIDTH, FRAME_SLOT_HEIGHT = (int(v) for v in os.environ.get('PROCTOR_FRAME_SLOT_SIZE', '1920x1080').split('x'))
+INFERENCE_PROCESS_TIMEOUT = float(os.environ.get('PROCTOR_INFERENCE_PROCESS_TIMEOUT', 10))
+inference_processes = None  # started by start_models
+
+def create_person_net():
+    return model_backend.create_ssd('person')
+
+def create_face_net():
+    return model_backend.create_ssd('face')
+
+def create_face_mesh():
+    return model_backend.create_face_mesh()
+
+def create_holistic():
+    return model_backend.create_holistic()
 
-# Load MobileNet-SSD for person detection
-PERSON_PROTO = os.path.join(os.path.dirname(__file__), 'MobileNetSSD_deploy.prototxt')
-PERSON_MODEL = os.path.join(os.path.dirname(__file__), 'MobileNetSSD_deploy.caffemodel')
-if os.path.exists(PERSON_PROTO) and os.path.exists(PERSON_MODEL):
-    person_net = cv2.dnn.readNetFromCaffe(PERSON_PROTO, PERSON_MODEL)
+def create_ssd_pool(name, factory):
+    if INFERENCE_BATCH_SIZE > 1:
+        return InferenceBatcher(name, factory, INFERENCE_BATCH_SIZE, INFERENCE_BATCH_WAIT_MS)
+    return ModelPool(name, factory, MODEL_POOL_SIZE)
+
+if model_backend.ssd_files('person') is not None:
+    person_net_pool = create_ssd_pool('person_ssd', create_person_net)
 else:
-    person_net = None
+    person_net_pool = None
     print('MobileNet-SSD model files not found. Person detection will be skipped.')
 
-# Change correction window duration
-CORRECTION_WINDOW_DURATION = 8  # seconds
-
-# Load OpenCV DNN face detector (make sure these files exist in your backend directory)
-FACE_PROTO = os.path.join(os.path.dirname(__file__), 'deploy.prototxt')
-FACE_MODEL = os.path.join(os.path.dirname(__file__), 'res10_300x300_ssd_iter_140000.caffemodel')
-if os.path.exists(FACE_PROTO) and os.path.exists(FACE_MODEL):
-    net = cv2.dnn.readNetFromCaffe(FACE_PROTO, FACE_MODEL)
+if model_backend.ssd_files('face') is not None:
+    face_net_pool = create_ssd_pool('face_ssd', create_face_net)
 else:
-    net = None
+    face_net_pool = None
     print('Face detector model files not found. Face detection will be skipped.')
 
+face_mesh_pool = ModelPool('face_mesh', create_face_mesh, MODEL_POOL_SIZE)
+holistic_pool = ModelPool('holistic', create_holistic, MODEL_POOL_SIZE)
+
+# --- Input normalization ---
+# Models see frames resized once to PROCTOR_WORKING_WIDTH (0 keeps the decoded size), converted
+# to RGB once into a reused buffer. PROCTOR_WORKING_AUDIT_RATE re-runs a share of the resized
+# frames at full resolution to measure agreement (see /input-stats).
+WORKING_WIDTH = int(os.environ.get('PROCTOR_WORKING_WIDTH', 640))
+input_normalizer = InputNormalizer(WORKING_WIDTH, float(os.environ.get('PROCTOR_WORKING_AUDIT_RATE', 0.0)))
+
+# --- Detection stages ---
+def pipeline_inputs(frame, roi=None, working_width=None):
+    """Pipeline inputs for a decoded BGR frame, optionally cropping the face models to ``roi``"""
+    return {'frame': frame, 'roi': roi, 'working_width': working_width}
+
+def normalize_frame(_, frame, roi, working_width):
+    return input_normalizer.prepare(frame, roi, working_width)
+
+def forward_blob(net, blob):
+    """Forward a single-image blob through a pooled cv2.dnn net or a batcher"""
+    if isinstance(net, InferenceBatcher):
+        return net.infer(blob)
+    net.setInput(blob)
+    return net.forward()
+
+def detect_persons(person_net, model_frame, frame):
+    """MobileNet-SSD person boxes as (startX, startY, endX, endY) in ``frame`` pixels"""
+    person_boxes = []
+    if person_net is None:
+        return (person_boxes,)
+    (h, w) = frame.shape[:2]
+    blob = cv2.dnn.blobFromImage(model_frame, SSD_INPUTS['person'][0], (300, 300), SSD_INPUTS['person'][1])
+    detections = forward_blob(person_net, blob)
+    for i in range(detections.shape[2]):
+        confidence = detections[0, 0, i, 2]
+        class_id = int(detections[0, 0, i, 1])
+        if confidence > 0.5 and class_id == 15:
+            box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
+            (startX, startY, endX, endY) = box.astype('int')
+            person_boxes.append((startX, startY, endX, endY))
+    return (person_boxes,)
+
+def detect_faces(face_net, frame):
+    """Raw res10 SSD face detections (1, 1, N, 7), or None when the model is missing"""
+    if face_net is None:
+        return (None,)
+    blob = cv2.dnn.blobFromImage(frame, SSD_INPUTS['face'][0], (300, 300), SSD_INPUTS['face'][1])
+    return (forward_blob(face_net, blob),)
+
+def run_face_mesh(face_mesh, rgb_frame):
+    return (face_mesh.process(rgb_frame).multi_face_landmarks,)
+
+def run_holistic(holistic, rgb_frame):
+    return (holistic.process(rgb_frame).pose_landmarks,)
+
+# Each stage declares what it consumes and produces; 'frame' is the decoded BGR image
+# and the other inputs come from pipeline_inputs.
+detection_pipeline = DetectionPipeline([
+    Stage('normalize', ['frame', 'roi', 'working_width'], ['model_frame', 'rgb_frame', 'face_region'], normalize_frame),
+    Stage('person_ssd', ['model_frame', 'frame'], ['person_boxes'], detect_persons, person_net_pool),
+    Stage('face_ssd', ['model_frame'], ['face_detections'], detect_faces, face_net_pool),
+    Stage('face_mesh', ['rgb_frame'], ['face_landmarks'], run_face_mesh, face_mesh_pool),
+    Stage('holistic', ['rgb_frame'], ['pose_landmarks'], run_holistic, holistic_pool),
+])
+
+# Pipeline outputs each infraction rule reads. Stages whose outputs no enabled rule
+# reads (e.g. Holistic pose) are never run or loaded.
+INFRACTION_RULES = {
+    'multiple_faces': ('person_boxes', 'face_landmarks'),
+    'profile_face': ('face_landmarks',),
+    'no_face': ('face_landmarks',),
+}
+ENABLED_RULES = [rule.strip() for rule in os.environ.get('PROCTOR_INFRACTION_RULES', ','.join(INFRACTION_RULES)).split(',') if rule.strip() in INFRACTION_RULES]
+PROCTOR_OUTPUTS = sorted({output for rule in ENABLED_RULES for output in INFRACTION_RULES[rule]})
+# Infractions start and end on k-of-n frame votes and a smoothed head pose rather than on a
+# single frame. PROCTOR_INFRACTION_THRESHOLDS is JSON in the shape of
+# proctoring.infractions.DEFAULT_THRESHOLDS, e.g. {"no_face": {"window": 5, "enter": 3}}.
+infraction_engine = InfractionEngine(json.loads(os.environ.get('PROCTOR_INFRACTION_THRESHOLDS') or '{}'), ENABLED_RULES)
+
+# --- Frame ingestion ---
+# Frames wider than PROCTOR_MAX_FRAME_WIDTH are decoded at reduced scale (0 keeps full size)
+MAX_FRAME_WIDTH = int(os.environ.get('PROCTOR_MAX_FRAME_WIDTH', 0))
+MAX_FRAME_BYTES = int(os.environ.get('PROCTOR_MAX_FRAME_BYTES', 8 * 1024 * 1024))
+
+# --- Pre-flight check (/analyze_frame) ---
+# The resource check page polls this while the candidate sets up their camera. Frames are
+# decoded at about PROCTOR_PREFLIGHT_WIDTH pixels for the shared, warm FaceMesh pool. A
+# client's frame within PROCTOR_PREFLIGHT_HASH_DISTANCE bits (of a 64-bit difference hash)
+# of its previous one reuses that answer for PROCTOR_PREFLIGHT_CACHE_TTL seconds.
+PREFLIGHT_WIDTH = int(os.environ.get('PROCTOR_PREFLIGHT_WIDTH', 320))
+preflight_cache = FrameResultCache(
+    ttl=float(os.environ.get('PROCTOR_PREFLIGHT_CACHE_TTL', 5)),
+    max_distance=int(os.environ.get('PROCTOR_PREFLIGHT_HASH_DISTANCE', 4))
+)
+
+# --- Streaming channel (/proctor-stream) ---
+# Frame interval the server asks streaming clients for, outside and inside a correction window
+STREAM_IDLE_INTERVAL_MS = int(os.environ.get('PROCTOR_STREAM_IDLE_INTERVAL_MS', 3000))
+STREAM_ACTIVE_INTERVAL_MS = int(os.environ.get('PROCTOR_STREAM_ACTIVE_INTERVAL_MS', 750))
+
+# --- Temporal tracking ---
+# With PROCTOR_TRACKING=1 full detection only runs on keyframes; frames in between reuse
+# the last detections when the scene is unchanged or run FaceMesh on a crop around the
+# last face. PROCTOR_TRACKING_AUDIT_RATE re-checks a share of those frames against full
+# detection to measure agreement (see /tracking-stats).
+if os.environ.get('PROCTOR_TRACKING', '0') == '1':
+    frame_tracker = FrameTracker(
+        keyframe_interval=int(os.environ.get('PROCTOR_TRACKING_KEYFRAME_INTERVAL', 10)),
+        diff_threshold=float(os.environ.get('PROCTOR_TRACKING_DIFF_THRESHOLD', 3.0)),
+        roi_margin=float(os.environ.get('PROCTOR_TRACKING_ROI_MARGIN', 0)),
+        audit_rate=float(os.environ.get('PROCTOR_TRACKING_AUDIT_RATE', 0.0))
+    )
+else:
+    frame_tracker = None
+
+# --- Session state ---
+# Enhanced session tracking with unique issue-based warnings. The in-process store
+# only works with a single worker process; use the redis backend to run several.
+SESSION_STORE = os.environ.get('PROCTOR_SESSION_STORE', 'memory')
+session_store = create_session_store(
+    SESSION_STORE,
+    url=os.environ.get('PROCTOR_REDIS_URL', 'redis://localhost:6379/0'),
+    idle_ttl=int(os.environ.get('PROCTOR_SESSION_IDLE_TTL', 3 * 3600)),
+    max_sessions=int(os.environ.get('PROCTOR_MAX_SESSIONS', 50000)),
+    # Events kept in memory per session; older ones are appended to a JSONL file
+    # under the spill directory (a Redis list with the redis store), or dropped
+    # (and counted) when there is nowhere to spill them
+    event_log_cap=int(os.environ.get('PROCTOR_EVENT_LOG_CAP', 512)),
+    spill_dir=os.environ.get('PROCTOR_EVENT_SPILL_DIR') or None
+)
+# Clients send the number of events they hold and get only newer ones with each frame;
+# the full history is paged through /session-events/<session_id>
+EVENT_PAGE_SIZE = int(os.environ.get('PROCTOR_EVENT_PAGE_SIZE', 100))
+EVENT_PAGE_MAX = 1000
+
+# --- Session timers ---
+# Correction windows end on a server-side timer, so a session that stops sending frames is
+# still terminated when its window runs out. With PROCTOR_SESSION_IDLE_TIMEOUT (seconds, 0 =
+# off) a session that sends no frame for that long gets a no_face correction window. Sessions
+# changed by a timer are published to session_subscribers (open streams are told at once).
+# PROCTOR_SESSION_TIMERS=0 turns the timers off (offline analysis replays past timelines).
+# A window timer that finds a frame of the session still queued or running in this worker,
+# received before the window ended, waits for it (at most PROCTOR_WINDOW_EXPIRY_GRACE_MS):
+# that frame may be the one that corrects the window.
+# Timers, in-flight frames and subscribers are per worker process. With the redis session
+# store a timer fired in one worker terminates the shared session, but a stream held by
+# another worker only hears of it with that worker's next frame or timer.
+SESSION_TIMERS = os.environ.get('PROCTOR_SESSION_TIMERS', '1') != '0'
+WINDOW_EXPIRY_GRACE = float(os.environ.get('PROCTOR_WINDOW_EXPIRY_GRACE_MS', 2000)) / 1000
+SESSION_IDLE_TIMEOUT = float(os.environ.get('PROCTOR_SESSION_IDLE_TIMEOUT', 0))
+IDLE_REASON = 'No frames received.'
+session_timers = TimerWheel(float(os.environ.get('PROCTOR_TIMER_TICK_MS', 100)) / 1000)
+session_subscribers = SessionSubscribers()
+
+# --- Event journal ---
+# With PROCTOR_EVENT_JOURNAL_DIR set, every new proctoring event is queued for a background
+# writer that appends it to segment files there, and a background sender posts the journal in
+# batches to the Node backend's bulk ingest endpoint (PROCTOR_EVENT_INGEST_URL, empty = keep the
+# journal only), authenticated with PROCTOR_INGEST_TOKEN. Undelivered events survive a restart.
+EVENT_JOURNAL_DIR = os.environ.get('PROCTOR_EVENT_JOURNAL_DIR') or None
+if EVENT_JOURNAL_DIR:
+    # Imported only when enabled: the journal pulls in requests for its sender
+    from proctoring.event_journal import EventJournal
+event_journal = EventJournal(
+    EVENT_JOURNAL_DIR,
+    os.environ.get('PROCTOR_EVENT_INGEST_URL', 'http://localhost:5000/api/interview/proctoring-events/bulk') or None,
+    os.environ.get('PROCTOR_INGEST_TOKEN') or None,
+    segment_bytes=int(os.environ.get('PROCTOR_EVENT_SEGMENT_BYTES', 16 * 2 ** 20)),
+    batch_size=int(os.environ.get('PROCTOR_EVENT_BATCH_SIZE', 500)),
+    flush_interval=float(os.environ.get('PROCTOR_EVENT_FLUSH_MS', 1000)) / 1000,
+    fsync=os.environ.get('PROCTOR_EVENT_JOURNAL_FSYNC', '1') != '0',
+) if EVENT_JOURNAL_DIR else None
+
+# --- Debug overlay images ---
+# off: never render; request: only for frames sent with a truthy `debug` flag; always: every frame.
+# Rendered images go to a small per-session ring buffer served by /debug-frame/<session_id>,
+# and are attached to the response only when the request sends `debug: "inline"`.
+DEBUG_IMAGE_MODE = os.environ.get('PROCTOR_DEBUG_IMAGE', 'off')
+DEBUG_IMAGE_MAX_WIDTH = int(os.environ.get('PROCTOR_DEBUG_IMAGE_WIDTH', 320))
+DEBUG_IMAGE_QUALITY = int(os.environ.get('PROCTOR_DEBUG_IMAGE_QUALITY', 70))
+debug_frames = DebugFrameBuffer(int(os.environ.get('PROCTOR_DEBUG_FRAMES', 5)))
+
+# --- Load shedding ---
+# With inference threads, at most PROCTOR_MAX_QUEUED_FRAMES frames wait for a free thread and
+# each session has at most one frame in flight. Frames beyond that are shed right away:
+# 'reject' answers 503 with Retry-After; 'skip' answers
+# with the session's last verdict unchanged, as if the frame had never been sent.
+# Frames of sessions inside a correction window are queued ahead of the others, earliest window
+# end first, and displace the newest waiting steady frame when the queue is full. Steady frames
+# should finish within PROCTOR_STEADY_FRAME_DEADLINE_MS; misses of both kinds are in /metrics.
+MAX_QUEUED_FRAMES = int(os.environ.get('PROCTOR_MAX_QUEUED_FRAMES', INFERENCE_WORKERS))
+OVERLOAD_POLICY = os.environ.get('PROCTOR_OVERLOAD_POLICY', 'reject')
+STEADY_FRAME_DEADLINE = float(os.environ.get('PROCTOR_STEADY_FRAME_DEADLINE_MS', 2000)) / 1000
+frame_executor = FrameExecutor(INFERENCE_WORKERS, MAX_QUEUED_FRAMES, steady_deadline=STEADY_FRAME_DEADLINE) if INFERENCE_WORKERS > 0 else None
+
+# --- Frame ordering ---
+# Clients tag frames with a sequence number and capture time (X-Frame-Seq / X-Captured-At,
+# or `seq` / `captured_at` fields). Each session runs one frame at a time and keeps only its
+# newest waiting frame; stale and superseded frames are answered with the current state
+# without inference. Correction-window timers run on capture time.
+frame_sequencer = FrameSequencer()
+
+# --- Offline recording analysis (/recording-analysis) ---
+# Jobs re-run the infraction logic over saved recordings in uploads/ on their own worker
+# processes (see proctor_analyze.py) and write one JSON line per recording under
+# PROCTOR_ANALYSIS_DIR. One job runs at a time so live proctoring keeps the other cores.
+UPLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+ANALYSIS_DIR = os.environ.get('PROCTOR_ANALYSIS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analysis'))
+ANALYSIS_WORKERS = int(os.environ.get('PROCTOR_ANALYSIS_WORKERS', 1))
+ANALYSIS_SAMPLE_FPS = float(os.environ.get('PROCTOR_ANALYSIS_SAMPLE_FPS', 2.0))
+analysis_jobs = {}
+
+# --- Metrics (/metrics) ---
+# Latency histograms and counters of this worker, in the Prometheus text format.
+# Recording is a dict lookup and a few additions, so it is always on.
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram('proctor_stage_seconds', 'Latency of each frame processing stage', ['stage'])
+request_seconds = metrics.histogram('proctor_request_seconds', 'End-to-end latency of proctoring endpoints', ['endpoint'])
+frames_total = metrics.counter('proctor_frames_total', 'Frames evaluated, by detection path', ['path'])
+infractions_total = metrics.counter('proctor_infractions_total', 'Correction windows started, by infraction type', ['type'])
+terminations_total = metrics.counter('proctor_terminations_total', 'Sessions terminated, by cause', ['cause'])
+active_sessions = ActiveSessions(int(os.environ.get('PROCTOR_ACTIVE_SESSION_WINDOW', 60)))
+metrics.gauge('proctor_active_sessions', 'Sessions that sent a frame recently (PROCTOR_ACTIVE_SESSION_WINDOW)', active_sessions.count)
+metrics.gauge('proctor_session_store_sessions', 'Sessions held by the session store', lambda: len(session_store))
+preflight_cache_total = metrics.counter('proctor_preflight_cache_total', 'Pre-flight frames answered from the cache or analyzed', ['result'])
+shed_frames_total = metrics.counter('proctor_shed_frames_total', 'Frames shed without inference, by reason', ['reason'])
+metrics.gauge('proctor_inference_pending', 'Frames running or waiting on the inference threads', lambda: frame_executor.depth() if frame_executor else 0)
+frame_deadlines_total = metrics.counter('proctor_frame_deadlines_total', 'Frames on the inference threads that finished before or after their deadline, by class', ['class', 'result'])
+frame_queue_seconds = metrics.histogram('proctor_frame_queue_seconds', 'Time frames waited for an inference thread, by class', ['class'])
+if frame_executor is not None:
+    def observe_scheduled_frame(frame_class, queued_seconds, missed):
+        frame_queue_seconds.observe(queued_seconds, frame_class)
+        frame_deadlines_total.inc(frame_class, 'missed' if missed else 'met')
+    frame_executor.add_observer(observe_scheduled_frame)
+metrics.gauge('proctor_ready', 'Whether this worker has warmed up its models', lambda: int(startup_report.is_ready))
+metrics.gauge('proctor_event_journal_pending', 'Events written to the event journal and not delivered yet', lambda: event_journal.pending() if event_journal else 0)
+metrics.gauge('proctor_event_journal_retries', 'Failed event journal deliveries that were retried', lambda: event_journal.retries if event_journal else 0)
+metrics.gauge('proctor_session_timers', 'Correction-window and idle timers armed in this worker', lambda: len(session_timers))
+timer_expiries_total = metrics.counter('proctor_timer_expiries_total', 'Sessions changed by an expired timer, by timer', ['timer'])
+
+# Optional sampling profiler: requests slower than PROCTOR_PROFILE_SLOW_MS leave a
+# folded-stack flame profile in PROCTOR_PROFILE_DIR (0 disables it)
+PROFILE_SLOW_MS = int(os.environ.get('PROCTOR_PROFILE_SLOW_MS', 0))
+if PROFILE_SLOW_MS > 0:
+    request_profiler = SlowRequestProfiler(
+        PROFILE_SLOW_MS,
+        interval_ms=float(os.environ.get('PROCTOR_PROFILE_INTERVAL_MS', 5)),
+        output_dir=os.environ.get('PROCTOR_PROFILE_DIR', 'profiles')
+    )
+else:
+    request_profiler = None
+
+def instrumented(endpoint):
+    """Record an endpoint's latency and profile it when slow"""
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            profiling = request_profiler.profile(endpoint.strip('/')) if request_profiler is not None else nullcontext()
+            with request_seconds.time(endpoint), profiling:
+                return view(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def init_model_pools(warmup=MODEL_WARMUP):
+    """Create the models /proctor needs and optionally run one blank frame through every instance"""
+    if warmup:
+        blank = np.zeros((480, 640, 3), dtype=np.uint8)
+        detection_pipeline.warm_up(pipeline_inputs(blank), PROCTOR_OUTPUTS)
+    else:
+        for pool in detection_pipeline.pools(PROCTOR_OUTPUTS):
+            pool.fill()
+
+def close_model_pools():
+    for pool in detection_pipeline.pools():
+        pool.close()
+
+def preload_models():
+    """Load what forked workers can share copy-on-write, without starting any thread"""
+    import mediapipe  # noqa: F401
+    for pool in (person_net_pool, face_net_pool):
+        if isinstance(pool, InferenceBatcher):
+            pool.load()
+        elif pool is not None:
+            pool.fill()
+
+def observe_stage(stage, seconds):
+    stage_seconds.observe(seconds, stage)
+
+def start_models():
+    """Create and warm up this worker's models (or its inference processes), then report it ready"""
+    global inference_processes
+    if INFERENCE_PROCESSES > 0:
+        with startup_report.phase('inference_processes'):
+            ring = FrameRing(FRAME_RING_SLOTS, FRAME_SLOT_HEIGHT, FRAME_SLOT_WIDTH)
+            processes = InferenceProcesses(ring, INFERENCE_PROCESSES, os.path.dirname(os.path.abspath(__file__)), INFERENCE_PROCESS_TIMEOUT)
+            atexit.register(processes.close)
+            inference_processes = processes.start()
+    else:
+        with startup_report.phase('models'):
+            init_model_pools()
+    # Stage timings start after the warm-up frame; inference processes send theirs with each result
+    detection_pipeline.add_observer(observe_stage)
+    if inference_processes is not None:
+        inference_processes.add_observer(observe_stage)
+    if SESSION_TIMERS:
+        session_timers.start()
+    if event_journal is not None:
+        event_journal.start()
+        atexit.register(event_journal.close)
+    startup_report.ready()
+
+def start_worker():
+    """Finish startup in a worker forked from a preloading parent"""
+    startup_report.forked()
+    start_models()
+
+if STARTUP_MODE == 'preload':
+    with startup_report.phase('preload'):
+        preload_models()
+elif STARTUP_MODE == 'background':
+    threading.Thread(target=start_models, name='model-startup', daemon=True).start()
+else:
+    start_models()
+atexit.register(close_model_pools)
+
 def initialize_session(session_id):
     """Initialize session data structure"""
-    if session_id not in session_data:
-        session_data[session_id] = {
-            'warning_count': 0,
-            'issued_warnings': set(),  # Track which warning types have been issued
-            'last_frontal_face_time': time.time(),
-            'profile_face_resolved': True,  # Track if profile face issue is resolved
-            'terminated': False,
-            'quit_reason': "",
-            'last_infraction': None,
-            'no_face_timer': None,
-            'no_face_timer_start': None,
-            'no_face_timer_active': False,
-            'correction_timer_active': False,
-            'correction_timer_start': None,
-            'correction_window_history': [],
-            'proctoring_event_log': [],
-            'termination_reason': None
-        }
+    with session_store.session(session_id):
+        pass
 
 def issue_warning(session_id, warning_type, warning_message):
     """Issue a warning only if this type hasn't been issued before"""
-    session = session_data[session_id]
-    
-    if warning_type not in session['issued_warnings']:
-        session['warning_count'] += 1
-        session['issued_warnings'].add(warning_type)
-        return warning_message
+    with session_store.session(session_id) as session:
+        if not session.has_warning(warning_type):
+            session.warning_count += 1
+            session.add_warning(warning_type)
+            return warning_message
     return None
 
 def resolve_warning(session_id, warning_type):
     """Mark a warning type as resolved (for profile face)"""
-    session = session_data[session_id]
     if warning_type == WARNING_TYPES['PROFILE_FACE']:
-        session['profile_face_resolved'] = True
-        # Remove from issued warnings so it can be warned again if needed
-        session['issued_warnings'].discard(warning_type)
+        with session_store.session(session_id) as session:
+            session.profile_face_resolved = True
+            # Remove from issued warnings so it can be warned again if needed
+            session.discard_warning(warning_type)
 
 def draw_debug_overlays(frame, frontal_faces, profile_faces):
     # Draw grid
@@ -120,6 +495,25 @@ def draw_debug_overlays(frame, frontal_faces, profile_faces):
         cv2.putText(frame, 'Profile', (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2)
     return frame
 
+def render_debug_image(frame, frontal_boxes, profile_boxes):
+    """Downscale the frame, draw the overlays and return JPEG bytes"""
+    h, w = frame.shape[:2]
+    scale = min(1.0, DEBUG_IMAGE_MAX_WIDTH / float(w))
+    if scale < 1.0:
+        debug_frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        frontal_boxes = [tuple(int(v * scale) for v in box) for box in frontal_boxes]
+        profile_boxes = [tuple(int(v * scale) for v in box) for box in profile_boxes]
+    else:
+        debug_frame = frame.copy()
+    debug_frame = draw_debug_overlays(debug_frame, frontal_boxes, profile_boxes)
+    _, buffer = cv2.imencode('.jpg', debug_frame, [cv2.IMWRITE_JPEG_QUALITY, DEBUG_IMAGE_QUALITY])
+    return buffer.tobytes()
+
+def debug_image_requested(debug_flag):
+    if DEBUG_IMAGE_MODE == 'always':
+        return True
+    return DEBUG_IMAGE_MODE == 'request' and bool(debug_flag) and debug_flag not in ('0', 'false')
+
 def nms_boxes(boxes, overlapThresh=0.3):
     if len(boxes) == 0:
         return []
@@ -147,14 +541,14 @@ def nms_boxes(boxes, overlapThresh=0.3):
     return boxes[pick].astype("int")
 
 def start_no_face_timer(session_id):
-    session = session_data[session_id]
-    session['no_face_timer_start'] = time.time()
-    session['no_face_timer_active'] = True
+    with session_store.session(session_id) as session:
+        session.no_face_timer_start = time.time()
+        session.no_face_timer_active = True
 
 def reset_no_face_timer(session_id):
-    session = session_data[session_id]
-    session['no_face_timer_start'] = None
-    session['no_face_timer_active'] = False
+    with session_store.session(session_id) as session:
+        session.no_face_timer_start = None
+        session.no_face_timer_active = False
 
 def estimate_yaw(frame, face_box):
     # This is a placeholder: in production, use a facial landmark detector (e.g., mediapipe or dlib)
@@ -163,68 +557,179 @@ def estimate_yaw(frame, face_box):
     return 0
 
 def start_correction_window(session, infraction_type, reason):
-    if session['correction_timer_active']:
+    if session.correction_timer_active:
         return  # Already active, don't start another
-    session['correction_timer_active'] = True
-    session['correction_timer_start'] = time.time()
-    session['correction_infraction'] = infraction_type
-    session['correction_reason'] = reason
+    session.correction_timer_active = True
+    session.correction_timer_start = time.time()
+    session.correction_infraction = infraction_type
+    session.correction_reason = reason
 
 def clear_correction_window(session):
-    session['correction_timer_active'] = False
-    session['correction_timer_start'] = None
-    session['correction_infraction'] = None
-    session['correction_reason'] = None
+    session.correction_timer_active = False
+    session.correction_timer_start = None
+    session.correction_infraction = None
+    session.correction_reason = None
+
+def read_proctor_frame(path_session_id=None):
+    """Parse a /proctor request.
+
+    Accepts a raw image/jpeg or image/webp body (session id in the path or the
+    X-Session-Id header), a multipart upload with a `frame` file, or the legacy
+    JSON body with a base64 data URL. Returns (session_id, debug_flag, order, event_cursor, frame, error)
+    where order is the frame's (seq, captured_at) and event_cursor the number of events the client holds.
+    """
+    session_id = path_session_id or request.headers.get('X-Session-Id') or request.args.get('session_id')
+    debug_flag = request.headers.get('X-Proctor-Debug', request.args.get('debug'))
+    seq = request.headers.get('X-Frame-Seq', request.args.get('seq'))
+    captured_at = request.headers.get('X-Captured-At', request.args.get('captured_at'))
+    event_cursor = request.headers.get('X-Event-Cursor', request.args.get('event_cursor'))
+    if request.mimetype in IMAGE_CONTENT_TYPES:
+        image_bytes = read_stream(request.stream, request.content_length, MAX_FRAME_BYTES)
+    elif request.mimetype == 'multipart/form-data':
+        upload = request.files.get('frame')
+        session_id = session_id or request.form.get('session_id')
+        debug_flag = request.form.get('debug', debug_flag)
+        seq = request.form.get('seq', seq)
+        captured_at = request.form.get('captured_at', captured_at)
+        event_cursor = request.form.get('event_cursor', event_cursor)
+        image_bytes = read_stream(upload.stream, None, MAX_FRAME_BYTES) if upload else None
+    else:
+        data = request.get_json(silent=True)
+        if not data:
+            return session_id, debug_flag, (None, None), None, None, 'No data received.'
+        session_id = session_id or data.get('session_id')
+        debug_flag = data.get('debug', debug_flag)
+        seq = data.get('seq', seq)
+        captured_at = data.get('captured_at', captured_at)
+        event_cursor = data.get('event_cursor', event_cursor)
+        image_bytes = decode_data_url(data['image']) if data.get('image') else None
+    session_id = session_id or 'default'
+    order = parse_frame_order(seq, captured_at)
+    event_cursor = parse_event_cursor(event_cursor)
+    if not image_bytes:
+        return session_id, debug_flag, order, event_cursor, None, 'No image data received.'
+    with stage_seconds.time('decode'):
+        frame = decode_frame(image_bytes, MAX_FRAME_WIDTH, frame_slot)
+    if frame is None:
+        return session_id, debug_flag, order, event_cursor, None, 'Invalid image data.'
+    return session_id, debug_flag, order, event_cursor, share_frame(frame), None
+
+def frame_slot(height, width):
+    """A free frame ring slot for decode_frame to resize a frame into, so it reaches the
+    inference processes without a copy. None without inference processes or a fitting slot."""
+    if inference_processes is None or height > FRAME_SLOT_HEIGHT or width > FRAME_SLOT_WIDTH:
+        return None
+    return inference_processes.slot(height, width)
+
+def share_frame(frame):
+    """Move a decoded frame into the shared frame ring, where inference processes read it in
+    place. Hand it back with release_frame. Without inference processes the frame is returned as is."""
+    if inference_processes is None:
+        return frame
+    if frame.shape[0] > FRAME_SLOT_HEIGHT or frame.shape[1] > FRAME_SLOT_WIDTH:
+        raise FrameTooLargeError(f'Frame is larger than {FRAME_SLOT_WIDTH}x{FRAME_SLOT_HEIGHT}')
+    return inference_processes.share(frame)
+
+def release_frame(frame):
+    if inference_processes is not None and frame is not None:
+        inference_processes.release(frame)
+
+def parse_event_cursor(value):
+    """Number of events a client already holds, or None when it sent none (or garbage)"""
+    try:
+        cursor = int(value) if value is not None and value != '' else None
+    except (TypeError, ValueError):
+        return None
+    return cursor if cursor is not None and cursor >= 0 else None
 
 @app.route('/proctor', methods=['POST'])
-def proctor():
-    # --- Model Initialization Inside Endpoint ---
-    # Use mp.solutions.face_mesh.FaceMesh and mp.solutions.holistic.Holistic directly
-    face_mesh = mp.solutions.face_mesh.FaceMesh(static_image_mode=True, max_num_faces=5, refine_landmarks=True, min_detection_confidence=0.5)
-    holistic = mp.solutions.holistic.Holistic(static_image_mode=True, model_complexity=1, enable_segmentation=False, refine_face_landmarks=True, min_detection_confidence=0.5)
-    
-    data = request.json
-    if not data:
-        return jsonify({'warning': 'No data received.', 'warning_count': 0, 'max_warnings': MAX_WARNINGS, 'terminated': False})
-    session_id = data.get('session_id', 'default')
-    initialize_session(session_id)
-    session = session_data[session_id]
-    if 'image' not in data or not data['image']:
-        return jsonify({'warning': 'No image data received.', 'warning_count': 0, 'max_warnings': MAX_WARNINGS, 'terminated': False})
+@app.route('/proctor/<session_id>', methods=['POST'])
+@instrumented('/proctor')
+def proctor(session_id=None):
     try:
-        img_data = data['image'].split(',')[1]
-        img_bytes = base64.b64decode(img_data)
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    except Exception as e:
+        session_id, debug_flag, (seq, captured_at), event_cursor, frame, error = read_proctor_frame(session_id)
+    except FrameTooLargeError:
+        return jsonify({'warning': 'Image too large.', 'warning_count': 0, 'max_warnings': MAX_WARNINGS, 'terminated': False}), 413
+    except Exception:
         return jsonify({'warning': 'Invalid image data.', 'warning_count': 0, 'max_warnings': MAX_WARNINGS, 'terminated': False})
-    current_time = time.time()
-    (h, w) = frame.shape[:2]
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    # --- Person detection with MobileNet-SSD ---
-    person_boxes = []
-    if person_net is not None:
-        blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 0.007843, (300, 300), (127.5, 127.5, 127.5))
-        person_net.setInput(blob)
-        detections = person_net.forward()
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            class_id = int(detections[0, 0, i, 1])
-            if confidence > 0.5 and class_id == 15:
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (startX, startY, endX, endY) = box.astype('int')
-                person_boxes.append((startX, startY, endX, endY))
-    holistic_results = holistic.process(rgb_frame)
-    people_count = 0
-    if holistic_results.pose_landmarks:
-        people_count += 1
-    results = face_mesh.process(rgb_frame)
-    faces = []
-    profile_detected = False
-    frontal_detected = False
-    profile_boxes = []
-    frontal_boxes = []
-    
+    if error:
+        return jsonify({'warning': error, 'warning_count': 0, 'max_warnings': MAX_WARNINGS, 'terminated': False})
+    try:
+        result = process_frame(session_id, frame, debug_flag, seq, captured_at, event_cursor)
+    except FrameDropped as drop:
+        shed_frames_total.inc(drop.reason)
+        result = {**session_state(session_id, event_cursor=event_cursor), 'warning': None, 'skipped': drop.reason}
+    except FrameRejected as rejection:
+        shed_frames_total.inc(rejection.reason)
+        if OVERLOAD_POLICY != 'skip':
+            response = jsonify({'warning': 'Proctoring is busy, retry later.', 'warning_count': 0, 'max_warnings': MAX_WARNINGS, 'terminated': False, 'retry_after': rejection.retry_after})
+            response.headers['Retry-After'] = str(rejection.retry_after)
+            return response, 429 if rejection.reason == 'session_busy' else 503
+        result = {**session_state(session_id, event_cursor=event_cursor), 'warning': None, 'skipped': rejection.reason}
+    finally:
+        release_frame(frame)
+    with stage_seconds.time('json'):
+        return jsonify(result)
+
+def process_frame(session_id, frame, debug_flag=None, seq=None, captured_at=None, event_cursor=None):
+    """evaluate_frame in session order, on an inference thread when they are enabled
+    (raises FrameDropped for stale or superseded frames and FrameRejected when the frame is shed)"""
+    evaluate = functools.partial(evaluate_frame, session_id, frame, debug_flag, seq, captured_at, time.time(), event_cursor)
+    if frame_executor is None:
+        result = frame_sequencer.run(session_id, seq, captured_at, evaluate)
+    else:
+        result = frame_sequencer.run(session_id, seq, captured_at, frame_executor.run, session_id, evaluate)
+        # The session's next frames go first until its correction window would end
+        window = result.get('correction_window')
+        frame_executor.set_deadline(session_id, window['start_time'] + window['duration'] if window else None)
+    startup_report.frame_done()
+    return result
+
+def run_detection(frame, roi=None, working_width=None):
+    """Person boxes, the (n_faces, 478, 3) face landmarks normalized to the whole frame, and
+    the frame region the face models saw (None for the whole frame)"""
+    if inference_processes is not None:
+        return inference_processes.run(frame, roi, working_width)
+    detections = detection_pipeline.run(pipeline_inputs(frame, roi, working_width), PROCTOR_OUTPUTS)
+    landmarks = landmarks_array(detections.get('face_landmarks'))
+    region = detections.get('face_region')
+    if region is not None:
+        landmarks = roi_landmarks_to_frame(landmarks, region, frame.shape)
+    return {
+        'person_boxes': detections.get('person_boxes', []),
+        'landmarks': landmarks,
+        'face_region': region,
+    }
+
+def detect_frame(frame):
+    """Full-frame detection at the working resolution"""
+    detections = run_detection(frame)
+    if input_normalizer.should_audit(frame):
+        full = run_detection(frame, working_width=0)
+        input_normalizer.record_audit(frame_verdict(frame.shape, detections) == frame_verdict(frame.shape, full))
+    return detections
+
+def detect_frame_roi(frame, box):
+    """Detection with FaceMesh limited to a crop around the tracked faces. Person boxes
+    still come from the whole frame."""
+    return run_detection(frame, box)
+
+def boxes_overlap(boxA, boxB):
+    xA = max(boxA[0], boxB[0])
+    yA = max(boxA[1], boxB[1])
+    xB = min(boxA[0]+boxA[2], boxB[2])
+    yB = min(boxA[1]+boxA[3], boxB[3])
+    return (xA < xB) and (yA < yB)
+
+def classify_frame(frame_shape, detections):
+    """Frame-level verdict from the detections, independent of session state.
+
+    Returns the face poses, frontal/profile pose points, the infraction (type and
+    reason, or None) and the debug info.
+    """
+    (h, w) = frame_shape[:2]
+    person_boxes = detections['person_boxes']
+
     # Initialize debug info
     debug_info = {
         'faces_detected': 0,
@@ -234,94 +739,27 @@ def proctor():
         'extra_person_detected': False,
         'frontal_boxes_count': 0,
         'profile_boxes_count': 0,
-        'person_boxes_count': 0,
-        'correction_window_active': session['correction_timer_active'],
-        'current_infraction': session.get('correction_infraction'),
-        'warning_count': session['warning_count']
+        'person_boxes_count': 0
     }
     
-    if results.multi_face_landmarks:
-        for face_landmarks in results.multi_face_landmarks:
-            image_points = []
-            valid = True
-            for idx in LANDMARK_IDXS:
-                try:
-                    lm = face_landmarks.landmark[idx]
-                    x, y = int(lm.x * w), int(lm.y * h)
-                    image_points.append((x, y))
-                except Exception:
-                    valid = False
-                    break
-            if not valid or len(image_points) != 6:
-                continue
-            image_points = np.array(image_points, dtype='double')
-            focal_length = w
-            center = (w / 2, h / 2)
-            camera_matrix = np.array(
-                [[focal_length, 0, center[0]],
-                 [0, focal_length, center[1]],
-                 [0, 0, 1]], dtype='double')
-            dist_coeffs = np.zeros((4, 1))
-            try:
-                success, rotation_vector, translation_vector = cv2.solvePnP(
-                    MODEL_POINTS, image_points, camera_matrix, dist_coeffs, flags=cv2.SOLVEPNP_ITERATIVE)
-            except Exception:
-                continue
-            if not success:
-                continue
-            rmat, _ = cv2.Rodrigues(rotation_vector)
-            sy = np.sqrt(rmat[0, 0] ** 2 + rmat[1, 0] ** 2)
-            singular = sy < 1e-6
-            if not singular:
-                x_angle = np.arctan2(rmat[2, 1], rmat[2, 2])
-                y_angle = np.arctan2(-rmat[2, 0], sy)
-                z_angle = np.arctan2(rmat[1, 0], rmat[0, 0])
-            else:
-                x_angle = np.arctan2(-rmat[1, 2], rmat[1, 1])
-                y_angle = np.arctan2(-rmat[2, 0], sy)
-                z_angle = 0
-            pitch = float(np.degrees(x_angle))
-            yaw = float(np.degrees(y_angle))
-            # Heuristics for frontal/profile
-            try:
-                left_eye_outer = face_landmarks.landmark[33]
-                left_eye_inner = face_landmarks.landmark[133]
-                right_eye_outer = face_landmarks.landmark[362]
-                right_eye_inner = face_landmarks.landmark[263]
-                nose_tip = face_landmarks.landmark[1]
-                l_eye = np.array([(left_eye_outer.x + left_eye_inner.x) / 2 * w, (left_eye_outer.y + left_eye_inner.y) / 2 * h])
-                r_eye = np.array([(right_eye_outer.x + right_eye_inner.x) / 2 * w, (right_eye_outer.y + right_eye_inner.y) / 2 * h])
-                nose = np.array([nose_tip.x * w, nose_tip.y * h])
-                eye_dist = float(np.linalg.norm(l_eye - r_eye))
-                eye_y_diff = float(abs(l_eye[1] - r_eye[1]))
-                nose_center_dist = float(abs(nose[0] - (l_eye[0] + r_eye[0]) / 2))
-                
-                # More lenient thresholds for frontal detection
-                eyes_visible = bool(eye_dist > w * 0.07)
-                eyes_aligned = bool(eye_y_diff < h * 0.03)
-                nose_centered = bool(nose_center_dist < w * 0.05)
-                is_frontal = bool(eyes_visible and eyes_aligned and nose_centered)
-                
-                # Add debug info for this face
-                face_index = len(faces)
-                debug_info[f'face_{face_index}_eye_dist'] = round(eye_dist, 2)
-                debug_info[f'face_{face_index}_eye_y_diff'] = round(eye_y_diff, 2)
-                debug_info[f'face_{face_index}_nose_center_dist'] = round(nose_center_dist, 2)
-                debug_info[f'face_{face_index}_eyes_visible'] = eyes_visible
-                debug_info[f'face_{face_index}_eyes_aligned'] = eyes_aligned
-                debug_info[f'face_{face_index}_nose_centered'] = nose_centered
-                debug_info[f'face_{face_index}_is_frontal'] = is_frontal
-            except Exception as e:
-                is_frontal = False
-                face_index = len(faces)
-                debug_info[f'face_{face_index}_error'] = str(e)
-            if is_frontal:
-                frontal_detected = True
-                frontal_boxes.append(image_points)
-            else:
-                profile_detected = True
-                profile_boxes.append(image_points)
-    faces = profile_boxes + frontal_boxes
+    # Head pose and frontal/profile heuristics for every face at once (FACE_POSE_DTYPE rows)
+    face_poses = estimate_head_poses(detections['landmarks'], w, h)
+    face_poses = face_poses[face_poses['valid']]
+    for face_index, pose in enumerate(face_poses):
+        debug_info[f'face_{face_index}_yaw'] = round(float(pose['yaw']), 2)
+        debug_info[f'face_{face_index}_pitch'] = round(float(pose['pitch']), 2)
+        debug_info[f'face_{face_index}_roll'] = round(float(pose['roll']), 2)
+        debug_info[f'face_{face_index}_eye_dist'] = round(float(pose['eye_dist']), 2)
+        debug_info[f'face_{face_index}_eye_y_diff'] = round(float(pose['eye_y_diff']), 2)
+        debug_info[f'face_{face_index}_nose_center_dist'] = round(float(pose['nose_center_dist']), 2)
+        debug_info[f'face_{face_index}_eyes_visible'] = bool(pose['eyes_visible'])
+        debug_info[f'face_{face_index}_eyes_aligned'] = bool(pose['eyes_aligned'])
+        debug_info[f'face_{face_index}_nose_centered'] = bool(pose['nose_centered'])
+        debug_info[f'face_{face_index}_is_frontal'] = bool(pose['is_frontal'])
+    frontal_boxes = list(face_poses['image_points'][face_poses['is_frontal']])
+    profile_boxes = list(face_poses['image_points'][~face_poses['is_frontal']])
+    frontal_detected = bool(frontal_boxes)
+    profile_detected = bool(profile_boxes)
     main_face_box = None
     if frontal_boxes:
         # Convert to bounding box (x, y, w, h)
@@ -336,18 +774,6 @@ def proctor():
         minx, maxx = int(min(xs)), int(max(xs))
         miny, maxy = int(min(ys)), int(max(ys))
         main_face_box = (minx, miny, maxx - minx, maxy - miny)
-    def boxes_overlap(boxA, boxB):
-        xA = max(boxA[0], boxB[0])
-        yA = max(boxA[1], boxB[1])
-        xB = min(boxA[0]+boxA[2], boxB[2])
-        yB = min(boxA[1]+boxA[3], boxB[3])
-        return (xA < xB) and (yA < yB)
-    extra_person_detected = False
-    if main_face_box is not None and len(person_boxes) > 0:
-        for (sx, sy, ex, ey) in person_boxes:
-            person_box = (sx, sy, ex-sx, ey-sy)
-            if not boxes_overlap(main_face_box, person_box):
-                extra_person_detected = True
     
     # After face detection and before infraction logic
     detected_faces_count = len(frontal_boxes) + len(profile_boxes)
@@ -361,29 +787,8 @@ def proctor():
     debug_info['person_boxes_count'] = len(person_boxes)
     debug_info['frontal_detected'] = frontal_detected
     debug_info['profile_detected'] = profile_detected
-    
-    # Helper to convert list of points to bounding box
-    def points_to_bbox(points):
-        xs = [pt[0] for pt in points]
-        ys = [pt[1] for pt in points]
-        minx, maxx = int(min(xs)), int(max(xs))
-        miny, maxy = int(min(ys)), int(max(ys))
-        return (minx, miny, maxx - minx, maxy - miny)
-
-    # Convert frontal_boxes and profile_boxes to bounding boxes for debug overlay
-    frontal_bboxes = [points_to_bbox(pts) for pts in frontal_boxes]
-    profile_bboxes = [points_to_bbox(pts) for pts in profile_boxes]
 
-    # Generate debug image with overlays
-    debug_frame = frame.copy()
-    debug_frame = draw_debug_overlays(debug_frame, frontal_bboxes, profile_bboxes)
-    
-    # Convert debug image to base64
-    _, buffer = cv2.imencode('.jpg', debug_frame)
-    debug_image = base64.b64encode(buffer.tobytes()).decode('utf-8')
-    
     # --- Infraction logic (cleaned up, robust multi-person detection) ---
-    warning = None
     infraction_type = None
     infraction_reason = None
 
@@ -391,7 +796,7 @@ def proctor():
     multi_person_flag = False
     multi_person_reason = None
     # 1. MobileNet-SSD person detection
-    if person_net is not None and len(person_boxes) > 0:
+    if len(person_boxes) > 0:
         # If more than one person box detected
         if len(person_boxes) > 1:
             multi_person_flag = True
@@ -410,235 +815,619 @@ def proctor():
         multi_person_flag = True
         multi_person_reason = f"{detected_faces_count} faces detected by FaceMesh."
 
-    if multi_person_flag:
+    if multi_person_flag and 'multiple_faces' in ENABLED_RULES:
         infraction_type = 'multiple_faces'
         infraction_reason = 'Multiple people detected!'
         debug_info['multi_person_reason'] = multi_person_reason
     elif frontal_detected:
         infraction_type = None
         infraction_reason = None
-    elif profile_detected and not frontal_detected:
+    elif profile_detected and not frontal_detected and 'profile_face' in ENABLED_RULES:
         infraction_type = 'profile_face'
         infraction_reason = 'Please face the camera directly.'
-    elif detected_faces_count == 0:
+    elif detected_faces_count == 0 and 'no_face' in ENABLED_RULES:
         infraction_type = 'no_face'
         infraction_reason = 'No face detected.'
     # If eyes are not aligned, set infraction to profile_face
-    if 'face_0_eyes_aligned' in debug_info and not debug_info['face_0_eyes_aligned']:
+    if len(face_poses) and not face_poses['eyes_aligned'][0] and 'profile_face' in ENABLED_RULES:
         infraction_type = 'profile_face'
         infraction_reason = 'Please look directly at the camera.'
 
     debug_info['infraction_type'] = infraction_type
     debug_info['infraction_reason'] = infraction_reason
-    debug_info['frontal_detected'] = frontal_detected
-    debug_info['correction_window_active'] = session['correction_timer_active']
+    return {
+        'face_poses': face_poses,
+        'frontal_boxes': frontal_boxes,
+        'profile_boxes': profile_boxes,
+        'infraction_type': infraction_type,
+        'infraction_reason': infraction_reason,
+        'debug_info': debug_info,
+    }
+
+def frame_verdict(frame_shape, detections):
+    """What the infraction logic would decide from these detections (used to audit tracking)"""
+    return classify_frame(frame_shape, detections)['infraction_type']
+
+def evaluate_frame(session_id, frame, debug_flag=None, seq=None, captured_at=None, received_at=None, event_cursor=None):
+    """Run detection and the infraction logic for one decoded frame. Returns the response dict,
+    with the session's events after ``event_cursor`` when the client sent one"""
+    received_at = time.time() if received_at is None else received_at
+    # --- Detection (only the stages that the enabled infraction rules read) ---
+    if frame_tracker is not None:
+        detections, tracking_path = frame_tracker.detect(session_id, frame, detect_frame, detect_frame_roi, frame_verdict)
+    else:
+        detections, tracking_path = detect_frame(frame), 'full'
+    frames_total.inc(tracking_path)
+    active_sessions.seen(session_id, received_at)
+    with stage_seconds.time('classify'):
+        observation = classify_frame(frame.shape, detections)
+    frontal_boxes = observation['frontal_boxes']
+    profile_boxes = observation['profile_boxes']
+    infraction_type = observation['infraction_type']
+    infraction_reason = observation['infraction_reason']
+    debug_info = observation['debug_info']
+    debug_info['tracking_path'] = tracking_path
+    region = detections.get('face_region')
+    debug_info['face_region'] = [round(v) for v in region] if region is not None else None
+    
+    # Debug overlay image (opt-in, see DEBUG_IMAGE_MODE)
+    debug_image = None
+    if debug_image_requested(debug_flag):
+        def points_to_bbox(points):
+            xs = [pt[0] for pt in points]
+            ys = [pt[1] for pt in points]
+            minx, maxx = int(min(xs)), int(max(xs))
+            miny, maxy = int(min(ys)), int(max(ys))
+            return (minx, miny, maxx - minx, maxy - miny)
+
+        frontal_bboxes = [points_to_bbox(pts) for pts in frontal_boxes]
+        profile_bboxes = [points_to_bbox(pts) for pts in profile_boxes]
+        with stage_seconds.time('overlay_encode'):
+            jpeg_bytes = render_debug_image(frame, frontal_bboxes, profile_bboxes)
+        debug_frames.push(session_id, jpeg_bytes, received_at)
+        if debug_flag == 'inline':
+            debug_image = base64.b64encode(jpeg_bytes).decode('utf-8')
+
+    # Session state is only touched from here on, while holding the session's lock
+    with session_store.session(session_id) as session:
+        # Frames of a session can reach here out of order from other worker processes
+        current_time = session.frame_clock(seq, captured_at, received_at)
+        if current_time is None:
+            shed_frames_total.inc('stale')
+            return {**session_state(session_id, session, event_cursor), 'warning': None, 'skipped': 'stale'}
+        debug_info['frame_delay_ms'] = round((received_at - current_time) * 1000, 1)
+        # The frame's own verdict only votes; the engine decides what the session is in
+        if session.infraction_state is None:
+            session.infraction_state = infraction_engine.new_state()
+        face_poses = observation['face_poses']
+        pose = (float(face_poses['yaw'][0]), float(face_poses['pitch'][0])) if len(face_poses) else None
+        infraction_type, infraction_reason = infraction_engine.update(session.infraction_state, infraction_type, infraction_reason, pose)
+        debug_info['session_infraction'] = infraction_type
+        debug_info['infraction_smoothing'] = infraction_engine.describe(session.infraction_state)
+        logged = len(session.proctoring_event_log)
+        result = apply_verdict(session, infraction_type, infraction_reason, current_time, debug_info, debug_image)
+        journal_events(session_id, session, logged)
+        schedule_session_timers(session_id, session)
+        result.update(event_delta(session, event_cursor))
+        return result
+
+def apply_verdict(session, infraction_type, infraction_reason, current_time, debug_info, debug_image):
+    """Run the infraction logic on one frame's verdict (under the session's lock). Returns the response dict"""
+    debug_info['current_infraction'] = session.correction_infraction
+    debug_info['warning_count'] = session.warning_count
+    warning = None
+    debug_info['correction_window_active'] = session.correction_timer_active
 
     # Correction window clearing logic debug
-    if not infraction_type and session['correction_timer_active']:
+    if not infraction_type and session.correction_timer_active:
         debug_info['correction_window_cleared'] = True
         # Properly clear all correction window state
-        session['correction_timer_active'] = False
-        session['correction_timer_start'] = None
-        session['correction_infraction'] = None
-        session['correction_reason'] = None
-        session['correction_window_history'].append({
-            'infraction': session.get('correction_infraction'),
-            'reason': session.get('correction_reason'),
-            'corrected': True,
-            'time': current_time
-        })
-        session['proctoring_event_log'].append({
-            'event': 'corrected_in_time',
-            'infraction': session.get('correction_infraction'),
-            'time': current_time,
-            'warning_count': session['warning_count']
-        })
+        session.correction_timer_active = False
+        session.correction_timer_start = None
+        session.correction_infraction = None
+        session.correction_reason = None
+        session.log_correction(session.correction_infraction, session.correction_reason, True, current_time)
+        session.log_event('corrected_in_time', current_time, infraction=session.correction_infraction, warning_count=session.warning_count)
     else:
         debug_info['correction_window_cleared'] = False
 
     # Strict proctoring logic
     # 1. If correction window is active, check if expired
-    if session['correction_timer_active']:
-        seconds_left = CORRECTION_WINDOW_DURATION - (current_time - session['correction_timer_start'])
+    if session.correction_timer_active:
+        seconds_left = CORRECTION_WINDOW_DURATION - (current_time - session.correction_timer_start)
         if seconds_left <= 0:
             # Correction window expired, terminate immediately
-            session['terminated'] = True
-            session['correction_timer_active'] = False
-            session['correction_timer_start'] = None
-            session['correction_window_history'].append({'infraction': session['correction_infraction'], 'reason': session['correction_reason'], 'corrected': False, 'time': current_time})
-            session['proctoring_event_log'].append({'event': 'terminated', 'reason': f"Terminated: {session.get('correction_reason', 'Infraction')} (correction window expired)", 'time': current_time, 'warning_count': session['warning_count']})
-            session['termination_reason'] = f"Terminated: {session.get('correction_reason', 'Infraction')} (correction window expired)"
-            session['correction_infraction'] = None
-            session['correction_reason'] = None
-            return jsonify({'terminated': True, 'termination_reason': session['termination_reason'], 'warning_count': session['warning_count'], 'max_warnings': MAX_WARNINGS, 'correction_window': None, 'debug_info': debug_info, 'debug_image': debug_image})
+            terminate_expired_window(session, current_time)
+            return {'terminated': True, 'termination_reason': session.termination_reason, 'warning_count': session.warning_count, 'max_warnings': MAX_WARNINGS, 'correction_window': None, 'debug_info': debug_info, 'debug_image': debug_image}
         else:
             correction_window = {
-                'infraction': session.get('correction_infraction'),
-                'reason': session.get('correction_reason'),
-                'start_time': session['correction_timer_start'],
+                'infraction': session.correction_infraction,
+                'reason': session.correction_reason,
+                'start_time': session.correction_timer_start,
                 'duration': CORRECTION_WINDOW_DURATION,
                 'seconds_left': max(0, seconds_left)
             }
-            return jsonify({
+            return {
                 'warning': warning,
-                'warning_count': session['warning_count'],
+                'warning_count': session.warning_count,
                 'max_warnings': MAX_WARNINGS,
                 'correction_window': correction_window,
                 'terminated': False,
                 'termination_reason': None,
                 'debug_info': debug_info,
                 'debug_image': debug_image
-            })
+            }
 
     # 2. If already terminated, return immediately (do not start new correction window)
-    if session['terminated']:
-        return jsonify({'terminated': True, 'termination_reason': session['termination_reason'], 'warning_count': session['warning_count'], 'max_warnings': MAX_WARNINGS, 'correction_window': None, 'debug_info': debug_info, 'debug_image': debug_image})
+    if session.terminated:
+        return {'terminated': True, 'termination_reason': session.termination_reason, 'warning_count': session.warning_count, 'max_warnings': MAX_WARNINGS, 'correction_window': None, 'debug_info': debug_info, 'debug_image': debug_image}
 
     # 3. If infraction detected
     if infraction_type:
         # Only start/reset if new infraction or window not active
-        if (not session['correction_timer_active'] or
-            session.get('correction_infraction') != infraction_type or
-            session.get('correction_reason') != infraction_reason):
+        if (not session.correction_timer_active or
+            session.correction_infraction != infraction_type or
+            session.correction_reason != infraction_reason):
             # If warning_count is already 4, terminate immediately
-            if session['warning_count'] >= 4:
-                session['terminated'] = True
-                session['termination_reason'] = f'Terminated: {infraction_reason} (max warnings exceeded)'
-                session['proctoring_event_log'].append({'event': 'terminated', 'reason': session['termination_reason'], 'time': current_time})
-                return jsonify({'terminated': True, 'termination_reason': session['termination_reason'], 'warning_count': session['warning_count'], 'max_warnings': MAX_WARNINGS, 'correction_window': None, 'debug_info': debug_info, 'debug_image': debug_image})
+            if session.warning_count >= 4:
+                session.terminated = True
+                session.termination_reason = f'Terminated: {infraction_reason} (max warnings exceeded)'
+                session.log_event('terminated', current_time, reason=session.termination_reason)
+                terminations_total.inc('max_warnings')
+                return {'terminated': True, 'termination_reason': session.termination_reason, 'warning_count': session.warning_count, 'max_warnings': MAX_WARNINGS, 'correction_window': None, 'debug_info': debug_info, 'debug_image': debug_image}
             # Start/reset the correction window for this new infraction
-            session['correction_timer_active'] = True
-            session['correction_timer_start'] = current_time
-            session['correction_infraction'] = infraction_type
-            session['correction_reason'] = infraction_reason
-            session['warning_count'] += 1
-            session['proctoring_event_log'].append({'event': 'correction_window_started', 'infraction': infraction_type, 'reason': infraction_reason, 'time': current_time, 'warning_count': session['warning_count']})
+            session.correction_timer_active = True
+            session.correction_timer_start = current_time
+            session.correction_infraction = infraction_type
+            session.correction_reason = infraction_reason
+            session.warning_count += 1
+            session.log_event('correction_window_started', current_time, infraction=infraction_type, reason=infraction_reason, warning_count=session.warning_count)
+            infractions_total.inc(infraction_type)
             warning = infraction_reason
             # If warning_count is now 4 after increment, terminate immediately
-            if session['warning_count'] >= 4:
-                session['terminated'] = True
-                session['correction_timer_active'] = False
-                session['correction_timer_start'] = None
-                session['termination_reason'] = f'Terminated: {infraction_reason} (max warnings exceeded)'
-                session['proctoring_event_log'].append({'event': 'terminated', 'reason': session['termination_reason'], 'time': current_time})
-                return jsonify({'terminated': True, 'termination_reason': session['termination_reason'], 'warning_count': session['warning_count'], 'max_warnings': MAX_WARNINGS, 'correction_window': None, 'debug_info': debug_info, 'debug_image': debug_image})
+            if session.warning_count >= 4:
+                session.terminated = True
+                session.correction_timer_active = False
+                session.correction_timer_start = None
+                session.termination_reason = f'Terminated: {infraction_reason} (max warnings exceeded)'
+                session.log_event('terminated', current_time, reason=session.termination_reason)
+                terminations_total.inc('max_warnings')
+                return {'terminated': True, 'termination_reason': session.termination_reason, 'warning_count': session.warning_count, 'max_warnings': MAX_WARNINGS, 'correction_window': None, 'debug_info': debug_info, 'debug_image': debug_image}
             # Return the new correction window
             correction_window = {
-                'infraction': session.get('correction_infraction'),
-                'reason': session.get('correction_reason'),
-                'start_time': session['correction_timer_start'],
+                'infraction': session.correction_infraction,
+                'reason': session.correction_reason,
+                'start_time': session.correction_timer_start,
                 'duration': CORRECTION_WINDOW_DURATION,
                 'seconds_left': CORRECTION_WINDOW_DURATION
             }
-            return jsonify({
+            return {
                 'warning': warning,
-                'warning_count': session['warning_count'],
+                'warning_count': session.warning_count,
                 'max_warnings': MAX_WARNINGS,
                 'correction_window': correction_window,
                 'terminated': False,
                 'termination_reason': None,
                 'debug_info': debug_info,
                 'debug_image': debug_image
-            })
+            }
         else:
             # If same infraction and window is already active, return current window
             correction_window = {
-                'infraction': session.get('correction_infraction'),
-                'reason': session.get('correction_reason'),
-                'start_time': session['correction_timer_start'],
+                'infraction': session.correction_infraction,
+                'reason': session.correction_reason,
+                'start_time': session.correction_timer_start,
                 'duration': CORRECTION_WINDOW_DURATION,
-                'seconds_left': CORRECTION_WINDOW_DURATION - (current_time - session['correction_timer_start'])
+                'seconds_left': CORRECTION_WINDOW_DURATION - (current_time - session.correction_timer_start)
             }
-            return jsonify({
+            return {
                 'warning': warning,
-                'warning_count': session['warning_count'],
+                'warning_count': session.warning_count,
                 'max_warnings': MAX_WARNINGS,
                 'correction_window': correction_window,
                 'terminated': False,
                 'termination_reason': None,
                 'debug_info': debug_info,
                 'debug_image': debug_image
-            })
+            }
 
     # 4. If no infraction and correction window is active, user corrected in time
-    if not infraction_type and session['correction_timer_active']:
-        session['correction_timer_active'] = False
-        session['correction_timer_start'] = None
-        session['correction_window_history'].append({'infraction': session['correction_infraction'], 'reason': session['correction_reason'], 'corrected': True, 'time': current_time})
-        session['proctoring_event_log'].append({'event': 'corrected_in_time', 'infraction': session['correction_infraction'], 'time': current_time, 'warning_count': session['warning_count']})
-        session['correction_infraction'] = None
-        session['correction_reason'] = None
-        return jsonify({'warning': warning, 'warning_count': session['warning_count'], 'max_warnings': MAX_WARNINGS, 'correction_window': None, 'terminated': False, 'termination_reason': None, 'debug_info': debug_info, 'debug_image': debug_image})
+    if not infraction_type and session.correction_timer_active:
+        session.correction_timer_active = False
+        session.correction_timer_start = None
+        session.log_correction(session.correction_infraction, session.correction_reason, True, current_time)
+        session.log_event('corrected_in_time', current_time, infraction=session.correction_infraction, warning_count=session.warning_count)
+        session.correction_infraction = None
+        session.correction_reason = None
+        return {'warning': warning, 'warning_count': session.warning_count, 'max_warnings': MAX_WARNINGS, 'correction_window': None, 'terminated': False, 'termination_reason': None, 'debug_info': debug_info, 'debug_image': debug_image}
 
     # 5. Default: no correction window, not terminated
-    return jsonify({'warning': warning, 'warning_count': session['warning_count'], 'max_warnings': MAX_WARNINGS, 'correction_window': None, 'terminated': False, 'termination_reason': None, 'debug_info': debug_info, 'debug_image': debug_image})
+    return {'warning': warning, 'warning_count': session.warning_count, 'max_warnings': MAX_WARNINGS, 'correction_window': None, 'terminated': False, 'termination_reason': None, 'debug_info': debug_info, 'debug_image': debug_image}
+
+def terminate_expired_window(session, current_time):
+    """Terminate a session whose correction window ran out (under the session's lock)"""
+    session.terminated = True
+    session.correction_timer_active = False
+    session.correction_timer_start = None
+    session.log_correction(session.correction_infraction, session.correction_reason, False, current_time)
+    session.log_event('terminated', current_time, reason=f"Terminated: {session.correction_reason} (correction window expired)", warning_count=session.warning_count)
+    session.termination_reason = f"Terminated: {session.correction_reason} (correction window expired)"
+    terminations_total.inc('correction_window_expired')
+    session.correction_infraction = None
+    session.correction_reason = None
+
+def journal_events(session_id, session, since):
+    """Queue the session's events logged after the first ``since`` for the event journal (under the session's lock)"""
+    if event_journal is not None and len(session.proctoring_event_log) > since:
+        event_journal.append(session_id, since, session.proctoring_event_log.to_list(since))
+
+def schedule_session_timers(session_id, session):
+    """Arm the session's correction-window or idle timer after it changed (under the session's lock)"""
+    if not SESSION_TIMERS:
+        return
+    if session.terminated:
+        session_timers.cancel(('window', session_id))
+        session_timers.cancel(('idle', session_id))
+    elif session.correction_timer_active:
+        session_timers.schedule(('window', session_id), session.correction_timer_start + CORRECTION_WINDOW_DURATION, expire_correction_window, session_id)
+        session_timers.cancel(('idle', session_id))
+    else:
+        session_timers.cancel(('window', session_id))
+        if SESSION_IDLE_TIMEOUT > 0 and session.frame_time is not None:
+            session_timers.schedule(('idle', session_id), session.frame_time + SESSION_IDLE_TIMEOUT, expire_idle_session, session_id)
+
+def expire_correction_window(session_id):
+    """Timer callback: terminate a session whose correction window ran out before a frame corrected it"""
+    if session_store.get(session_id) is None:
+        return
+    with session_store.session(session_id) as session:
+        if session.terminated or not session.correction_timer_active:
+            return
+        expires_at = session.correction_timer_start + CORRECTION_WINDOW_DURATION
+        now = time.time()
+        if expires_at > now:
+            # A later frame restarted the window or moved it (see SessionRecord.frame_clock)
+            schedule_session_timers(session_id, session)
+            return
+        in_flight_since = frame_sequencer.in_flight_since(session_id)
+        if in_flight_since is not None and in_flight_since < expires_at and now < expires_at + WINDOW_EXPIRY_GRACE:
+            # Applying that frame re-arms this timer; look again in a tick in case it is dropped
+            session_timers.schedule(('window', session_id), min(now + session_timers.tick, expires_at + WINDOW_EXPIRY_GRACE), expire_correction_window, session_id)
+            return
+        logged = len(session.proctoring_event_log)
+        terminate_expired_window(session, expires_at)
+        journal_events(session_id, session, logged)
+        schedule_session_timers(session_id, session)
+        state = session_state(session_id, session)
+    timer_expiries_total.inc('correction_window')
+    session_subscribers.publish(session_id, state)
+
+def expire_idle_session(session_id):
+    """Timer callback: a session that stopped sending frames gets a no_face correction window"""
+    if session_store.get(session_id) is None:
+        return
+    now = time.time()
+    with session_store.session(session_id) as session:
+        if session.terminated or session.correction_timer_active or session.frame_time is None:
+            return
+        if session.frame_time + SESSION_IDLE_TIMEOUT > now:
+            schedule_session_timers(session_id, session)
+            return
+        logged = len(session.proctoring_event_log)
+        apply_verdict(session, WARNING_TYPES['NO_FACE'], IDLE_REASON, now, {}, None)
+        journal_events(session_id, session, logged)
+        schedule_session_timers(session_id, session)
+        state = session_state(session_id, session)
+    timer_expiries_total.inc('idle')
+    session_subscribers.publish(session_id, state)
+
+def event_delta(session, event_cursor):
+    """Response fields that bring a client holding the first ``event_cursor`` events up to date"""
+    delta = {'event_cursor': len(session.proctoring_event_log)}
+    if event_cursor is not None:
+        delta['events_start'], delta['proctoring_events'] = session.events_since(event_cursor)
+    return delta
+
+def session_state(session_id, session=None, event_cursor=None):
+    """Current proctoring state of a session in the /proctor response shape"""
+    if session is None:
+        session = session_store.get(session_id)
+    if session is None:
+        session = SessionRecord(session_id)
+    correction_window = None
+    if session.correction_timer_active:
+        correction_window = {
+            'infraction': session.correction_infraction,
+            'reason': session.correction_reason,
+            'start_time': session.correction_timer_start,
+            'duration': CORRECTION_WINDOW_DURATION,
+            'seconds_left': max(0, CORRECTION_WINDOW_DURATION - (time.time() - session.correction_timer_start))
+        }
+    return {
+        'warning_count': session.warning_count,
+        'max_warnings': MAX_WARNINGS,
+        'correction_window': correction_window,
+        'terminated': session.terminated,
+        'termination_reason': session.termination_reason,
+        **event_delta(session, event_cursor)
+    }
+
+@sock.route('/proctor-stream/<session_id>')
+def proctor_stream(ws, session_id):
+    """Persistent proctoring channel.
+
+    The client sends binary JPEG/WebP frames (and optional JSON text messages such
+    as {"debug": true}); the server answers only with state changes and tells the
+    client which frame interval to use ('pace' events).
+    """
+    stream = StreamState(STREAM_IDLE_INTERVAL_MS, STREAM_ACTIVE_INTERVAL_MS)
+    # Timer threads push changes too, so sends and stream updates take a lock
+    send_lock = threading.Lock()
+
+    def send(payload):
+        with send_lock:
+            ws.send(json.dumps(payload))
+
+    def send_updates(result):
+        with send_lock:
+            for update in stream.updates(result):
+                ws.send(json.dumps(update))
+
+    send(stream.snapshot(session_state(session_id)))
+    unsubscribe = session_subscribers.subscribe(session_id, lambda state: send_updates(session_state(session_id, event_cursor=stream.event_cursor)))
+    try:
+        stream_frames(ws, session_id, stream, send, send_updates)
+    finally:
+        unsubscribe()
+
+def stream_frames(ws, session_id, stream, send, send_updates):
+    """Receive loop of /proctor-stream"""
+    debug_flag = None
+    order = (None, None)
+    while True:
+        message = ws.receive()
+        if message is None:
+            break
+        if isinstance(message, str):
+            # {"seq": n, "captured_at": ms} tags the next binary frame; {"event_cursor": n}
+            # asks for the events after the first n, which are then pushed as they happen
+            try:
+                options = json.loads(message)
+                debug_flag = options.get('debug', debug_flag)
+                order = parse_frame_order(options.get('seq'), options.get('captured_at'))
+                if 'event_cursor' in options:
+                    stream.event_cursor = parse_event_cursor(options['event_cursor'])
+            except (ValueError, AttributeError):
+                pass
+            continue
+        (seq, captured_at), order = order, (None, None)
+        try:
+            with stage_seconds.time('decode'):
+                frame = decode_frame(message, MAX_FRAME_WIDTH, frame_slot)
+            frame = share_frame(frame) if frame is not None else None
+        except Exception:
+            frame = None
+        if frame is None:
+            send({'event': 'error', 'warning': 'Invalid image data.'})
+            continue
+        try:
+            result = process_frame(session_id, frame, debug_flag, seq, captured_at, stream.event_cursor)
+        except FrameDropped as drop:
+            # A newer frame of this session is already being handled
+            shed_frames_total.inc(drop.reason)
+            continue
+        except FrameRejected as rejection:
+            # Nothing changed for this session; a rejecting server also tells the client to back off
+            shed_frames_total.inc(rejection.reason)
+            if OVERLOAD_POLICY != 'skip':
+                send({'event': 'busy', 'reason': rejection.reason, 'retry_after_ms': rejection.retry_after * 1000})
+            continue
+        finally:
+            release_frame(frame)
+        send_updates(result)
+        if result['terminated']:
+            break
 
 @app.route('/session-status/<session_id>', methods=['GET'])
 def get_session_status(session_id):
     """Get current session status"""
-    if session_id not in session_data:
+    session = session_store.get(session_id)
+    if session is None:
         return jsonify({'error': 'Session not found'}), 404
     
-    session = session_data[session_id]
     current_time = time.time()
 
     return jsonify({
         'session_id': session_id,
-        'warning_count': session['warning_count'],
+        'warning_count': session.warning_count,
         'max_warnings': MAX_WARNINGS,
-        'terminated': session['terminated'],
-        'quit_reason': session['quit_reason'],
-        'time_since_last_face': round(current_time - session['last_frontal_face_time'], 2),
-        'issued_warnings': list(session['issued_warnings'])
+        'terminated': session.terminated,
+        'quit_reason': session.quit_reason,
+        'time_since_last_face': round(current_time - session.last_frontal_face_time, 2),
+        'issued_warnings': session.issued_warnings()
+    })
+
+@app.route('/session-events/<session_id>', methods=['GET'])
+def get_session_events(session_id):
+    """One page of a session's full event log, spilled events included (?cursor=&limit=)"""
+    session = session_store.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    cursor = parse_event_cursor(request.args.get('cursor')) or 0
+    limit = parse_event_cursor(request.args.get('limit')) or EVENT_PAGE_SIZE
+    log = session.proctoring_event_log
+    start = max(cursor, log.first_index)
+    events = log.to_list(start, include_spilled=True, stop=start + min(limit, EVENT_PAGE_MAX))
+    end = start + len(events)
+    return jsonify({
+        'session_id': session_id,
+        'events': events,
+        'start': start,
+        'next_cursor': end if end < len(log) else None,
+        'total': len(log)
     })
 
 @app.route('/reset-session/<session_id>', methods=['POST'])
 def reset_session(session_id):
     """Reset session data"""
-    if session_id in session_data:
-        del session_data[session_id]
+    session_store.delete(session_id)
+    debug_frames.discard(session_id)
+    active_sessions.discard(session_id)
+    frame_sequencer.discard(session_id)
+    session_timers.cancel(('window', session_id))
+    session_timers.cancel(('idle', session_id))
+    if frame_executor is not None:
+        frame_executor.discard(session_id)
+    if frame_tracker is not None:
+        frame_tracker.discard(session_id)
     return jsonify({'message': 'Session reset successfully'})
 
+@app.route('/debug-frame/<session_id>', methods=['GET'])
+def get_debug_frame(session_id):
+    """Latest debug overlay image for a session (?back=n for older frames)"""
+    entry = debug_frames.get(session_id, request.args.get('back', 0, type=int))
+    if entry is None:
+        return jsonify({'error': 'No debug frame available'}), 404
+    timestamp, jpeg_bytes = entry
+    return Response(jpeg_bytes, mimetype='image/jpeg', headers={'X-Frame-Time': str(timestamp), 'Cache-Control': 'no-store'})
+
+@app.route('/pool-stats', methods=['GET'])
+def pool_stats():
+    """Model pool sizes and checkout wait times, the model variant, the inference threads' queue
+    and the inference processes"""
+    return jsonify({
+        'pools': [pool.stats() for pool in detection_pipeline.pools()],
+        'models': model_backend.describe(),
+        'inference': frame_executor.stats() if frame_executor else None,
+        'inference_processes': inference_processes.stats() if inference_processes else None,
+        'sequencing': frame_sequencer.stats()
+    })
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """200 once this worker's models are loaded and warmed up (503 before), with its startup timings"""
+    return jsonify({'ready': startup_report.is_ready, **startup_report.to_dict()}), 200 if startup_report.is_ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics of this worker"""
+    return Response(metrics.render(), content_type=MetricsRegistry.CONTENT_TYPE)
+
+@app.route('/input-stats', methods=['GET'])
+def input_stats():
+    """Frames resized and cropped before inference, and the audited agreement with full resolution"""
+    return jsonify(input_normalizer.stats())
+
+@app.route('/tracking-stats', methods=['GET'])
+def tracking_stats():
+    """Frames per tracking path, detection time per path and the audited agreement rate"""
+    if frame_tracker is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **frame_tracker.stats()})
+
+@app.route('/recording-analysis', methods=['POST'])
+def start_recording_analysis():
+    """Analyze saved recordings ({"recordings": [file names in uploads/], "sample_fps": 2}; all by default)"""
+    data = request.get_json(silent=True) or {}
+    if any(job.running() for job in analysis_jobs.values()):
+        return jsonify({'error': 'A recording analysis is already running.'}), 409
+    names = data.get('recordings')
+    if names is None:
+        paths = sorted(glob.glob(os.path.join(UPLOADS_DIR, '*.webm')))
+    else:
+        if not isinstance(names, list):
+            return jsonify({'error': 'recordings must be a list of file names.'}), 400
+        paths = [os.path.join(UPLOADS_DIR, os.path.basename(str(name))) for name in names]
+        missing = [os.path.basename(path) for path in paths if not os.path.isfile(path)]
+        if missing:
+            return jsonify({'error': 'Recordings not found.', 'missing': missing}), 404
+    if not paths:
+        return jsonify({'error': 'No recordings to analyze.'}), 400
+    try:
+        sample_fps = float(data.get('sample_fps', ANALYSIS_SAMPLE_FPS))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'sample_fps must be a number.'}), 400
+    # Loaded on first use so workers that never analyze recordings skip it at startup
+    from proctor_analyze import AnalysisJob
+    job_id = uuid.uuid4().hex
+    job = AnalysisJob(job_id, paths, os.path.join(ANALYSIS_DIR, f'{job_id}.jsonl'), ANALYSIS_WORKERS, sample_fps)
+    analysis_jobs[job_id] = job.start()
+    return jsonify(job.to_dict()), 202
+
+@app.route('/recording-analysis/<job_id>', methods=['GET'])
+def get_recording_analysis(job_id):
+    """Progress of an analysis job and the results of its finished recordings"""
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Analysis job not found.'}), 404
+    return jsonify(job.to_dict(include_results=True))
+
 @app.route('/analyze_frame', methods=['POST'])
+@instrumented('/analyze_frame')
 def analyze_frame():
-    if net is None:
-        return jsonify({'success': False, 'error': 'Face detector model not loaded.'}), 500
-    if 'frame' not in request.files:
+    """Pre-flight face check: eye, nose and mouth positions of the main face in the uploaded frame"""
+    upload = request.files.get('frame')
+    if upload is None:
         return jsonify({'success': False, 'error': 'No frame provided.'}), 400
+    try:
+        image_bytes = read_stream(upload.stream, None, MAX_FRAME_BYTES)
+        with stage_seconds.time('decode'):
+            frame = decode_frame(image_bytes, PREFLIGHT_WIDTH)
+    except FrameTooLargeError:
+        return jsonify({'success': False, 'error': 'Image too large.'}), 413
+    if frame is None:
+        return jsonify({'success': False, 'error': 'Invalid image data.'}), 400
+    # Landmarks are returned in the pixels of the uploaded image, not of the reduced decode
+    (w, h) = jpeg_size(image_bytes) or (frame.shape[1], frame.shape[0])
 
-    file = request.files['frame']
-    npimg = np.frombuffer(file.read(), np.uint8)
-    frame = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
-
-    (h, w) = frame.shape[:2]
-    blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
-    net.setInput(blob)
-    detections = net.forward()
+    # Only a client id separates candidates; several of them can share an address (NAT, proxies)
+    client = request.form.get('client_id') or request.headers.get('X-Client-Id')
+    if client is None:
+        return jsonify(preflight_check(frame, w, h))
+    # The answer is in the uploaded image's pixels, so a resized upload is a different frame
+    client = (client, w, h)
+    frame_hash = dhash(frame)
+    result = preflight_cache.get(client, frame_hash)
+    if result is not None:
+        preflight_cache_total.inc('hit')
+        return jsonify({**result, 'cached': True})
+    preflight_cache_total.inc('miss')
+    result = preflight_check(frame, w, h)
+    preflight_cache.put(client, frame_hash, result)
+    return jsonify(result)
 
-    # Find the most confident face detection
-    best_detection_idx = -1
-    highest_confidence = 0.0
-    for i in range(0, detections.shape[2]):
-        confidence = detections[0, 0, i, 2]
-        if confidence > highest_confidence:
-            highest_confidence = confidence
-            best_detection_idx = i
-
-    if highest_confidence > 0.6: # Confidence threshold
-        box = detections[0, 0, best_detection_idx, 3:7] * np.array([w, h, w, h])
-        (startX, startY, endX, endY) = box.astype("int")
-        
-        # Simple estimation of landmarks based on the bounding box
-        # This is a basic approximation. A real landmark detector model would be more accurate.
-        landmarks = {
-            "left_eye": {"x": int(startX + (endX - startX) * 0.25), "y": int(startY + (endY - startY) * 0.3)},
-            "right_eye": {"x": int(startX + (endX - startX) * 0.75), "y": int(startY + (endY - startY) * 0.3)},
-            "nose": {"x": int(startX + (endX - startX) * 0.5), "y": int(startY + (endY - startY) * 0.5)},
-            "mouth": {"x": int(startX + (endX - startX) * 0.5), "y": int(startY + (endY - startY) * 0.8)},
-        }
-        return jsonify({'success': True, 'landmarks': landmarks})
-    else:
-        return jsonify({'success': False, 'error': 'No face detected.'})
+def preflight_check(frame, width, height):
+    """The largest FaceMesh face as eye/nose/mouth points. With the res10 SSD loaded, frames
+    without a confident face are answered before FaceMesh runs."""
+    best = None
+    # The second run reuses the normalized frame of the first
+    values = pipeline_inputs(frame)
+    if face_net_pool is not None:
+        values = detection_pipeline.run(values, ['face_detections'])
+        detections = values['face_detections']
+        confidences = detections[0, 0, :, 2]
+        best = int(np.argmax(confidences)) if confidences.size else None
+        if best is None or confidences[best] <= 0.6:  # Confidence threshold
+            return {'success': False, 'error': 'No face detected.'}
+    faces = landmarks_array(detection_pipeline.run(values, ['face_landmarks']).get('face_landmarks'))
+    if len(faces):
+        extent = faces[:, :, :2].max(axis=1) - faces[:, :, :2].min(axis=1)
+        main_face = faces[int(np.argmax(extent[:, 0] * extent[:, 1]))]
+        return {'success': True, 'landmarks': face_keypoints(main_face, width, height), 'faces': len(faces)}
+    if best is None:
+        return {'success': False, 'error': 'No face detected.'}
+    # FaceMesh missed a face the SSD is confident about: estimate the points from its box
+    box = detections[0, 0, best, 3:7] * np.array([width, height, width, height])
+    (startX, startY, endX, endY) = box.astype("int")
+    landmarks = {
+        "left_eye": {"x": int(startX + (endX - startX) * 0.25), "y": int(startY + (endY - startY) * 0.3)},
+        "right_eye": {"x": int(startX + (endX - startX) * 0.75), "y": int(startY + (endY - startY) * 0.3)},
+        "nose": {"x": int(startX + (endX - startX) * 0.5), "y": int(startY + (endY - startY) * 0.5)},
+        "mouth": {"x": int(startX + (endX - startX) * 0.5), "y": int(startY + (endY - startY) * 0.8)},
+    }
+    return {'success': True, 'landmarks': landmarks, 'faces': 1, 'estimated': True}
 
 if __name__ == '__main__':
+    if STARTUP_MODE == 'preload':
+        start_models()
     app.run(host='0.0.0.0', port=5001)
\ No newline at end of file
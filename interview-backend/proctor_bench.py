@@ -0,0 +1,396 @@
+"""Replay benchmark for the /proctor pipeline.
+
+Decodes recordings (default: uploads/*.webm) or generates synthetic frames,
+encodes them as the interview page does (JPEG, quality 70) and replays them
+through the proctoring logic, either in-process or against a running service
+over HTTP, from N concurrent simulated sessions.
+
+Reports per-stage latency (p50/p95/p99), frames per second, frames per CPU
+second and RSS growth, and appends the result as one JSON line to
+--output so runs can be compared (--compare) to catch regressions.
+
+    python proctor_bench.py --sessions 4 --frames 200
+    python proctor_bench.py --mode http --url http://localhost:5001 --server-pid 1234
+    python proctor_bench.py --synthetic --debug --compare bench-results.jsonl
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+
+from proctoring.stats import percentile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# --- Frame sources ---
+def video_frames(paths, max_frames, every=1):
+    """BGR frames from video files (files without a decodable video track are skipped)"""
+    frames = []
+    for path in paths:
+        capture = cv2.VideoCapture(path)
+        index = 0
+        while len(frames) < max_frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            if index % every == 0:
+                frames.append(frame)
+            index += 1
+        capture.release()
+        if len(frames) >= max_frames:
+            break
+    return frames
+
+
+def synthetic_frames(count, width=640, height=480, image=None):
+    """A moving scene: a still image (e.g. a face) drifting over a noisy background, or moving blobs"""
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(count):
+        frame = np.full((height, width, 3), 110, np.uint8)
+        frame = cv2.add(frame, rng.integers(0, 8, frame.shape, dtype=np.uint8))
+        dx = int(width * 0.05 * np.sin(i / 15))
+        if image is not None:
+            scale = min(width / image.shape[1], height / image.shape[0]) * 0.8
+            still = cv2.resize(image, None, fx=scale, fy=scale)
+            y = (height - still.shape[0]) // 2
+            x = max(0, min(width - still.shape[1], (width - still.shape[1]) // 2 + dx))
+            frame[y:y + still.shape[0], x:x + still.shape[1]] = still
+        else:
+            cv2.circle(frame, (width // 2 + dx, height // 2), height // 5, (60, 90, 160), -1)
+            cv2.rectangle(frame, (width // 4 - dx, height // 3), (width // 4 - dx + 60, height // 3 + 90), (30, 30, 30), -1)
+        frames.append(frame)
+    return frames
+
+
+def encode_frames(frames, quality=70):
+    return [cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes() for frame in frames]
+
+
+# --- Measurements ---
+class StageTimes:
+    """Latency samples per stage, shared by the session threads"""
+
+    def __init__(self):
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+
+    def clear(self):
+        with self._lock:
+            self._samples = {}
+
+    def summary(self):
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+        return {stage: {
+            'count': len(values),
+            'p50_ms': round(percentile(values, 0.5) * 1000, 3),
+            'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+            'mean_ms': round(sum(values) / len(values) * 1000, 3),
+        } for stage, values in sorted(samples.items())}
+
+
+def rss_bytes(pid='self'):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if pid == 'self':
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+    return None
+
+
+def cpu_seconds(pid='self'):
+    if pid == 'self':
+        return time.process_time()
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except OSError:
+        return None
+
+
+# --- Replay ---
+def replay(sessions, run_session):
+    """Run ``run_session(session_index)`` in one thread per simulated session"""
+    errors = []
+
+    def target(index):
+        try:
+            run_session(index)
+        except Exception as e:
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=target, args=(i,), name=f'bench-session-{i}') for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def paced(frames, fps):
+    """Yield frames, sleeping to keep ``fps`` per session (0 = as fast as possible)"""
+    interval = 1.0 / fps if fps else 0
+    next_at = time.perf_counter()
+    for frame in frames:
+        if interval:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            next_at += interval
+        yield frame
+
+
+def in_process_runner(args, times):
+    """Replays through proctor_api.evaluate_frame, timing decode, pipeline stages, overlay encode and JSON"""
+    if args.debug:
+        os.environ.setdefault('PROCTOR_DEBUG_IMAGE', 'request')
+    sys.path.insert(0, BACKEND_DIR)
+    import proctor_api
+    from proctoring.frame_io import decode_frame
+
+    proctor_api.detection_pipeline.add_observer(times.record)
+    render_debug_image = proctor_api.render_debug_image
+
+    def timed_render(*render_args):
+        started = time.perf_counter()
+        jpeg_bytes = render_debug_image(*render_args)
+        times.record('overlay_encode', time.perf_counter() - started)
+        return jpeg_bytes
+
+    proctor_api.render_debug_image = timed_render
+    debug_flag = '1' if args.debug else None
+
+    def process(session_id, data):
+        started = time.perf_counter()
+        frame = decode_frame(data, proctor_api.MAX_FRAME_WIDTH)
+        decoded = time.perf_counter()
+        times.record('decode', decoded - started)
+        result = proctor_api.evaluate_frame(session_id, frame, debug_flag)
+        if args.extra_outputs:
+            proctor_api.detection_pipeline.run(proctor_api.pipeline_inputs(frame), args.extra_outputs)
+        evaluated = time.perf_counter()
+        times.record('evaluate', evaluated - decoded)
+        json.dumps(result)
+        finished = time.perf_counter()
+        times.record('json', finished - evaluated)
+        times.record('total', finished - started)
+
+    return process, 'self'
+
+
+def http_runner(args, times):
+    """Replays against a running service: POST /proctor/<session_id> with raw JPEG bodies"""
+    import requests
+
+    local = threading.local()
+
+    def process(session_id, data):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = requests.Session()
+        started = time.perf_counter()
+        response = client.post(
+            f'{args.url.rstrip("/")}/proctor/{session_id}', data=data,
+            headers={'Content-Type': 'image/jpeg', **({'X-Proctor-Debug': '1'} if args.debug else {})},
+            timeout=30)
+        received = time.perf_counter()
+        response.raise_for_status()
+        response.json()
+        finished = time.perf_counter()
+        times.record('request', received - started)
+        times.record('json', finished - received)
+        times.record('total', finished - started)
+
+    return process, args.server_pid
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args):
+    if args.synthetic:
+        source = 'synthetic'
+        frames = synthetic_frames(args.frames, image=cv2.imread(args.image) if args.image else None)
+    else:
+        paths = sorted(args.videos or glob.glob(os.path.join(BACKEND_DIR, 'uploads', '*.webm')))
+        frames = video_frames(paths, args.frames, args.every)
+        source = 'video'
+        if not frames:
+            print(f'No video frames could be decoded from {len(paths)} file(s); using synthetic frames.')
+            source = 'synthetic'
+            frames = synthetic_frames(args.frames, image=cv2.imread(args.image) if args.image else None)
+    encoded = encode_frames(frames)
+    times = StageTimes()
+    process, pid = (in_process_runner if args.mode == 'inprocess' else http_runner)(args, times)
+
+    # One untimed frame per session so model creation and warm-up are not measured
+    session_ids = [f'bench-{os.getpid()}-{i}' for i in range(args.sessions)]
+    replay(args.sessions, lambda i: process(session_ids[i] + '-warmup', encoded[0]))
+    times.clear()
+
+    rss_start = rss_bytes(pid) if pid else None
+    cpu_start = cpu_seconds(pid) if pid else None
+    started = time.perf_counter()
+    errors = replay(args.sessions, lambda i: [process(session_ids[i], data) for data in paced(encoded, args.fps)])
+    wall = time.perf_counter() - started
+    cpu_end = cpu_seconds(pid) if pid else None
+    rss_end = rss_bytes(pid) if pid else None
+
+    stages = times.summary()
+    processed = stages.get('total', {}).get('count', 0)
+    cpu = (cpu_end - cpu_start) if cpu_start is not None and cpu_end is not None else None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'config': {
+            'mode': args.mode,
+            'source': source,
+            'frames_per_session': len(encoded),
+            'frame_size': list(frames[0].shape[1::-1]),
+            'sessions': args.sessions,
+            'fps_per_session': args.fps,
+            'debug_image': args.debug,
+            'extra_outputs': args.extra_outputs,
+            'settings': {key: value for key, value in sorted(os.environ.items()) if key.startswith('PROCTOR_')},
+        },
+        'results': {
+            'frames': processed,
+            'errors': len(errors),
+            'wall_s': round(wall, 3),
+            'fps': round(processed / wall, 3) if wall else 0.0,
+            'cpu_s': round(cpu, 3) if cpu is not None else None,
+            'fps_per_core': round(processed / cpu, 3) if cpu else None,
+            'rss_start_mb': round(rss_start / 2 ** 20, 1) if rss_start else None,
+            'rss_end_mb': round(rss_end / 2 ** 20, 1) if rss_end else None,
+            'rss_growth_mb': round((rss_end - rss_start) / 2 ** 20, 1) if rss_start and rss_end else None,
+            'stages': stages,
+        },
+        'error_samples': errors[:5],
+    }
+
+
+# --- Reporting ---
+def comparable_key(record):
+    config = record['config']
+    return (config['mode'], config['source'], config['frames_per_session'], tuple(config['frame_size']),
+            config['sessions'], config['fps_per_session'], config['debug_image'], tuple(config['extra_outputs']))
+
+
+def find_baseline(path, record):
+    """Latest stored run with the same configuration"""
+    if not os.path.exists(path):
+        return None
+    baseline = None
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            candidate = json.loads(line)
+            if comparable_key(candidate) == comparable_key(record):
+                baseline = candidate
+    return baseline
+
+
+def compare(record, baseline, tolerance):
+    """Print changes against a baseline run. Returns the regressions beyond ``tolerance``"""
+    regressions = []
+    current, previous = record['results'], baseline['results']
+    print(f"\nCompared with {baseline['timestamp']} ({baseline.get('commit') or 'unknown commit'}):")
+    for stage, stats in current['stages'].items():
+        old = previous['stages'].get(stage)
+        if not old or not old['p95_ms']:
+            continue
+        change = stats['p95_ms'] / old['p95_ms'] - 1
+        print(f"  {stage:<16} p95 {old['p95_ms']:>9.3f} -> {stats['p95_ms']:>9.3f} ms ({change:+.1%})")
+        if change > tolerance and stats['p95_ms'] - old['p95_ms'] > 1.0:
+            regressions.append(f'{stage} p95 {change:+.1%}')
+    for metric in ('fps', 'fps_per_core'):
+        if current.get(metric) and previous.get(metric):
+            change = current[metric] / previous[metric] - 1
+            print(f'  {metric:<16} {previous[metric]:>13.3f} -> {current[metric]:>9.3f} ({change:+.1%})')
+            if change < -tolerance:
+                regressions.append(f'{metric} {change:+.1%}')
+    return regressions
+
+
+def print_report(record):
+    config, results = record['config'], record['results']
+    print(f"{config['mode']} | {config['source']} frames {config['frame_size'][0]}x{config['frame_size'][1]} | "
+          f"{config['sessions']} session(s) x {config['frames_per_session']} frames")
+    print(f"{'stage':<16} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, stats in results['stages'].items():
+        print(f"{stage:<16} {stats['count']:>7} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f}")
+    print(f"frames {results['frames']}  errors {results['errors']}  wall {results['wall_s']} s  fps {results['fps']}")
+    print(f"cpu {results['cpu_s']} s  fps/core {results['fps_per_core']}  "
+          f"rss {results['rss_start_mb']} -> {results['rss_end_mb']} MB (growth {results['rss_growth_mb']} MB)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay benchmark for the /proctor pipeline')
+    parser.add_argument('--mode', choices=['inprocess', 'http'], default='inprocess')
+    parser.add_argument('--url', default='http://localhost:5001', help='service URL for --mode http')
+    parser.add_argument('--server-pid', type=int, help='service process to measure CPU and RSS of in --mode http')
+    parser.add_argument('--sessions', type=int, default=1, help='concurrent simulated sessions')
+    parser.add_argument('--frames', type=int, default=100, help='frames replayed per session')
+    parser.add_argument('--fps', type=float, default=0, help='frames per second per session (0 = unpaced)')
+    parser.add_argument('--videos', nargs='*', help='recordings to replay (default: uploads/*.webm)')
+    parser.add_argument('--every', type=int, default=1, help='keep every n-th decoded video frame')
+    parser.add_argument('--synthetic', action='store_true', help='use synthetic frames instead of recordings')
+    parser.add_argument('--image', help='still image (e.g. a face) to move around the synthetic frames')
+    parser.add_argument('--debug', action='store_true', help='request the debug overlay image for every frame')
+    parser.add_argument('--extra-outputs', nargs='*', default=[], help='extra pipeline outputs to compute per frame, e.g. pose_landmarks (Holistic)')
+    parser.add_argument('--output', default='bench-results.jsonl', help='JSON lines file the result is appended to')
+    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--compare', help='results file holding the baseline (latest run with the same config)')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='relative slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    record = run_benchmark(args)
+    print_report(record)
+    regressions = []
+    if args.compare:
+        baseline = find_baseline(args.compare, record)
+        if baseline is None:
+            print(f'\nNo run with the same configuration in {args.compare}.')
+        else:
+            regressions = compare(record, baseline, args.tolerance)
+    if not args.no_save:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    if regressions:
+        print('\nRegressions: ' + ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""Produces the SSD model variants that PROCTOR_SSD_VARIANT selects (see proctoring.backends).
+
+Reads the original Caffe models from the model directory (default: next to this
+script) and writes each variant under its file name in SSD_VARIANTS:
+
+- fp16: res10 with half-precision weights (cv2.dnn.shrinkCaffeModel, OpenCV 4.x)
+- onnx: ONNX exports of the SSDs (the caffe2onnx converter)
+- int8: the ONNX exports statically quantized by ONNX Runtime (QDQ, uint8
+  activations and int8 weights), calibrated on frames from uploads/*.webm or
+  synthetic frames. Missing ONNX exports are made first.
+
+Every file written is loaded with cv2.dnn and run on a frame to check that it
+still gives the (1, 1, N, 7) detection output. Existing files are kept unless
+--force is given. The converters are optional installs:
+
+    pip install caffe2onnx onnxruntime
+    python proctor_convert.py onnx int8
+    python proctor_convert.py fp16 --models face
+"""
+import argparse
+import glob
+import importlib.util
+import os
+import subprocess
+import sys
+
+import cv2
+
+from proctor_bench import BACKEND_DIR, synthetic_frames, video_frames
+from proctoring.backends import SSD_INPUTS, SSD_VARIANTS
+
+# Variants this tool writes, in the order they are made (int8 starts from the onnx export)
+CONVERTED_VARIANTS = ('fp16', 'onnx', 'int8')
+
+
+class ConversionError(RuntimeError):
+    pass
+
+
+def ssd_blob(model, frame):
+    scale, mean = SSD_INPUTS[model]
+    return cv2.dnn.blobFromImage(frame, scale, (300, 300), mean)
+
+
+def variant_paths(model_dir, model, variant):
+    """(weights, config or None) paths of one SSD variant"""
+    return tuple(os.path.join(model_dir, name) if name else None for name in SSD_VARIANTS[model][variant])
+
+
+def plan(variants, models):
+    """(model, variant) pairs to write, in conversion order; variants a model has no files for are left out"""
+    return [(model, variant) for variant in CONVERTED_VARIANTS if variant in variants
+            for model in models if variant in SSD_VARIANTS[model]]
+
+
+def convert_fp16(weights, dst):
+    if not hasattr(cv2.dnn, 'shrinkCaffeModel'):
+        raise ConversionError(f'fp16 needs cv2.dnn.shrinkCaffeModel, which OpenCV {cv2.__version__} does not have (use OpenCV 4.x)')
+    cv2.dnn.shrinkCaffeModel(weights, dst)
+
+
+def convert_onnx(weights, config, dst):
+    if importlib.util.find_spec('caffe2onnx') is None:
+        raise ConversionError('onnx needs the caffe2onnx converter (pip install caffe2onnx)')
+    result = subprocess.run([sys.executable, '-m', 'caffe2onnx.convert', '--prototxt', config,
+                             '--caffemodel', weights, '--onnx', dst], capture_output=True, text=True)
+    if result.returncode != 0 or not os.path.exists(dst):
+        raise ConversionError(f'caffe2onnx failed: {(result.stderr or result.stdout).strip()[-500:]}')
+
+
+def quantize_int8(onnx_path, dst, blobs):
+    try:
+        import onnxruntime
+        from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    except ImportError:
+        raise ConversionError('int8 needs ONNX Runtime (pip install onnxruntime)')
+    session = onnxruntime.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+
+    class Calibration(CalibrationDataReader):
+        def __init__(self):
+            self._blobs = iter(blobs)
+
+        def get_next(self):
+            blob = next(self._blobs, None)
+            return None if blob is None else {input_name: blob}
+
+    quantize_static(onnx_path, dst, Calibration(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+
+def check_ssd(weights, config, blob):
+    """Load a written SSD with cv2.dnn and check its output on one blob"""
+    net = cv2.dnn.readNet(weights, config) if config else cv2.dnn.readNet(weights)
+    net.setInput(blob)
+    output = net.forward()
+    if output.ndim != 4 or output.shape[:2] != (1, 1) or output.shape[3] != 7:
+        raise ConversionError(f'{os.path.basename(weights)} gives output of shape {output.shape}, not (1, 1, N, 7)')
+
+
+def convert(model_dir, model, variant, frames, force=False):
+    """Write one variant of one SSD. Returns 'written' or 'exists'; raises ConversionError."""
+    weights, config = variant_paths(model_dir, model, variant)
+    if os.path.exists(weights) and not force:
+        return 'exists'
+    caffe_weights, caffe_config = variant_paths(model_dir, model, 'caffe')
+    if not (os.path.exists(caffe_weights) and os.path.exists(caffe_config)):
+        raise ConversionError(f'the original {model} model ({os.path.basename(caffe_weights)}) is missing')
+    blobs = [ssd_blob(model, frame) for frame in frames]
+    if variant == 'fp16':
+        convert_fp16(caffe_weights, weights)
+    elif variant == 'onnx':
+        convert_onnx(caffe_weights, caffe_config, weights)
+    elif variant == 'int8':
+        onnx_weights = variant_paths(model_dir, model, 'onnx')[0]
+        if not os.path.exists(onnx_weights):
+            convert_onnx(caffe_weights, caffe_config, onnx_weights)
+        quantize_int8(onnx_weights, weights, blobs)
+    check_ssd(weights, config, blobs[0])
+    return 'written'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write the fp16, ONNX and int8 SSD variants from the original Caffe models')
+    parser.add_argument('variants', nargs='+', choices=CONVERTED_VARIANTS)
+    parser.add_argument('--models', nargs='*', choices=list(SSD_VARIANTS), default=list(SSD_VARIANTS))
+    parser.add_argument('--model-dir', default=BACKEND_DIR, help='directory of the models (default: next to this script)')
+    parser.add_argument('--frames', type=int, default=100, help='calibration frames for int8')
+    parser.add_argument('--videos', nargs='*', help='recordings to calibrate on (default: uploads/*.webm)')
+    parser.add_argument('--image', help='still image (e.g. a face) to move around synthetic calibration frames')
+    parser.add_argument('--force', action='store_true', help='overwrite existing variant files')
+    args = parser.parse_args(argv)
+
+    frames = video_frames(sorted(args.videos or glob.glob(os.path.join(BACKEND_DIR, 'uploads', '*.webm'))), args.frames, 5)
+    if not frames:
+        frames = synthetic_frames(args.frames, image=cv2.imread(args.image) if args.image else None)
+    failed = 0
+    for model, variant in plan(args.variants, args.models):
+        name = os.path.basename(variant_paths(args.model_dir, model, variant)[0])
+        try:
+            status = convert(args.model_dir, model, variant, frames, args.force)
+        except (ConversionError, cv2.error) as e:
+            failed += 1
+            print(f'{model} {variant}: failed: {e}')
+            continue
+        print(f'{model} {variant}: {name} {status}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
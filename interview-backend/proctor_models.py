@@ -0,0 +1,243 @@
+"""Accuracy and latency of model variants against the default models, on the CPU.
+
+Runs a local frame set (default: uploads/*.webm, or synthetic frames) through the
+original models and through each variant, one frame at a time, and reports per
+model its load time, p50/p95 latency and speedup, and how closely its output
+agrees with the original's: person and face counts, the mean landmark offset in
+pixels and, over all models, the frame verdict of the infraction logic.
+
+A variant is a comma-separated list of settings (see proctoring.backends):
+ssd=caffe|fp16|onnx|int8, backend=default|opencv|openvino, target=cpu|cpu_fp16
+and tier=lite|standard|full.
+
+    python proctor_models.py ssd=int8 ssd=fp16,target=cpu_fp16 tier=lite
+    python proctor_models.py --synthetic --image face.jpg --models face_mesh holistic tier=full
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+
+from proctor_bench import BACKEND_DIR, StageTimes, git_commit, synthetic_frames, video_frames
+from proctoring.backends import ModelBackend
+
+MODELS = ('person_ssd', 'face_ssd', 'face_mesh', 'holistic')
+SETTINGS = {'ssd': 'ssd_variant', 'backend': 'dnn_backend', 'target': 'dnn_target', 'tier': 'tier'}
+
+
+def parse_variant(spec):
+    """ModelBackend keyword arguments from 'ssd=int8,target=cpu_fp16'"""
+    settings = {}
+    for item in filter(None, spec.split(',')):
+        key, sep, value = item.partition('=')
+        if not sep or key not in SETTINGS:
+            raise ValueError(f'Bad variant setting {item!r} (expected {"|".join(SETTINGS)}=value)')
+        settings[SETTINGS[key]] = value
+    return settings
+
+
+# --- Running a variant ---
+def load_models(backend, models):
+    """(instances, load times in ms, errors) for the requested models of one variant"""
+    factories = {
+        'person_ssd': lambda: backend.create_ssd('person') if backend.ssd_files('person') else None,
+        'face_ssd': lambda: backend.create_ssd('face') if backend.ssd_files('face') else None,
+        'face_mesh': backend.create_face_mesh,
+        'holistic': backend.create_holistic,
+    }
+    instances, load_ms, errors = {}, {}, {}
+    for model in models:
+        started = time.perf_counter()
+        try:
+            instance = factories[model]()
+        except Exception as e:
+            errors[model] = repr(e)
+            continue
+        if instance is None:
+            errors[model] = 'model files not found'
+            continue
+        instances[model] = instance
+        load_ms[model] = round((time.perf_counter() - started) * 1000, 1)
+    return instances, load_ms, errors
+
+
+def run_models(proctor_api, instances, frame, model_frame, rgb_frame, times=None):
+    """Outputs of every loaded model for one frame, in frame pixels, and the frame verdict"""
+    (h, w) = frame.shape[:2]
+    outputs = {}
+
+    def timed(model, run, *args):
+        started = time.perf_counter()
+        result = run(instances[model], *args)[0]
+        if times is not None:
+            times.record(model, time.perf_counter() - started)
+        return result
+
+    if 'person_ssd' in instances:
+        outputs['person_boxes'] = timed('person_ssd', proctor_api.detect_persons, model_frame, frame)
+    if 'face_ssd' in instances:
+        detections = timed('face_ssd', proctor_api.detect_faces, model_frame)
+        outputs['ssd_faces'] = int((detections[0, 0, :, 2] > 0.5).sum())
+    if 'face_mesh' in instances:
+        landmarks = proctor_api.landmarks_array(timed('face_mesh', proctor_api.run_face_mesh, rgb_frame))
+        outputs['landmarks'] = landmarks
+        outputs['verdict'] = proctor_api.frame_verdict(frame.shape, {
+            'person_boxes': outputs.get('person_boxes', []), 'landmarks': landmarks, 'face_region': None})
+        # Faces in a stable order so they can be matched between variants
+        outputs['face_points'] = sorted((face[:, :2] * (w, h) for face in landmarks), key=lambda face: face[:, 0].mean())
+    if 'holistic' in instances:
+        pose = timed('holistic', proctor_api.run_holistic, rgb_frame)
+        outputs['pose_points'] = np.array([(lm.x * w, lm.y * h) for lm in pose.landmark]) if pose else None
+    return outputs
+
+
+# --- Agreement with the default models ---
+def _mean_offset(a, b):
+    """Mean distance in pixels between corresponding points (the shorter set decides which)"""
+    n = min(len(a), len(b))
+    return float(np.linalg.norm(a[:n] - b[:n], axis=1).mean())
+
+
+def agreement(reference, outputs):
+    """How often a variant's outputs match the reference's, per model and for the verdict"""
+    counts = {}
+    offsets = {}
+
+    def agree(model, same):
+        counts.setdefault(model, []).append(bool(same))
+
+    for ref, out in zip(reference, outputs):
+        if 'person_boxes' in ref and 'person_boxes' in out:
+            agree('person_ssd', len(ref['person_boxes']) == len(out['person_boxes']))
+        if 'ssd_faces' in ref and 'ssd_faces' in out:
+            agree('face_ssd', ref['ssd_faces'] == out['ssd_faces'])
+        if 'face_points' in ref and 'face_points' in out:
+            agree('face_mesh', len(ref['face_points']) == len(out['face_points']))
+            agree('verdict', ref['verdict'] == out['verdict'])
+            if ref['face_points'] and len(ref['face_points']) == len(out['face_points']):
+                offsets.setdefault('face_mesh', []).extend(
+                    _mean_offset(a, b) for a, b in zip(ref['face_points'], out['face_points']))
+        if 'pose_points' in ref and 'pose_points' in out:
+            agree('holistic', (ref['pose_points'] is None) == (out['pose_points'] is None))
+            if ref['pose_points'] is not None and out['pose_points'] is not None:
+                offsets.setdefault('holistic', []).append(_mean_offset(ref['pose_points'], out['pose_points']))
+    return {model: {
+        'agreement': round(sum(values) / len(values), 4),
+        'offset_px': round(float(np.mean(offsets[model])), 3) if offsets.get(model) else None,
+    } for model, values in counts.items()}
+
+
+def compare_variants(specs, frames, models):
+    """Result of each variant, the first being the default models"""
+    sys.path.insert(0, BACKEND_DIR)
+    # Only the stage functions of the service are used, not its own models
+    os.environ['PROCTOR_STARTUP'] = 'preload'
+    import proctor_api
+
+    variants = []
+    for spec in specs:
+        backend = ModelBackend(BACKEND_DIR, **parse_variant(spec))
+        if not backend.dnn_target.startswith('cpu'):
+            raise ValueError(f'{spec}: only CPU targets are compared')
+        instances, load_ms, errors = load_models(backend, models)
+        variants.append({'name': spec or 'default', 'backend': backend, 'instances': instances,
+                         'load_ms': load_ms, 'errors': errors, 'times': StageTimes(), 'outputs': []})
+
+    for index, frame in enumerate(frames):
+        model_frame, rgb_frame, _ = proctor_api.input_normalizer.prepare(frame)
+        for variant in variants:
+            # The first frame warms the models up and is not timed
+            times = variant['times'] if index else None
+            variant['outputs'].append(run_models(proctor_api, variant['instances'], frame, model_frame, rgb_frame, times))
+
+    reference = variants[0]
+    results = []
+    for variant in variants:
+        latency = variant['times'].summary()
+        quality = agreement(reference['outputs'], variant['outputs'])
+        per_model = {}
+        for model in models:
+            if model not in variant['instances']:
+                per_model[model] = {'error': variant['errors'].get(model)}
+                continue
+            stats = latency.get(model, {})
+            ref_p50 = reference['times'].summary().get(model, {}).get('p50_ms')
+            per_model[model] = {
+                'load_ms': variant['load_ms'][model],
+                'p50_ms': stats.get('p50_ms'),
+                'p95_ms': stats.get('p95_ms'),
+                'speedup': round(ref_p50 / stats['p50_ms'], 3) if ref_p50 and stats.get('p50_ms') else None,
+                **quality.get(model, {}),
+            }
+        results.append({
+            'variant': variant['name'],
+            'models': variant['backend'].describe(),
+            'per_model': per_model,
+            'verdict_agreement': quality.get('verdict', {}).get('agreement'),
+        })
+    return results
+
+
+# --- Reporting ---
+def print_report(record):
+    config = record['config']
+    print(f"{config['source']} frames {config['frame_size'][0]}x{config['frame_size'][1]} | {config['frames']} frames")
+    print(f"{'variant':<28} {'model':<11} {'load ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'speedup':>8} {'agree':>7} {'offset px':>10}")
+    for result in record['results']:
+        for model, stats in result['per_model'].items():
+            if 'error' in stats:
+                print(f"{result['variant']:<28} {model:<11} unavailable: {stats['error']}")
+                continue
+            cells = [stats['load_ms'], stats['p50_ms'], stats['p95_ms'], stats['speedup'], stats.get('agreement'), stats.get('offset_px')]
+            print(f"{result['variant']:<28} {model:<11} " + ' '.join(
+                f"{'-' if value is None else value:>{width}}" for value, width in zip(cells, (9, 9, 9, 8, 7, 10))))
+        if result['verdict_agreement'] is not None:
+            print(f"{result['variant']:<28} {'verdict':<11} agreement {result['verdict_agreement']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Accuracy and latency of model variants against the default models')
+    parser.add_argument('variants', nargs='*', help='variants to compare, e.g. ssd=int8,target=cpu_fp16 tier=lite')
+    parser.add_argument('--models', nargs='*', choices=MODELS, default=list(MODELS))
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--videos', nargs='*', help='recordings to take frames from (default: uploads/*.webm)')
+    parser.add_argument('--every', type=int, default=5, help='keep every n-th decoded video frame')
+    parser.add_argument('--synthetic', action='store_true', help='use synthetic frames instead of recordings')
+    parser.add_argument('--image', help='still image (e.g. a face) to move around the synthetic frames')
+    parser.add_argument('--output', default='model-variants.jsonl', help='JSON lines file the result is appended to')
+    parser.add_argument('--no-save', action='store_true')
+    args = parser.parse_args(argv)
+
+    source = 'video'
+    frames = [] if args.synthetic else video_frames(
+        sorted(args.videos or glob.glob(os.path.join(BACKEND_DIR, 'uploads', '*.webm'))), args.frames, args.every)
+    if not frames:
+        source = 'synthetic'
+        frames = synthetic_frames(args.frames, image=cv2.imread(args.image) if args.image else None)
+    try:
+        results = compare_variants([''] + args.variants, frames, args.models)
+    except ValueError as e:
+        parser.error(str(e))
+    record = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'opencv': cv2.__version__, 'cpus': os.cpu_count()},
+        'config': {'source': source, 'frames': len(frames), 'frame_size': list(frames[0].shape[1::-1]), 'models': args.models},
+        'results': results,
+    }
+    print_report(record)
+    if not args.no_save:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
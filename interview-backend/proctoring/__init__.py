@@ -0,0 +1 @@
+# Helper modules for the Flask proctoring service (proctor_api.py)
@@ -0,0 +1,136 @@
+"""Model variants and where they run: the factories behind the detection stages.
+
+A ``ModelBackend`` creates the two SSD detectors and the two MediaPipe graphs the
+detection pipeline uses:
+
+- ``ssd_variant`` picks the SSD files (see SSD_VARIANTS). ``caffe`` is the original
+  float32 models. ``fp16`` is res10 with half-precision weights. ``onnx`` and
+  ``int8`` are ONNX exports (the latter statically quantized) with the same
+  input and the same (1, 1, N, 7) detection output. A variant whose files are
+  missing falls back to ``caffe`` for that model.
+- ``dnn_backend`` and ``dnn_target`` are the OpenCV DNN backend and target the
+  SSDs run on (see DNN_BACKENDS and DNN_TARGETS).
+- ``tier`` sets FaceMesh iris refinement and Holistic model complexity (see
+  MEDIAPIPE_TIERS). ``lite`` and ``full`` use pose models that MediaPipe downloads
+  on first use.
+"""
+import os
+
+import cv2
+
+DNN_BACKENDS = {
+    'default': 'DNN_BACKEND_DEFAULT',
+    'opencv': 'DNN_BACKEND_OPENCV',
+    'openvino': 'DNN_BACKEND_INFERENCE_ENGINE',
+}
+
+DNN_TARGETS = {
+    'cpu': 'DNN_TARGET_CPU',
+    'cpu_fp16': 'DNN_TARGET_CPU_FP16',
+    'opencl': 'DNN_TARGET_OPENCL',
+    'opencl_fp16': 'DNN_TARGET_OPENCL_FP16',
+}
+
+# (weights, config) file names of each SSD variant in the model directory
+SSD_VARIANTS = {
+    'person': {
+        'caffe': ('MobileNetSSD_deploy.caffemodel', 'MobileNetSSD_deploy.prototxt'),
+        'onnx': ('MobileNetSSD_deploy.onnx', None),
+        'int8': ('MobileNetSSD_deploy_int8.onnx', None),
+    },
+    'face': {
+        'caffe': ('res10_300x300_ssd_iter_140000.caffemodel', 'deploy.prototxt'),
+        'fp16': ('res10_300x300_ssd_iter_140000_fp16.caffemodel', 'deploy.prototxt'),
+        'onnx': ('res10_300x300_ssd_iter_140000.onnx', None),
+        'int8': ('res10_300x300_ssd_iter_140000_int8.onnx', None),
+    },
+}
+SSD_VARIANT_NAMES = ('caffe', 'fp16', 'onnx', 'int8')
+
+# (scale factor, mean) of each SSD's 300x300 input blob (cv2.dnn.blobFromImage), the same for every variant
+SSD_INPUTS = {
+    'person': (0.007843, (127.5, 127.5, 127.5)),
+    'face': (1.0, (104.0, 177.0, 123.0)),
+}
+
+MEDIAPIPE_TIERS = {
+    'lite': {'refine_landmarks': False, 'model_complexity': 0},
+    'standard': {'refine_landmarks': True, 'model_complexity': 1},
+    'full': {'refine_landmarks': True, 'model_complexity': 2},
+}
+
+
+def _choice(kind, value, choices):
+    if value not in choices:
+        raise ValueError(f'Unknown {kind} {value!r} (expected one of: {", ".join(choices)})')
+    return value
+
+
+class ModelBackend:
+    """Creates the detection models of one deployment variant; the defaults are the original models"""
+
+    def __init__(self, model_dir, ssd_variant='caffe', dnn_backend='default', dnn_target='cpu', tier='standard'):
+        self.model_dir = model_dir
+        self.ssd_variant = _choice('SSD variant', ssd_variant, SSD_VARIANT_NAMES)
+        self.dnn_backend = _choice('DNN backend', dnn_backend, DNN_BACKENDS)
+        self.dnn_target = _choice('DNN target', dnn_target, DNN_TARGETS)
+        self.tier = _choice('model tier', tier, MEDIAPIPE_TIERS)
+        for kind, name in (('DNN backend', DNN_BACKENDS[dnn_backend]), ('DNN target', DNN_TARGETS[dnn_target])):
+            if not hasattr(cv2.dnn, name):
+                raise ValueError(f'{kind} {name} is not available in OpenCV {cv2.__version__}')
+
+    @classmethod
+    def from_env(cls, model_dir, environ=os.environ):
+        return cls(
+            model_dir,
+            ssd_variant=environ.get('PROCTOR_SSD_VARIANT', 'caffe'),
+            dnn_backend=environ.get('PROCTOR_DNN_BACKEND', 'default'),
+            dnn_target=environ.get('PROCTOR_DNN_TARGET', 'cpu'),
+            tier=environ.get('PROCTOR_MODEL_TIER', 'standard'),
+        )
+
+    def ssd_files(self, model):
+        """(variant, weights path, config path or None) of the ``person`` or ``face`` SSD, or None
+        when not even the caffe files exist"""
+        variants = SSD_VARIANTS[model]
+        for variant in dict.fromkeys((self.ssd_variant, 'caffe')):
+            if variant not in variants:
+                continue
+            weights, config = (os.path.join(self.model_dir, name) if name else None for name in variants[variant])
+            if os.path.exists(weights) and (config is None or os.path.exists(config)):
+                return variant, weights, config
+        return None
+
+    def create_ssd(self, model):
+        variant, weights, config = self.ssd_files(model)
+        net = cv2.dnn.readNet(weights, config) if config else cv2.dnn.readNet(weights)
+        net.setPreferableBackend(getattr(cv2.dnn, DNN_BACKENDS[self.dnn_backend]))
+        net.setPreferableTarget(getattr(cv2.dnn, DNN_TARGETS[self.dnn_target]))
+        return net
+
+    def create_face_mesh(self):
+        import mediapipe as mp
+        return mp.solutions.face_mesh.FaceMesh(static_image_mode=True, max_num_faces=5,
+                                               refine_landmarks=MEDIAPIPE_TIERS[self.tier]['refine_landmarks'],
+                                               min_detection_confidence=0.5)
+
+    def create_holistic(self):
+        import mediapipe as mp
+        tier = MEDIAPIPE_TIERS[self.tier]
+        return mp.solutions.holistic.Holistic(static_image_mode=True, model_complexity=tier['model_complexity'],
+                                              enable_segmentation=False, refine_face_landmarks=tier['refine_landmarks'],
+                                              min_detection_confidence=0.5)
+
+    def describe(self):
+        """Settings and the SSD files actually in use"""
+        ssd = {}
+        for model in SSD_VARIANTS:
+            files = self.ssd_files(model)
+            ssd[model] = {'variant': files[0], 'weights': os.path.basename(files[1])} if files else None
+        return {
+            'ssd_variant': self.ssd_variant,
+            'dnn_backend': self.dnn_backend,
+            'dnn_target': self.dnn_target,
+            'tier': self.tier,
+            'ssd': ssd,
+        }
@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from proctoring.stats import percentile
+
+
+class BatcherClosedError(RuntimeError):
+    pass
+
+
+def split_ssd_detections(detections, index):
+    """Rows of a batched SSD DetectionOutput (1, 1, N, 7) that belong to image ``index``."""
+    rows = detections[0, 0]
+    return rows[rows[:, 0] == index].reshape(1, 1, -1, 7)
+
+
+class _PendingInference:
+    __slots__ = ('blob', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, blob):
+        self.blob = blob
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class InferenceBatcher:
+    """Runs one OpenCV DNN forward pass for blobs submitted by many request threads.
+
+    Callers block in ``infer``. A single background thread collects up to
+    ``max_batch_size`` blobs, waiting at most ``max_wait_ms`` after the first one
+    arrives, runs the net once on the stacked batch and hands each caller its own
+    slice of the output (``split``).
+
+    It exposes the same ``checkout``/``fill``/``warmup``/``stats``/``close``
+    methods as ``ModelPool`` so a pipeline stage can use either.
+    """
+
+    def __init__(self, name, factory, max_batch_size=8, max_wait_ms=4.0, split=split_ssd_detections, stat_samples=1024):
+        self.name = name
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait_ms / 1000.0
+        self._factory = factory
+        self._split = split
+        self._net = None
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        # Batch statistics
+        self._batches = 0
+        self._frames = 0
+        self._batch_sizes = {}
+        self._forward_total = 0.0
+        self._recent_delays = deque(maxlen=stat_samples)
+
+    def load(self):
+        """Load the net without starting the batching thread (safe before forking workers)."""
+        with self._cond:
+            if self._closed:
+                raise BatcherClosedError(f'{self.name} batcher is closed')
+            if self._net is None:
+                self._net = self._factory()
+
+    def fill(self):
+        """Load the net and start the batching thread."""
+        self.load()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'{self.name}-batcher', daemon=True)
+                self._thread.start()
+
+    def warmup(self, run):
+        run(self)
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        yield self
+
+    def infer(self, blob):
+        """Forward one (1, C, H, W) blob and return this blob's part of the output."""
+        if self._thread is None:
+            self.fill()
+        pending = _PendingInference(blob)
+        with self._cond:
+            if self._closed:
+                raise BatcherClosedError(f'{self.name} batcher is closed')
+            self._pending.append(pending)
+            self._cond.notify()
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            deadline = self._pending[0].enqueued_at + self.max_wait
+            while len(self._pending) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(self.max_batch_size, len(self._pending))
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._forward(batch)
+
+    def _forward(self, batch):
+        started = time.perf_counter()
+        try:
+            blobs = batch[0].blob if len(batch) == 1 else np.concatenate([p.blob for p in batch], axis=0)
+            self._net.setInput(blobs)
+            output = self._net.forward()
+            for index, pending in enumerate(batch):
+                pending.result = self._split(output, index)
+        except Exception as e:
+            for pending in batch:
+                pending.error = e
+        finished = time.perf_counter()
+        with self._cond:
+            self._batches += 1
+            self._frames += len(batch)
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            self._forward_total += finished - started
+            for pending in batch:
+                self._recent_delays.append(started - pending.enqueued_at)
+        for pending in batch:
+            pending.done.set()
+
+    def stats(self):
+        """Batch sizes, queue delay and forward time (milliseconds)."""
+        with self._cond:
+            delays = sorted(self._recent_delays)
+            batches = self._batches
+            frames = self._frames
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+            forward_total = self._forward_total
+            queued = len(self._pending)
+        return {
+            'name': self.name,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': round(self.max_wait * 1000, 3),
+            'batches': batches,
+            'frames': frames,
+            'queued': queued,
+            'batch_size_avg': round(frames / batches, 3) if batches else 0.0,
+            'batch_sizes': batch_sizes,
+            'queue_delay_ms_p50': round(percentile(delays, 0.5) * 1000, 3),
+            'queue_delay_ms_p95': round(percentile(delays, 0.95) * 1000, 3),
+            'forward_ms_avg': round(forward_total / batches * 1000, 3) if batches else 0.0,
+        }
+
+    def close(self):
+        """Stop accepting blobs, finish the queued ones and stop the thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import deque
+
+
+class DebugFrameBuffer:
+    """Keeps the last few encoded debug overlay images of each session.
+
+    Only JPEG bytes are stored, so a session costs at most ``frames_per_session``
+    small images. Sessions that stop producing debug frames are dropped after
+    ``ttl`` seconds the next time a frame is pushed.
+    """
+
+    def __init__(self, frames_per_session=5, ttl=600):
+        self.frames_per_session = max(1, int(frames_per_session))
+        self.ttl = ttl
+        self._frames = {}
+        self._last_push = {}
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def push(self, session_id, jpeg_bytes, timestamp=None):
+        now = time.time() if timestamp is None else timestamp
+        with self._lock:
+            ring = self._frames.get(session_id)
+            if ring is None:
+                ring = self._frames[session_id] = deque(maxlen=self.frames_per_session)
+            ring.append((now, jpeg_bytes))
+            self._last_push[session_id] = now
+            self._evict_idle(now)
+
+    def get(self, session_id, back=0):
+        """The newest frame (``back=0``) or an older one. Returns (timestamp, bytes) or None."""
+        with self._lock:
+            ring = self._frames.get(session_id)
+            if not ring or back < 0 or back >= len(ring):
+                return None
+            return ring[-1 - back]
+
+    def discard(self, session_id):
+        with self._lock:
+            self._frames.pop(session_id, None)
+            self._last_push.pop(session_id, None)
+
+    def _evict_idle(self, now):
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + min(self.ttl, 60)
+        expired = [sid for sid, last in self._last_push.items() if now - last > self.ttl]
+        for sid in expired:
+            del self._frames[sid]
+            del self._last_push[sid]
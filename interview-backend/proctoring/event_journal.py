@@ -0,0 +1,285 @@
+"""Write-behind journal of proctoring events, delivered in batches to the Node backend.
+
+``append`` only queues the events, so the frame path never waits on the disk or
+the network. A writer thread appends them as JSON lines to segment files in the
+journal directory and fsyncs each write, and starts a new segment every
+``segment_bytes``. A delivery thread reads the segments from its saved position
+and posts them in batches of up to ``batch_size`` events to ``ingest_url`` over
+one keep-alive connection, retrying with backoff until the backend accepts
+them. Fully delivered segments are deleted.
+
+Every event carries an ``eventId``, so the backend can ignore events it already
+has; a batch that is retried after a crash or a lost response is harmless.
+
+Each process claims a numbered subdirectory with a lock file. A restarted
+worker claims a free one and first delivers what its predecessor left there.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+
+_SEGMENT_PREFIX = 'segment-'
+_CURSOR_FILE = 'delivered.json'
+
+
+def _segment_name(number):
+    return f'{_SEGMENT_PREFIX}{number:012d}.jsonl'
+
+
+def _segment_numbers(directory):
+    return sorted(int(name[len(_SEGMENT_PREFIX):-len('.jsonl')]) for name in os.listdir(directory)
+                  if name.startswith(_SEGMENT_PREFIX) and name.endswith('.jsonl'))
+
+
+class EventJournal:
+    """Appends proctoring events to local segment files and delivers them to ``ingest_url``
+    (None only keeps the journal)"""
+
+    def __init__(self, directory, ingest_url=None, token=None, segment_bytes=16 * 2 ** 20, batch_size=500,
+                 flush_interval=1.0, fsync=True, max_buffered=100000, timeout=10.0, max_backoff=30.0):
+        self.root = directory
+        self.ingest_url = ingest_url
+        self.token = token
+        self.segment_bytes = segment_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_buffered = max_buffered
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.directory = None
+        self._lock_file = None
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._closing = False
+        self._stop = threading.Event()
+        self._file = None
+        self._segment = None
+        self._cursor = (None, 0)  # (segment, byte offset) of the first undelivered event
+        self._threads = []
+        # Journal lines left by a predecessor and lines taken past by the delivery cursor
+        self._backlog = 0
+        self._consumed = 0
+        self.appended = 0
+        self.written = 0
+        self.delivered = 0
+        self.retries = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    # --- Frame path ---
+
+    def append(self, session_id, start, events):
+        """Queue the session's events ``start``, ``start + 1``, ... (dicts in the event log shape)"""
+        records = [{'eventId': uuid.uuid4().hex, 'sessionId': session_id, 'index': start + i, 'event': event}
+                   for i, event in enumerate(events)]
+        with self._cond:
+            if len(self._buffer) + len(records) > self.max_buffered:
+                self.dropped += len(records)
+                return
+            self._buffer.extend(records)
+            self.appended += len(records)
+            self._cond.notify()
+
+    # --- Threads ---
+
+    def start(self):
+        """Claim a directory, open a new segment and start the writer and delivery threads"""
+        self.directory = self._claim()
+        numbers = _segment_numbers(self.directory)
+        # Never append to an old segment: its last line may have been cut off by a crash
+        self._open_segment(numbers[-1] + 1 if numbers else 1)
+        self._cursor = self._load_cursor(numbers[0] if numbers else self._segment)
+        self._backlog = self._count_lines(numbers)
+        self._threads = [threading.Thread(target=self._write_loop, name='event-journal-writer', daemon=True)]
+        if self.ingest_url:
+            self._threads.append(threading.Thread(target=self._deliver_loop, name='event-journal-delivery', daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _claim(self):
+        os.makedirs(self.root, exist_ok=True)
+        number = 0
+        while True:
+            directory = os.path.join(self.root, str(number))
+            os.makedirs(directory, exist_ok=True)
+            lock_file = open(os.path.join(directory, 'lock'), 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                number += 1
+                continue
+            self._lock_file = lock_file
+            return directory
+
+    def _open_segment(self, number):
+        if self._file is not None:
+            self._file.close()
+        self._segment = number
+        self._file = open(os.path.join(self.directory, _segment_name(number)), 'ab')
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closing:
+                    self._cond.wait()
+                records, self._buffer = self._buffer, []
+                if not records:
+                    return
+            self._file.write(b''.join(json.dumps(record, separators=(',', ':')).encode() + b'\n' for record in records))
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            with self._cond:
+                self.written += len(records)
+                if self._file.tell() >= self.segment_bytes:
+                    self._open_segment(self._segment + 1)
+
+    def _load_cursor(self, first_segment):
+        try:
+            with open(os.path.join(self.directory, _CURSOR_FILE)) as f:
+                cursor = json.load(f)
+            return cursor['segment'], cursor['offset']
+        except (OSError, ValueError, KeyError):
+            return first_segment, 0
+
+    def _count_lines(self, numbers):
+        """Complete lines from the delivery cursor to the end of the given segments"""
+        lines = 0
+        for number in numbers:
+            if number < self._cursor[0]:
+                continue
+            with open(os.path.join(self.directory, _segment_name(number)), 'rb') as f:
+                if number == self._cursor[0]:
+                    f.seek(self._cursor[1])
+                lines += f.read().count(b'\n')
+        return lines
+
+    def _save_cursor(self):
+        path = os.path.join(self.directory, _CURSOR_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'segment': self._cursor[0], 'offset': self._cursor[1]}, f)
+        os.replace(path + '.tmp', path)
+
+    def _read_batch(self):
+        """(records, cursor after them, lines read) from the delivery cursor on; moves past finished segments"""
+        while True:
+            segment, offset = self._cursor
+            with self._cond:
+                active = self._segment
+            path = os.path.join(self.directory, _segment_name(segment))
+            records = []
+            end = offset
+            lines = 0
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    while len(records) < self.batch_size:
+                        line = f.readline()
+                        # A line without its newline is still being written, or was cut off by a crash
+                        if not line.endswith(b'\n'):
+                            break
+                        end += len(line)
+                        lines += 1
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            self.rejected += 1
+            if records:
+                return records, (segment, end), lines
+            if end > offset:
+                # Only unreadable lines: step over them
+                self._cursor = (segment, end)
+                self._consumed += lines
+                continue
+            if segment >= active:
+                return records, (segment, end), 0
+            # An older segment is finished and delivered
+            if os.path.exists(path):
+                os.remove(path)
+            self._cursor = (segment + 1, 0)
+            self._save_cursor()
+
+    def _deliver_loop(self):
+        import requests
+        session = requests.Session()
+        headers = {'X-Ingest-Token': self.token} if self.token else {}
+        while not self._stop.is_set():
+            records, cursor, lines = self._read_batch()
+            if not records:
+                self._stop.wait(self.flush_interval)
+                continue
+            outcome = self._post(session, headers, records)
+            if outcome is None:
+                break
+            if outcome:
+                self.delivered += len(records)
+            self._cursor = cursor
+            self._consumed += lines
+            self._save_cursor()
+            if len(records) < self.batch_size:
+                self._stop.wait(self.flush_interval)
+        session.close()
+
+    def _post(self, session, headers, records):
+        """Deliver one batch, retrying until it is accepted. False when the backend refuses it for
+        good, None when the journal closes first (the batch stays for the next start)."""
+        import requests
+        backoff = 0.5
+        while True:
+            try:
+                response = session.post(self.ingest_url, json={'events': records}, headers=headers, timeout=self.timeout)
+                if response.status_code < 300:
+                    return True
+                if 400 <= response.status_code < 500 and response.status_code not in (408, 409, 429):
+                    print(f'Event ingest refused {len(records)} events: {response.status_code} {response.text[:200]}')
+                    self.rejected += len(records)
+                    return False
+                error = f'HTTP {response.status_code}'
+            except requests.RequestException as e:
+                error = repr(e)
+            self.retries += 1
+            print(f'Event ingest failed ({error}); retrying in {backoff:.1f} s')
+            if self._stop.wait(backoff):
+                return None
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def pending(self):
+        """Events in the journal (this process's and a predecessor's) that are still to be delivered"""
+        with self._cond:
+            written = self.written
+        return max(0, self._backlog + written - self._consumed)
+
+    def stats(self):
+        return {
+            'directory': self.directory,
+            'segment': self._segment,
+            'delivery_cursor': list(self._cursor),
+            'appended': self.appended,
+            'written': self.written,
+            'delivered': self.delivered,
+            'retries': self.retries,
+            'rejected': self.rejected,
+            'dropped': self.dropped,
+        }
+
+    def close(self, timeout=5.0):
+        """Write out the queued events and stop; undelivered events stay for the next start"""
+        self._stop.set()
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        if self._file is not None:
+            self._file.close()
+        if self._lock_file is not None:
+            # Closing the lock file releases the directory for the next start
+            self._lock_file.close()
+            self._lock_file = None
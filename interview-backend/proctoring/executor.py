@@ -0,0 +1,226 @@
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+
+URGENT, STEADY = 'correction_window', 'steady'
+
+
+class FrameRejected(RuntimeError):
+    """A frame was shed instead of being queued. ``reason`` is 'overloaded' or 'session_busy'."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Job:
+    __slots__ = ('fn', 'args', 'frame_class', 'deadline', 'queued_at', 'done', 'result', 'error', 'displaced')
+
+    def __init__(self, fn, args, frame_class, deadline, queued_at):
+        self.fn = fn
+        self.args = args
+        self.frame_class = frame_class
+        self.deadline = deadline
+        self.queued_at = queued_at
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.displaced = False
+
+
+class FrameExecutor:
+    """Runs frame evaluation on a fixed number of inference threads with a bounded,
+    deadline-ordered queue.
+
+    Request threads only parse the request and wait for the result. At most
+    ``workers`` frames are processed at once and ``max_queued`` more may wait;
+    beyond that ``run`` raises ``FrameRejected('overloaded')`` right away instead
+    of letting requests pile up. A session may have a single frame in flight,
+    so a slow client cannot queue stale frames (``FrameRejected('session_busy')``).
+
+    Frames of sessions with a deadline (``set_deadline``: a correction window that
+    ends then) wait in a separate class that goes first, earliest deadline first.
+    The other frames are taken in arrival order when no deadline frame waits. When
+    the queue is full, a deadline frame displaces the newest waiting steady frame,
+    which is shed as overloaded, so a calm session slows down before a session
+    about to be terminated does. Steady frames have ``steady_deadline`` seconds as
+    a latency target. A frame that finishes after its deadline counts as a miss.
+
+    OpenCV and MediaPipe release the GIL while they compute, so threads keep
+    every core busy as long as the model pools have one instance per thread.
+
+    The threads start with the first frame of each process: an executor created
+    before a fork (gunicorn's preload) gets its own threads in every worker.
+    """
+
+    def __init__(self, workers, max_queued=0, min_retry_after=1, steady_deadline=2.0):
+        self.workers = max(1, int(workers))
+        self.max_queued = max(0, int(max_queued))
+        self.min_retry_after = min_retry_after
+        self.steady_deadline = steady_deadline
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._queue = []  # (class rank, deadline or arrival, order, job)
+        self._order = itertools.count()
+        self._pending = 0  # running + queued
+        self._in_flight = set()
+        self._deadlines = {}  # session id -> time.monotonic() deadline
+        self._observers = []
+        self._service_time = None  # moving average of seconds per frame
+        self._closed = False
+        self.completed = 0
+        self.rejected = {'overloaded': 0, 'session_busy': 0, 'displaced': 0}
+        self.deadline_results = {URGENT: {'met': 0, 'missed': 0}, STEADY: {'met': 0, 'missed': 0}}
+        self._threads = []
+        self._threads_pid = None
+
+    def _start_threads(self):
+        """Start this process's inference threads if they are not running yet (under the lock)"""
+        if self._threads_pid == os.getpid():
+            return
+        # Forked from a process that had threads: only their bookkeeping was copied
+        self._queue.clear()
+        self._pending = 0
+        self._in_flight.clear()
+        self._threads_pid = os.getpid()
+        self._threads = [threading.Thread(target=self._work, name=f'inference_{i}', daemon=True) for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def add_observer(self, observer):
+        """Call ``observer(frame_class, queued_seconds, missed)`` after every frame that ran"""
+        self._observers.append(observer)
+
+    def set_deadline(self, session_id, expires_at):
+        """Give the session's frames priority until ``expires_at`` (a time.time() value), or
+        take it away with None"""
+        with self._lock:
+            if expires_at is None:
+                self._deadlines.pop(session_id, None)
+                return
+            now = time.monotonic()
+            self._deadlines[session_id] = now + (expires_at - time.time())
+            if len(self._deadlines) > 4 * (self.workers + self.max_queued) + 64:
+                # Sessions that left in a correction window never clear their deadline
+                for stale in [sid for sid, deadline in self._deadlines.items() if deadline <= now]:
+                    del self._deadlines[stale]
+
+    def discard(self, session_id):
+        with self._lock:
+            self._deadlines.pop(session_id, None)
+
+    def retry_after(self):
+        """Whole seconds a shed client should wait: roughly the time to drain the current queue"""
+        with self._lock:
+            service_time = self._service_time or 0.0
+            pending = self._pending
+        return max(self.min_retry_after, math.ceil(service_time * pending / self.workers))
+
+    def run(self, session_id, fn, *args):
+        """Run ``fn(*args)`` on an inference thread and return its result"""
+        now = time.monotonic()
+        with self._lock:
+            self._start_threads()
+            deadline = self._deadlines.get(session_id)
+            if deadline is not None and deadline <= now:
+                # Too late to help: the window has ended whatever this frame shows
+                del self._deadlines[session_id]
+                deadline = None
+            job = _Job(fn, args, URGENT if deadline is not None else STEADY,
+                       deadline if deadline is not None else now + self.steady_deadline, now)
+            reason = None
+            if session_id in self._in_flight:
+                reason = 'session_busy'
+            elif self._pending >= self.workers + self.max_queued and not (job.frame_class == URGENT and self._displace()):
+                reason = 'overloaded'
+            if reason:
+                self.rejected[reason] += 1
+            else:
+                self._pending += 1
+                self._in_flight.add(session_id)
+                rank, key = (0, job.deadline) if job.frame_class == URGENT else (1, now)
+                heapq.heappush(self._queue, (rank, key, next(self._order), job))
+                self._ready.notify()
+        if reason:
+            raise FrameRejected(reason, self.retry_after())
+        try:
+            job.done.wait()
+        finally:
+            with self._lock:
+                if not job.displaced:
+                    self._pending -= 1
+                self._in_flight.discard(session_id)
+        if job.displaced:
+            raise FrameRejected('overloaded', self.retry_after())
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _displace(self):
+        """Shed the newest waiting steady frame to make room (under the lock). False when
+        only deadline frames wait."""
+        steady = [entry for entry in self._queue if entry[0] == 1]
+        if not steady:
+            return False
+        entry = max(steady, key=lambda entry: entry[2])
+        self._queue.remove(entry)
+        heapq.heapify(self._queue)
+        job = entry[3]
+        job.displaced = True
+        self._pending -= 1
+        self.rejected['displaced'] += 1
+        job.done.set()
+        return True
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._ready.wait()
+                if self._closed:
+                    return
+                job = heapq.heappop(self._queue)[3]
+            started = time.monotonic()
+            try:
+                job.result = job.fn(*job.args)
+            except BaseException as e:
+                job.error = e
+            finished = time.monotonic()
+            missed = finished > job.deadline
+            with self._lock:
+                self.completed += 1
+                self.deadline_results[job.frame_class]['missed' if missed else 'met'] += 1
+                elapsed = finished - started
+                self._service_time = elapsed if self._service_time is None else 0.9 * self._service_time + 0.1 * elapsed
+            job.done.set()
+            for observer in self._observers:
+                observer(job.frame_class, started - job.queued_at, missed)
+
+    def depth(self):
+        """Frames running or waiting"""
+        with self._lock:
+            return self._pending
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queued': self.max_queued,
+                'pending': self._pending,
+                'queued': {URGENT: sum(entry[0] == 0 for entry in self._queue), STEADY: sum(entry[0] == 1 for entry in self._queue)},
+                'sessions_in_flight': len(self._in_flight),
+                'sessions_with_deadline': len(self._deadlines),
+                'completed': self.completed,
+                'rejected': dict(self.rejected),
+                'deadlines': {frame_class: dict(counts) for frame_class, counts in self.deadline_results.items()},
+                'service_ms_avg': round(self._service_time * 1000, 3) if self._service_time else 0.0,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            self._ready.notify_all()
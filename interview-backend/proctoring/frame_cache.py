@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def dhash(frame):
+    """64-bit difference hash of a BGR frame: one bit per horizontal brightness step on a 9x8 thumbnail"""
+    gray = cv2.cvtColor(cv2.resize(frame, (9, 8), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    bits = np.packbits(gray[:, 1:] > gray[:, :-1])
+    return int.from_bytes(bits.tobytes(), 'big')
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class FrameResultCache:
+    """Last result per client, reused while its frames stay perceptually the same.
+
+    A client's new frame reuses the stored result when its ``dhash`` is within
+    ``max_distance`` bits of the frame the result was computed for and the
+    result is younger than ``ttl`` seconds. At most ``max_entries`` clients
+    are kept; the least recently used are dropped first.
+    """
+
+    def __init__(self, ttl=5.0, max_distance=4, max_entries=10000):
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # client -> (hash, result, stored at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, client, frame_hash, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(client)
+            if entry is not None and now - entry[2] <= self.ttl and hamming(entry[0], frame_hash) <= self.max_distance:
+                self._entries.move_to_end(client)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, client, frame_hash, result, now=None):
+        with self._lock:
+            self._entries[client] = (frame_hash, result, time.time() if now is None else now)
+            self._entries.move_to_end(client)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'clients': len(self._entries), 'hits': self.hits, 'misses': self.misses}
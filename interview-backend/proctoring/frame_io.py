@@ -0,0 +1,116 @@
+import base64
+import threading
+
+import cv2
+import numpy as np
+
+# Frame decoding for /proctor. Bodies are read into a per-thread buffer that is
+# reused across requests, and JPEGs wider than needed are decoded at 1/2, 1/4 or
+# 1/8 scale directly by libjpeg (cv2.IMREAD_REDUCED_COLOR_*).
+
+IMAGE_CONTENT_TYPES = ('image/jpeg', 'image/jpg', 'image/webp')
+
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+_local = threading.local()
+
+
+class FrameTooLargeError(ValueError):
+    pass
+
+
+def _buffer(size):
+    buf = getattr(_local, 'buffer', None)
+    if buf is None or len(buf) < size:
+        buf = _local.buffer = bytearray(max(size, 256 * 1024))
+    return buf
+
+
+def read_stream(stream, content_length=None, max_bytes=8 * 1024 * 1024):
+    """Read a request body into the thread's reusable buffer.
+
+    Returns a memoryview that stays valid until the same thread reads the next
+    body, so decode it before handling another request.
+    """
+    if content_length is not None and content_length > max_bytes:
+        raise FrameTooLargeError(f'Frame is larger than {max_bytes} bytes')
+    # Without a length, read one byte past the limit to tell a body of exactly max_bytes from a longer one
+    want = max_bytes + 1 if content_length is None else content_length
+    buf = _buffer(content_length or 0)
+    size = 0
+    while size < want:
+        if size == len(buf):
+            grown = _buffer(min(want, size * 2))
+            grown[:size] = buf[:size]
+            buf = grown
+        read = stream.readinto(memoryview(buf)[size:min(len(buf), want)])
+        if not read:
+            break
+        size += read
+    if size > max_bytes:
+        raise FrameTooLargeError(f'Frame is larger than {max_bytes} bytes')
+    return memoryview(buf)[:size]
+
+
+def decode_data_url(data_url):
+    """Raw image bytes from a 'data:image/jpeg;base64,...' string (or bare base64)."""
+    comma = data_url.find(',')
+    return base64.b64decode(data_url[comma + 1:] if comma >= 0 else data_url)
+
+
+def jpeg_size(data):
+    """(width, height) from a JPEG's SOF header without decoding it, or None."""
+    data = memoryview(data)
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        length = (data[i + 2] << 8) | data[i + 3]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return (width, height)
+        i += 2 + length
+    return None
+
+
+def decode_frame(data, max_width=0, out=None):
+    """Decode image bytes to a BGR frame, optionally no wider than about ``max_width``.
+
+    JPEGs are decoded at a reduced scale when the source is at least twice as
+    wide as needed; anything still wider than ``max_width`` is resized, into
+    ``out(height, width)`` when that returns an array (such as a shared frame
+    slot) instead of a new one. Returns None when the bytes are not a
+    decodable image.
+    """
+    buf = np.frombuffer(data, np.uint8)
+    flags = cv2.IMREAD_COLOR
+    if max_width:
+        size = jpeg_size(data)
+        if size is not None:
+            for factor, reduced_flag in REDUCED_DECODE_FLAGS:
+                if size[0] // factor >= max_width:
+                    flags = reduced_flag
+                    break
+    frame = cv2.imdecode(buf, flags)
+    if frame is None:
+        return None
+    if max_width and frame.shape[1] > max_width:
+        h, w = frame.shape[:2]
+        size = (max_width, int(h * max_width / w))
+        dst = out(size[1], size[0]) if out is not None else None
+        frame = cv2.resize(frame, size, dst=dst, interpolation=cv2.INTER_AREA)
+    return frame
@@ -0,0 +1,165 @@
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# Per-slot header columns. Each column has a single writer, so no lock is shared
+# between processes: the front end owns everything but RETURNS, which only the
+# worker that was lent the slot writes.
+GENERATION, HEIGHT, WIDTH, RELEASED, LENDS, RETURNS = range(6)
+_HEADER_COLUMNS = 6
+_ALIGN = 64
+
+
+def _attach(name):
+    """Open an existing block without letting this process's resource tracker unlink it at exit
+    (the creating process owns it)"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class SlotHandle:
+    """A slot held by the front end, with a (height, width, 3) view of its frame"""
+    __slots__ = ('index', 'generation', 'frame')
+
+    def __init__(self, index, generation, frame):
+        self.index = index
+        self.generation = generation
+        self.frame = frame
+
+
+class FrameRing:
+    """Preallocated BGR frame slots in one shared memory block.
+
+    The front end (the process that creates the ring) ``acquire``s a free slot,
+    writes a frame into it and ``lend``s it to an inference worker by sending only
+    (index, generation, lend number). The worker ``borrow``s a read-only view,
+    runs the models on it in place and ``give_back``s the slot. The front end
+    ``release``s the slot when it no longer reads the frame.
+
+    A slot is free again only once it has been released and every lend has come
+    back. A worker that is late therefore never sees its slot overwritten, and
+    a message that names an old generation is ignored.
+    """
+
+    def __init__(self, slots, max_height, max_width, name=None):
+        self.slots = int(slots)
+        self.max_height = int(max_height)
+        self.max_width = int(max_width)
+        self.slot_bytes = self.max_height * self.max_width * 3
+        header_bytes = -(-self.slots * _HEADER_COLUMNS * 8 // _ALIGN) * _ALIGN
+        size = header_bytes + self.slots * self.slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._shm = _attach(name)
+        self.name = self._shm.name
+        self._header = np.ndarray((self.slots, _HEADER_COLUMNS), np.int64, self._shm.buf)
+        self._frames = np.ndarray((self.slots, self.slot_bytes), np.uint8, self._shm.buf, offset=header_bytes)
+        self._base = self._frames.ctypes.data
+        self._lock = threading.Lock()
+        self._next = 0
+        if self.owner:
+            self._header[:] = 0
+            self._header[:, RELEASED] = 1
+
+    @classmethod
+    def attach(cls, name, slots, max_height, max_width):
+        return cls(slots, max_height, max_width, name=name)
+
+    def describe(self):
+        """Arguments a worker process needs to ``attach``"""
+        return {'name': self.name, 'slots': self.slots, 'max_height': self.max_height, 'max_width': self.max_width}
+
+    def _view(self, index, height, width):
+        return self._frames[index, :height * width * 3].reshape(height, width, 3)
+
+    # --- Front end ---
+
+    def acquire(self, height, width):
+        """Hold a free slot for a (height, width) frame. None when the frame is too large
+        or every slot is in use."""
+        if height > self.max_height or width > self.max_width:
+            return None
+        with self._lock:
+            for offset in range(self.slots):
+                index = (self._next + offset) % self.slots
+                row = self._header[index]
+                if row[RELEASED] and row[LENDS] == row[RETURNS]:
+                    self._next = index + 1
+                    row[GENERATION] += 1
+                    row[HEIGHT], row[WIDTH] = height, width
+                    row[RELEASED] = 0
+                    return SlotHandle(index, int(row[GENERATION]), self._view(index, height, width))
+        return None
+
+    def lookup(self, frame):
+        """The handle of a held slot whose frame is exactly ``frame``, or None"""
+        offset = frame.ctypes.data - self._base
+        if offset < 0 or offset % self.slot_bytes or offset // self.slot_bytes >= self.slots:
+            return None
+        index = offset // self.slot_bytes
+        row = self._header[index]
+        if row[RELEASED] or (row[HEIGHT], row[WIDTH]) != frame.shape[:2] or not frame.flags.c_contiguous:
+            return None
+        return SlotHandle(index, int(row[GENERATION]), frame)
+
+    def lend(self, handle):
+        """Mark the slot as read by a worker; returns the lend number to send along"""
+        with self._lock:
+            row = self._header[handle.index]
+            row[LENDS] += 1
+            return int(row[LENDS])
+
+    def release(self, handle):
+        """The front end is done with the slot; it is reused once all lends came back"""
+        with self._lock:
+            row = self._header[handle.index]
+            if row[GENERATION] == handle.generation:
+                row[RELEASED] = 1
+
+    def reclaim(self, index):
+        """Take back the lends of a slot whose worker was stopped (it cannot return them)"""
+        with self._lock:
+            self._header[index, RETURNS] = self._header[index, LENDS]
+
+    def stats(self):
+        with self._lock:
+            header = self._header.copy()
+        lent = header[:, LENDS] != header[:, RETURNS]
+        released = header[:, RELEASED] == 1
+        return {
+            'slots': self.slots,
+            'max_size': [self.max_width, self.max_height],
+            'free': int((released & ~lent).sum()),
+            'held': int((~released & ~lent).sum()),
+            'lent': int((~released & lent).sum()),
+            # Released by the front end while a worker still reads them
+            'orphaned': int((released & lent).sum()),
+        }
+
+    # --- Worker ---
+
+    def borrow(self, index, generation):
+        """Read-only view of a lent slot's frame, or None when the slot moved on"""
+        row = self._header[index]
+        if row[GENERATION] != generation or row[LENDS] == row[RETURNS]:
+            return None
+        view = self._view(index, int(row[HEIGHT]), int(row[WIDTH]))
+        view.flags.writeable = False
+        return view
+
+    def give_back(self, index, lend):
+        self._header[index, RETURNS] = lend
+
+    def close(self):
+        self._header = None
+        self._frames = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
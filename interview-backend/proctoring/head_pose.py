@@ -0,0 +1,192 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# 6-point indices for pose estimation, in MODEL_POINTS order. The eye corners go by image
+# side: landmark 33 is the outer corner on the image's left, matching the model's -x corner.
+# (The original order, 263 before 33, mirrored the eyes against the model: a frontal face
+# read about 63 degrees of yaw, and turns to either side gave the same sign.)
+LANDMARK_IDXS = [1, 152, 33, 263, 61, 291]  # nose tip, chin, left eye left, right eye right, left mouth, right mouth (image left/right)
+MODEL_POINTS = np.array([
+    (0.0, 0.0, 0.0),        # Nose tip
+    (0.0, -63.6, -12.5),    # Chin (approximate)
+    (-43.3, 32.7, -26.0),   # Left eye left corner
+    (43.3, 32.7, -26.0),    # Right eye right corner
+    (-28.9, -28.9, -24.1),  # Left mouth corner
+    (28.9, -28.9, -24.1)    # Right mouth corner
+])
+
+# Landmarks used by the frontal/profile heuristics
+LEFT_EYE_IDXS = [33, 133]   # outer, inner
+RIGHT_EYE_IDXS = [362, 263]
+NOSE_TIP_IDX = 1
+MOUTH_IDXS = [13, 14]  # inner upper lip, inner lower lip
+
+# One row per face: head pose in degrees, the frontal heuristics (pixels) and the
+# 6 pose landmarks in integer pixel coordinates
+FACE_POSE_DTYPE = np.dtype([
+    ('valid', '?'),
+    ('yaw', 'f4'),
+    ('pitch', 'f4'),
+    ('roll', 'f4'),
+    ('eye_dist', 'f4'),
+    ('eye_y_diff', 'f4'),
+    ('nose_center_dist', 'f4'),
+    ('eyes_visible', '?'),
+    ('eyes_aligned', '?'),
+    ('nose_centered', '?'),
+    ('is_frontal', '?'),
+    ('image_points', 'f8', (6, 2)),
+])
+
+# A serialized NormalizedLandmarkList holding only x, y and z is a run of fixed
+# 17-byte records: field tag, length, then three (tag, float32) pairs.
+_LANDMARK_RECORD = np.dtype([
+    ('tag', 'u1'), ('size', 'u1'),
+    ('x_tag', 'u1'), ('x', '<f4'),
+    ('y_tag', 'u1'), ('y', '<f4'),
+    ('z_tag', 'u1'), ('z', '<f4'),
+])
+_LANDMARK_TAGS = (0x0a, 15, 0x0d, 0x15, 0x1d)
+
+
+def _decode_landmarks(face_landmarks):
+    """Landmarks read straight from the wire format, or None when it isn't the plain x/y/z layout"""
+    data = face_landmarks.SerializeToString()
+    if len(data) % _LANDMARK_RECORD.itemsize:
+        return None
+    records = np.frombuffer(data, dtype=_LANDMARK_RECORD)
+    if not all((records[name] == tag).all() for name, tag in zip(('tag', 'size', 'x_tag', 'y_tag', 'z_tag'), _LANDMARK_TAGS)):
+        return None
+    return np.stack([records['x'], records['y'], records['z']], axis=1)
+
+
+def _read_landmarks(face_landmarks):
+    return np.array([(lm.x, lm.y, lm.z) for lm in face_landmarks.landmark], dtype=np.float32)
+
+
+# Whether wire decoding matches the protobuf accessors; None until the first face
+# has been read both ways. A protobuf runtime that serializes differently turns it off.
+_decode_checked = None
+
+
+def _face_landmarks_array(face_landmarks):
+    global _decode_checked
+    if _decode_checked is False:
+        return _read_landmarks(face_landmarks)
+    decoded = _decode_landmarks(face_landmarks)
+    if decoded is None:
+        # Landmarks carrying visibility/presence (or another encoding)
+        return _read_landmarks(face_landmarks)
+    if _decode_checked is None:
+        expected = _read_landmarks(face_landmarks)
+        _decode_checked = decoded.shape == expected.shape and np.array_equal(decoded, expected)
+        if not _decode_checked:
+            print('Decoded face landmarks differ from the protobuf accessors; reading them one by one')
+            return expected
+    return decoded
+
+
+def landmarks_array(multi_face_landmarks):
+    """FaceMesh ``multi_face_landmarks`` as one (n_faces, n_landmarks, 3) float32 array of normalized coordinates"""
+    if not multi_face_landmarks:
+        return np.zeros((0, 478, 3), dtype=np.float32)
+    return np.stack([_face_landmarks_array(face) for face in multi_face_landmarks])
+
+
+@lru_cache(maxsize=16)
+def camera_intrinsics(width, height):
+    """Pinhole camera matrix (focal length = frame width) and zero distortion for a frame size"""
+    camera_matrix = np.array(
+        [[width, 0, width / 2],
+         [0, width, height / 2],
+         [0, 0, 1]], dtype='double')
+    camera_matrix.flags.writeable = False
+    dist_coeffs = np.zeros((4, 1))
+    dist_coeffs.flags.writeable = False
+    return camera_matrix, dist_coeffs
+
+
+def _rotation_matrices(rotation_vectors):
+    """Rodrigues' formula for an (n, 3) array of rotation vectors"""
+    theta = np.linalg.norm(rotation_vectors, axis=1)
+    axis = rotation_vectors / np.where(theta > 1e-12, theta, 1.0)[:, None]
+    kx, ky, kz = axis[:, 0], axis[:, 1], axis[:, 2]
+    zero = np.zeros_like(kx)
+    cross = np.stack([
+        np.stack([zero, -kz, ky], axis=1),
+        np.stack([kz, zero, -kx], axis=1),
+        np.stack([-ky, kx, zero], axis=1),
+    ], axis=1)
+    cos, sin = np.cos(theta)[:, None, None], np.sin(theta)[:, None, None]
+    outer = axis[:, :, None] * axis[:, None, :]
+    return cos * np.eye(3) + (1 - cos) * outer + sin * cross
+
+
+def _euler_angles(rmats):
+    """Pitch, yaw and roll (degrees) of (n, 3, 3) rotation matrices"""
+    sy = np.sqrt(rmats[:, 0, 0] ** 2 + rmats[:, 1, 0] ** 2)
+    singular = sy < 1e-6
+    pitch = np.where(singular, np.arctan2(-rmats[:, 1, 2], rmats[:, 1, 1]), np.arctan2(rmats[:, 2, 1], rmats[:, 2, 2]))
+    yaw = np.arctan2(-rmats[:, 2, 0], sy)
+    roll = np.where(singular, 0.0, np.arctan2(rmats[:, 1, 0], rmats[:, 0, 0]))
+    return np.degrees(pitch), np.degrees(yaw), np.degrees(roll)
+
+
+def estimate_head_poses(landmarks, width, height):
+    """Head pose and frontal heuristics for every face in an (n_faces, n_landmarks, 3) array.
+
+    Returns a FACE_POSE_DTYPE structured array with one row per face. Rows whose
+    pose could not be solved have ``valid`` False.
+    """
+    n_faces = len(landmarks)
+    poses = np.zeros(n_faces, dtype=FACE_POSE_DTYPE)
+    if n_faces == 0:
+        return poses
+    scale = np.array([width, height], dtype=np.float64)
+    pixels = landmarks[:, :, :2].astype(np.float64) * scale
+    poses['image_points'] = np.trunc(pixels[:, LANDMARK_IDXS])
+
+    # Frontal/profile heuristics, all faces at once
+    l_eye = pixels[:, LEFT_EYE_IDXS].mean(axis=1)
+    r_eye = pixels[:, RIGHT_EYE_IDXS].mean(axis=1)
+    nose = pixels[:, NOSE_TIP_IDX]
+    poses['eye_dist'] = np.linalg.norm(l_eye - r_eye, axis=1)
+    poses['eye_y_diff'] = np.abs(l_eye[:, 1] - r_eye[:, 1])
+    poses['nose_center_dist'] = np.abs(nose[:, 0] - (l_eye[:, 0] + r_eye[:, 0]) / 2)
+    # More lenient thresholds for frontal detection
+    poses['eyes_visible'] = poses['eye_dist'] > width * 0.07
+    poses['eyes_aligned'] = poses['eye_y_diff'] < height * 0.03
+    poses['nose_centered'] = poses['nose_center_dist'] < width * 0.05
+    poses['is_frontal'] = poses['eyes_visible'] & poses['eyes_aligned'] & poses['nose_centered']
+
+    # solvePnP has no batched form; the angles are computed for all faces together
+    camera_matrix, dist_coeffs = camera_intrinsics(width, height)
+    rotation_vectors = np.zeros((n_faces, 3))
+    for i in range(n_faces):
+        try:
+            success, rotation_vector, _ = cv2.solvePnP(
+                MODEL_POINTS, poses['image_points'][i], camera_matrix, dist_coeffs, flags=cv2.SOLVEPNP_ITERATIVE)
+        except cv2.error:
+            continue
+        if success:
+            poses['valid'][i] = True
+            rotation_vectors[i] = rotation_vector.ravel()
+    pitch, yaw, roll = _euler_angles(_rotation_matrices(rotation_vectors))
+    poses['pitch'] = pitch
+    poses['yaw'] = yaw
+    poses['roll'] = roll
+    return poses
+
+
+def face_keypoints(face, width, height):
+    """Eye, nose and mouth centers of one face's normalized landmarks, in integer pixels"""
+    pixels = face[:, :2] * (width, height)
+    points = {
+        'left_eye': pixels[LEFT_EYE_IDXS].mean(axis=0),
+        'right_eye': pixels[RIGHT_EYE_IDXS].mean(axis=0),
+        'nose': pixels[NOSE_TIP_IDX],
+        'mouth': pixels[MOUTH_IDXS].mean(axis=0),
+    }
+    return {name: {'x': int(x), 'y': int(y)} for name, (x, y) in points.items()}
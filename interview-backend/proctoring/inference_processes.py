@@ -0,0 +1,260 @@
+"""Detection in child processes that read frames in place from a shared FrameRing.
+
+The front end keeps the HTTP and WebSocket handling, the session logic and the
+ring. Each child process imports the proctoring service with WORKER_ENV, loads
+its own models and connects back over an authenticated local socket. Only slot
+coordinates go to a child and only the detections (boxes and landmark arrays)
+come back, with the child's stage timings for the front end's metrics.
+
+    python -m proctoring.inference_processes   # started by InferenceProcesses, not by hand
+"""
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from proctoring.executor import FrameRejected
+from proctoring.frame_ring import FrameRing
+
+# Settings of the proctoring module inside inference processes: models run one frame
+# at a time and nothing but detection runs there
+WORKER_ENV = {
+    'PROCTOR_INFERENCE_PROCESSES': '0',
+    'PROCTOR_INFERENCE_WORKERS': '0',
+    'PROCTOR_INFERENCE_BATCH_SIZE': '1',
+    'PROCTOR_MODEL_POOL_SIZE': '1',
+    'PROCTOR_STARTUP': 'eager',
+    'PROCTOR_SESSION_STORE': 'memory',
+    'PROCTOR_PROFILE_SLOW_MS': '0',
+    'PROCTOR_SESSION_TIMERS': '0',
+    'PROCTOR_EVENT_JOURNAL_DIR': '',
+}
+
+
+class _Worker:
+    __slots__ = ('number', 'process', 'conn')
+
+    def __init__(self, number, process):
+        self.number = number
+        self.process = process
+        self.conn = None
+
+
+class InferenceProcesses:
+    """Runs ``run_detection`` for the front end on ``workers`` child processes.
+
+    ``run`` lends the frame's ring slot to an idle child (a frame outside the ring is
+    copied into a free slot first) and blocks until the detections come back. No
+    idle child within ``queue_timeout`` seconds sheds the frame with
+    ``FrameRejected('overloaded')``. A child that does not answer within
+    ``timeout`` seconds is killed and replaced; its slot is reclaimed only after it
+    is gone, so a slow child never reads a reused slot.
+    """
+
+    def __init__(self, ring, workers, backend_dir, timeout=10.0, queue_timeout=2.0):
+        self.ring = ring
+        self.workers = max(1, int(workers))
+        self.backend_dir = backend_dir
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self._authkey = os.urandom(32)
+        self._listener = Listener(family='AF_UNIX', authkey=self._authkey)
+        self._workers = {}
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._connected = threading.Condition(self._lock)
+        self._closed = False
+        self._observers = []
+        self.frames = 0
+        self.copied = 0
+        self.shed = 0
+        self.restarts = 0
+
+    def start(self, wait=True, startup_timeout=300):
+        threading.Thread(target=self._accept, name='inference-processes', daemon=True).start()
+        for number in range(self.workers):
+            self._spawn(number)
+        if wait:
+            with self._connected:
+                if not self._connected.wait_for(lambda: self._idle.qsize() >= self.workers, startup_timeout):
+                    raise RuntimeError('Inference processes did not start in time')
+        return self
+
+    def _spawn(self, number):
+        env = {
+            **os.environ, **WORKER_ENV,
+            'PROCTOR_FRAME_RING': json.dumps(self.ring.describe()),
+            'PROCTOR_WORKER_ADDRESS': self._listener.address,
+            'PROCTOR_WORKER_NUMBER': str(number),
+        }
+        process = subprocess.Popen([sys.executable, '-m', 'proctoring.inference_processes'],
+                                   cwd=self.backend_dir, env=env, stdin=subprocess.PIPE)
+        # The key goes over stdin, not the environment, so other users cannot read it from /proc
+        process.stdin.write(self._authkey)
+        process.stdin.close()
+        with self._lock:
+            self._workers[number] = _Worker(number, process)
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+                number = conn.recv()
+            except (OSError, EOFError):
+                continue
+            with self._connected:
+                worker = self._workers.get(number)
+                if worker is None or worker.conn is not None:
+                    conn.close()
+                    continue
+                worker.conn = conn
+                self._idle.put(worker)
+                self._connected.notify_all()
+
+    def add_observer(self, observer):
+        """Call ``observer(stage_name, seconds)`` for every pipeline stage a child ran"""
+        self._observers.append(observer)
+
+    def run(self, frame, roi=None, working_width=None):
+        """Detections for a BGR frame, computed by a child process"""
+        handle = self.ring.lookup(frame)
+        copy = None
+        if handle is None:
+            copy = handle = self.ring.acquire(*frame.shape[:2])
+            if handle is None:
+                self._count_shed()
+                raise FrameRejected('overloaded', 1)
+            np.copyto(handle.frame, frame)
+        try:
+            try:
+                worker = self._idle.get(timeout=self.queue_timeout)
+            except queue.Empty:
+                self._count_shed()
+                raise FrameRejected('overloaded', 1)
+            lend = self.ring.lend(handle)
+            try:
+                worker.conn.send((handle.index, handle.generation, lend, roi, working_width))
+                if not worker.conn.poll(self.timeout):
+                    raise TimeoutError(f'Inference process {worker.number} did not answer in {self.timeout} s')
+                status, payload, timings = worker.conn.recv()
+            except (OSError, EOFError) as e:
+                print(f'Replacing inference process {worker.number}: {e}')
+                self._replace(worker, handle.index)
+                self._count_shed()
+                raise FrameRejected('overloaded', 1)
+            self._idle.put(worker)
+            with self._lock:
+                self.frames += 1
+                self.copied += copy is not None
+            for observer in self._observers:
+                for stage, seconds in timings:
+                    observer(stage, seconds)
+            if status != 'ok':
+                raise RuntimeError(f'Inference process {worker.number} failed: {payload}')
+            return payload
+        finally:
+            if copy is not None:
+                self.ring.release(copy)
+
+    def _count_shed(self):
+        with self._lock:
+            self.shed += 1
+
+    def _replace(self, worker, slot):
+        worker.process.kill()
+        worker.process.wait()
+        if worker.conn is not None:
+            worker.conn.close()
+        # The process is gone, so the slot it was reading can be reused
+        self.ring.reclaim(slot)
+        with self._lock:
+            self.restarts += 1
+        if not self._closed:
+            self._spawn(worker.number)
+
+    def slot(self, height, width):
+        """A held ring slot's (height, width, 3) frame to write a frame into (release it with
+        ``release``), or None when no slot fits"""
+        handle = self.ring.acquire(height, width)
+        return None if handle is None else handle.frame
+
+    def share(self, frame):
+        """``frame`` in a held ring slot (release it with ``release``): the frame itself when it
+        was written into a slot already, else a copy, or the frame as is when no slot fits"""
+        if self.ring.lookup(frame) is not None:
+            return frame
+        slot = self.slot(*frame.shape[:2])
+        if slot is None:
+            return frame
+        np.copyto(slot, frame)
+        return slot
+
+    def release(self, frame):
+        handle = self.ring.lookup(frame)
+        if handle is not None:
+            self.ring.release(handle)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'processes': self.workers,
+                'idle': self._idle.qsize(),
+                'frames': self.frames,
+                'copied': self.copied,
+                'shed': self.shed,
+                'restarts': self.restarts,
+            }
+        stats['ring'] = self.ring.stats()
+        return stats
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers.values())
+        for worker in workers:
+            worker.process.kill()
+            worker.process.wait()
+        self._listener.close()
+        self.ring.close()
+
+
+def main():
+    """Child process: load the models, then run detections on lent ring slots until the front end goes away"""
+    authkey = sys.stdin.buffer.read()
+    number = int(os.environ['PROCTOR_WORKER_NUMBER'])
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    import proctor_api
+    ring = FrameRing.attach(**json.loads(os.environ['PROCTOR_FRAME_RING']))
+    conn = Client(os.environ['PROCTOR_WORKER_ADDRESS'], family='AF_UNIX', authkey=authkey)
+    conn.send(number)
+    # The stage timings of the current frame, sent back with its detections
+    timings = []
+    proctor_api.detection_pipeline.add_observer(lambda stage, seconds: timings.append((stage, seconds)))
+    while True:
+        try:
+            index, generation, lend, roi, working_width = conn.recv()
+        except (EOFError, OSError):
+            break
+        frame = ring.borrow(index, generation)
+        if frame is None:
+            conn.send(('error', f'slot {index} no longer holds generation {generation}', []))
+            continue
+        timings.clear()
+        try:
+            result = ('ok', proctor_api.run_detection(frame, roi, working_width))
+        except Exception as e:
+            result = ('error', repr(e))
+        finally:
+            del frame
+            ring.give_back(index, lend)
+        conn.send(result + (list(timings),))
+
+
+if __name__ == '__main__':
+    main()
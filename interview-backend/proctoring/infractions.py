@@ -0,0 +1,161 @@
+"""Per-session infraction state machine that smooths the frame-level verdicts.
+
+A single frame never starts or ends an infraction on its own. Each infraction
+type keeps a vote for each of its last ``window`` frames. The type becomes
+active once ``enter`` of those frames voted for it, and stops being active once
+``exit`` of them voted against it. A higher-priority type that reaches its
+``enter`` count takes over from a lower-priority one.
+
+The main face's yaw and pitch are smoothed with an exponential moving average
+and compared with the session's own frontal baseline. A head that has turned
+further than ``yaw_enter``/``pitch_enter`` degrees votes for ``profile_face``.
+It has to come back within ``yaw_exit``/``pitch_exit`` degrees before a
+``profile_face`` infraction can end. The baseline absorbs camera placement and
+the pose solver's fixed offsets.
+
+The state of a session is a plain dict (see ``new_state``), so it can be
+stored with the rest of the session record.
+"""
+import copy
+
+# Order in which infractions take precedence when several reach their vote count
+INFRACTION_PRIORITY = ('multiple_faces', 'profile_face', 'no_face')
+
+DEFAULT_REASONS = {
+    'multiple_faces': 'Multiple people detected!',
+    'profile_face': 'Please face the camera directly.',
+    'no_face': 'No face detected.',
+}
+
+DEFAULT_THRESHOLDS = {
+    'multiple_faces': {'window': 3, 'enter': 2, 'exit': 2},
+    'profile_face': {'window': 4, 'enter': 3, 'exit': 3},
+    'no_face': {'window': 3, 'enter': 2, 'exit': 2},
+    # alpha: weight of a new frame in the smoothed angles; baseline_alpha: how fast the
+    # frontal baseline follows the smoothed angles on calm frames
+    'pose': {'alpha': 0.4, 'baseline_alpha': 0.05, 'yaw_enter': 25.0, 'yaw_exit': 15.0, 'pitch_enter': 20.0, 'pitch_exit': 12.0},
+}
+
+
+def merge_thresholds(overrides=None):
+    """DEFAULT_THRESHOLDS with the values of ``overrides`` (same shape, any subset) applied"""
+    thresholds = copy.deepcopy(DEFAULT_THRESHOLDS)
+    for name, values in (overrides or {}).items():
+        if name not in thresholds:
+            raise ValueError(f'Unknown infraction threshold group: {name}')
+        unknown = set(values) - set(thresholds[name])
+        if unknown:
+            raise ValueError(f'Unknown {name} thresholds: {", ".join(sorted(unknown))}')
+        thresholds[name].update(values)
+    for name in INFRACTION_PRIORITY:
+        rule = thresholds[name]
+        if not 1 <= rule['enter'] <= rule['window'] or not 1 <= rule['exit'] <= rule['window']:
+            raise ValueError(f'{name}: enter and exit must be between 1 and window')
+    return thresholds
+
+
+def _wrap(degrees):
+    """An angle difference folded into [-180, 180)"""
+    return (degrees + 180.0) % 360.0 - 180.0
+
+
+class InfractionEngine:
+    """Turns frame verdicts into session infractions with k-of-n votes and pose hysteresis.
+
+    ``update`` is called once per applied frame, under the session's lock, with
+    the frame's own verdict. It returns the infraction the session is in,
+    which is what the correction-window logic acts on. Thresholds with
+    ``window``, ``enter`` and ``exit`` all 1 and the pose rule off
+    (``yaw_enter``/``pitch_enter`` 180) reproduce the per-frame behaviour.
+    """
+
+    def __init__(self, thresholds=None, enabled=INFRACTION_PRIORITY):
+        self.thresholds = merge_thresholds(thresholds)
+        self.enabled = [name for name in INFRACTION_PRIORITY if name in enabled]
+        self.pose = self.thresholds['pose']
+
+    @staticmethod
+    def new_state():
+        return {
+            'votes': {},  # infraction -> bit mask of its recent votes, newest frame in bit 0
+            'frames': 0,
+            'active': None,
+            'reason': None,
+            'yaw': None,
+            'pitch': None,
+            'base_yaw': None,
+            'base_pitch': None,
+        }
+
+    def update(self, state, candidate, reason=None, pose=None):
+        """(infraction, reason) of the session after a frame whose own verdict is ``candidate``.
+
+        ``pose`` is the (yaw, pitch) of the frame's main face in degrees, or None
+        when no face was found.
+        """
+        active = state['active']
+        turned = self._track_pose(state, pose, calm=candidate is None and active is None, holding=active == 'profile_face')
+        if turned and candidate is None and 'profile_face' in self.enabled:
+            candidate, reason = 'profile_face', DEFAULT_REASONS['profile_face']
+        state['frames'] += 1
+        counts = {}
+        for name in self.enabled:
+            window = self.thresholds[name]['window']
+            votes = ((state['votes'].get(name, 0) << 1) | (candidate == name)) & ((1 << window) - 1)
+            state['votes'][name] = votes
+            counts[name] = bin(votes).count('1')
+
+        if active is not None:
+            rule = self.thresholds[active]
+            against = min(state['frames'], rule['window']) - counts.get(active, 0)
+            if against >= rule['exit'] and not (active == 'profile_face' and turned):
+                active = None
+        for name in self.enabled:
+            if name == active:
+                break  # only a higher-priority infraction takes over
+            if counts[name] >= self.thresholds[name]['enter']:
+                active = name
+                # The reason stays fixed while the infraction lasts, so the window is not restarted
+                state['reason'] = reason if candidate == name and reason else DEFAULT_REASONS[name]
+                break
+        state['active'] = active
+        if active is None:
+            state['reason'] = None
+        return active, state['reason']
+
+    def _track_pose(self, state, pose, calm, holding):
+        """Smooth the angles and tell whether the head is turned away from the baseline"""
+        if pose is None:
+            return False
+        yaw, pitch = pose
+        if state['yaw'] is None:
+            state['yaw'], state['pitch'] = float(yaw), float(pitch)
+        else:
+            alpha = self.pose['alpha']
+            state['yaw'] = _wrap(state['yaw'] + alpha * _wrap(yaw - state['yaw']))
+            state['pitch'] = _wrap(state['pitch'] + alpha * _wrap(pitch - state['pitch']))
+        if state['base_yaw'] is None:
+            if calm:
+                state['base_yaw'], state['base_pitch'] = state['yaw'], state['pitch']
+            return False
+        yaw_off = abs(_wrap(state['yaw'] - state['base_yaw']))
+        pitch_off = abs(_wrap(state['pitch'] - state['base_pitch']))
+        if holding:
+            turned = yaw_off > self.pose['yaw_exit'] or pitch_off > self.pose['pitch_exit']
+        else:
+            turned = yaw_off > self.pose['yaw_enter'] or pitch_off > self.pose['pitch_enter']
+        if calm and not turned:
+            beta = self.pose['baseline_alpha']
+            state['base_yaw'] = _wrap(state['base_yaw'] + beta * _wrap(state['yaw'] - state['base_yaw']))
+            state['base_pitch'] = _wrap(state['base_pitch'] + beta * _wrap(state['pitch'] - state['base_pitch']))
+        return turned
+
+    def describe(self, state):
+        """Vote counts and smoothed angles for debug output"""
+        return {
+            'votes': {name: bin(votes).count('1') for name, votes in state['votes'].items()},
+            'smoothed_yaw': round(state['yaw'], 2) if state['yaw'] is not None else None,
+            'smoothed_pitch': round(state['pitch'], 2) if state['pitch'] is not None else None,
+            'yaw_offset': round(_wrap(state['yaw'] - state['base_yaw']), 2) if state['base_yaw'] is not None else None,
+            'pitch_offset': round(_wrap(state['pitch'] - state['base_pitch']), 2) if state['base_pitch'] is not None else None,
+        }
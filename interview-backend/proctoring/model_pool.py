@@ -0,0 +1,160 @@
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from proctoring.stats import percentile
+
+
+class PoolClosedError(RuntimeError):
+    pass
+
+
+class ModelPool:
+    """Fixed-size pool of model instances shared by the request threads of one worker.
+
+    MediaPipe solution objects are not safe to call from two threads at once, so
+    each instance is handed to a single request at a time. Instances are created
+    lazily up to ``size`` (or all at once with ``fill``) and reused until ``close``.
+
+    A checkout that builds a new instance counts as a creation, not as a wait:
+    the wait statistics only cover checkouts that blocked for a busy instance.
+    """
+
+    def __init__(self, name, factory, size=1, wait_samples=1024):
+        self.name = name
+        self.size = max(1, int(size))
+        self._factory = factory
+        self._idle = queue.LifoQueue()
+        self._instances = []
+        self._creating = 0  # instances being built outside the lock
+        self._lock = threading.Lock()
+        self._closed = False
+        # Checkout wait statistics
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits = deque(maxlen=wait_samples)
+        self._create_total = 0.0
+        self._create_max = 0.0
+
+    def _create(self):
+        """Create one more instance if the pool is not full yet. Returns it or None."""
+        with self._lock:
+            if self._closed:
+                raise PoolClosedError(f'{self.name} pool is closed')
+            if len(self._instances) + self._creating >= self.size:
+                return None
+            self._creating += 1
+        # Building a model takes up to a second; stats() and other checkouts must not wait for it
+        start = time.perf_counter()
+        try:
+            model = self._factory()
+        except BaseException:
+            with self._lock:
+                self._creating -= 1
+            raise
+        took = time.perf_counter() - start
+        with self._lock:
+            self._creating -= 1
+            self._instances.append(model)
+            self._create_total += took
+            self._create_max = max(self._create_max, took)
+        return model
+
+    def fill(self):
+        """Create every instance up front (used at worker startup)."""
+        while True:
+            model = self._create()
+            if model is None:
+                break
+            self._idle.put(model)
+
+    def warmup(self, run):
+        """Call ``run(model)`` once on every created instance, e.g. with a blank frame."""
+        with self._lock:
+            count = len(self._instances)
+        models = [self._idle.get() for _ in range(count)]
+        try:
+            for model in models:
+                run(model)
+        finally:
+            for model in models:
+                self._idle.put(model)
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Borrow an instance for the duration of the ``with`` block."""
+        try:
+            model = self._idle.get_nowait()
+            self._record_wait(0.0)
+        except queue.Empty:
+            model = self._create()
+            if model is not None:
+                self._record_wait(0.0)
+            else:
+                start = time.perf_counter()
+                model = self._idle.get(timeout=timeout)
+                self._record_wait(time.perf_counter() - start)
+        try:
+            yield model
+        finally:
+            if self._closed:
+                _close_model(model)
+            else:
+                self._idle.put(model)
+
+    def _record_wait(self, waited):
+        with self._lock:
+            self._checkouts += 1
+            self._wait_total += waited
+            if waited > self._wait_max:
+                self._wait_max = waited
+            self._recent_waits.append(waited)
+
+    def stats(self):
+        """Pool size and checkout wait times (milliseconds)."""
+        with self._lock:
+            recent = sorted(self._recent_waits)
+            created = len(self._instances)
+            checkouts = self._checkouts
+            wait_total = self._wait_total
+            wait_max = self._wait_max
+            create_total = self._create_total
+            create_max = self._create_max
+        return {
+            'name': self.name,
+            'size': self.size,
+            'created': created,
+            'idle': self._idle.qsize(),
+            'checkouts': checkouts,
+            'wait_ms_avg': round(wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+            'wait_ms_p95': round(percentile(recent, 0.95) * 1000, 3),
+            'wait_ms_max': round(wait_max * 1000, 3),
+            'create_ms_avg': round(create_total / created * 1000, 3) if created else 0.0,
+            'create_ms_max': round(create_max * 1000, 3),
+        }
+
+    def close(self):
+        """Close every idle instance. Instances still checked out are closed on return."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        while True:
+            try:
+                model = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            _close_model(model)
+
+
+def _close_model(model):
+    close = getattr(model, 'close', None)
+    if close is not None:
+        try:
+            close()
+        except Exception as e:
+            print(f'Failed to close model: {e}')
+
@@ -0,0 +1,104 @@
+import random
+import threading
+
+import cv2
+import numpy as np
+
+_local = threading.local()
+
+
+def _buffer(name, shape):
+    """Contiguous uint8 array of ``shape`` backed by a per-thread buffer that only grows"""
+    size = int(np.prod(shape))
+    buffers = getattr(_local, 'buffers', None)
+    if buffers is None:
+        buffers = _local.buffers = {}
+    buf = buffers.get(name)
+    if buf is None or buf.size < size:
+        buf = buffers[name] = np.empty(size, np.uint8)
+    return buf[:size].reshape(shape)
+
+
+class InputNormalizer:
+    """Prepares a decoded frame for the models once per frame.
+
+    The frame is resized to ``working_width`` (never enlarged) into a per-thread
+    buffer, and converted to RGB once into another per-thread buffer, optionally
+    only inside a crop box. Both buffers are reused by the next frame on the same
+    thread, so models must not keep references to them (the OpenCV nets and
+    MediaPipe graphs copy their input).
+
+    A fraction (``audit_rate``) of the downsized frames is also run at full
+    resolution by the caller, which reports whether the two decisions agreed.
+    """
+
+    def __init__(self, working_width=0, audit_rate=0.0):
+        self.working_width = max(0, int(working_width))
+        self.audit_rate = audit_rate
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.resized = 0
+        self.cropped = 0
+        self.input_pixels = 0
+        self.rgb_pixels = 0
+        self.audits = 0
+        self.agreements = 0
+
+    def prepare(self, frame, roi=None, working_width=None):
+        """(model_frame, rgb_frame, region) for a BGR frame.
+
+        ``model_frame`` is the whole frame at the working resolution. ``rgb_frame``
+        is its RGB conversion, limited to ``roi`` (x0, y0, x1, y1 in frame pixels)
+        when given. ``region`` is the part of the frame ``rgb_frame`` covers, in frame
+        pixels, or None for the whole frame.
+        """
+        working_width = self.working_width if working_width is None else working_width
+        (h, w) = frame.shape[:2]
+        scale = 1.0
+        model_frame = frame
+        if working_width and w > working_width:
+            scale = working_width / w
+            size = (working_width, max(1, round(h * scale)))
+            # INTER_AREA is only fast for whole-number ratios (1280 -> 640); otherwise it costs
+            # more than the models save, so fall back to bilinear
+            interpolation = cv2.INTER_AREA if w % working_width == 0 else cv2.INTER_LINEAR
+            model_frame = cv2.resize(frame, size, dst=_buffer('model', (size[1], size[0], 3)), interpolation=interpolation)
+        region = None
+        source = model_frame
+        if roi is not None:
+            (mh, mw) = model_frame.shape[:2]
+            x0, y0 = max(0, int(roi[0] * scale)), max(0, int(roi[1] * scale))
+            x1, y1 = min(mw, int(np.ceil(roi[2] * scale))), min(mh, int(np.ceil(roi[3] * scale)))
+            if x1 - x0 >= 16 and y1 - y0 >= 16:
+                source = model_frame[y0:y1, x0:x1]
+                region = (x0 / scale, y0 / scale, x1 / scale, y1 / scale)
+        rgb_frame = cv2.cvtColor(source, cv2.COLOR_BGR2RGB, dst=_buffer('rgb', source.shape))
+        with self._lock:
+            self.frames += 1
+            self.resized += model_frame is not frame
+            self.cropped += region is not None
+            self.input_pixels += h * w
+            self.rgb_pixels += rgb_frame.shape[0] * rgb_frame.shape[1]
+        return model_frame, rgb_frame, region
+
+    def should_audit(self, frame):
+        return (self.audit_rate > 0 and bool(self.working_width) and frame.shape[1] > self.working_width
+                and random.random() < self.audit_rate)
+
+    def record_audit(self, agreed):
+        with self._lock:
+            self.audits += 1
+            self.agreements += bool(agreed)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'working_width': self.working_width,
+                'frames': self.frames,
+                'resized': self.resized,
+                'cropped': self.cropped,
+                # Share of the decoded pixels that reached the RGB models
+                'pixel_ratio': round(self.rgb_pixels / self.input_pixels, 4) if self.input_pixels else None,
+                'audits': self.audits,
+                'agreement_rate': round(self.agreements / self.audits, 4) if self.audits else None,
+            }
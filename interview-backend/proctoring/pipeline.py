@@ -0,0 +1,105 @@
+import threading
+import time
+
+
+class Stage:
+    """One step of the detection pipeline.
+
+    ``run(model, *inputs)`` receives a model borrowed from ``pool`` (``None`` when
+    the stage has no pool or its model files are missing) followed by the values
+    named in ``inputs``, and returns a tuple matching ``outputs``.
+    """
+
+    def __init__(self, name, inputs, outputs, run, pool=None):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.pool = pool
+        self._run = run
+
+    def __call__(self, *args):
+        if self.pool is None:
+            return self._run(None, *args)
+        with self.pool.checkout() as model:
+            return self._run(model, *args)
+
+
+class DetectionPipeline:
+    """Runs only the stages needed to produce the requested outputs.
+
+    Stages are declared in execution order. A stage runs when one of its outputs
+    is required, directly or as the input of another required stage, so models
+    behind unused stages are never loaded.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self._producers = {}
+        for stage in self.stages:
+            for output in stage.outputs:
+                self._producers[output] = stage
+        self._plans = {}
+        self._lock = threading.Lock()
+        self._observers = []
+
+    def add_observer(self, observer):
+        """Call ``observer(stage_name, seconds)`` after every stage that runs"""
+        self._observers.append(observer)
+
+    def plan(self, required):
+        """Stages (in declared order) needed to compute ``required``."""
+        key = frozenset(required)
+        with self._lock:
+            plan = self._plans.get(key)
+        if plan is not None:
+            return plan
+        needed = set()
+
+        def visit(name):
+            stage = self._producers.get(name)
+            if stage is None or stage.name in needed:
+                return  # raw input (e.g. 'frame') or already planned
+            needed.add(stage.name)
+            for value in stage.inputs:
+                visit(value)
+
+        for name in key:
+            visit(name)
+        plan = [stage for stage in self.stages if stage.name in needed]
+        with self._lock:
+            self._plans[key] = plan
+        return plan
+
+    def run(self, inputs, required):
+        """Run the planned stages. Returns ``inputs`` plus every computed output.
+
+        Stages whose outputs are all in ``inputs`` already are skipped, so the
+        values of one run can be passed to the next to compute more outputs.
+        """
+        values = dict(inputs)
+        for stage in self.plan(required):
+            if all(name in values for name in stage.outputs):
+                continue
+            started = time.perf_counter()
+            result = stage(*[values[name] for name in stage.inputs])
+            values.update(zip(stage.outputs, result))
+            if self._observers:
+                elapsed = time.perf_counter() - started
+                for observer in self._observers:
+                    observer(stage.name, elapsed)
+        return values
+
+    def pools(self, required=None):
+        stages = self.stages if required is None else self.plan(required)
+        return [stage.pool for stage in stages if stage.pool is not None]
+
+    def warm_up(self, inputs, required):
+        """Create every pooled model the plan needs and run each one once on ``inputs``."""
+        values = self.run(inputs, required)
+        for stage in self.plan(required):
+            if stage.pool is None:
+                continue
+            args = [values[name] for name in stage.inputs]
+            stage.pool.fill()
+            stage.pool.warmup(lambda model, stage=stage, args=args: stage._run(model, *args))
+        return values
@@ -0,0 +1,94 @@
+import glob
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def _folded_stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SlowRequestProfiler:
+    """Sampling profiler that keeps a flame profile of requests slower than ``threshold_ms``.
+
+    While a request runs inside ``profile``, a background thread records its
+    thread's stack every ``interval_ms``. Requests that finish under the
+    threshold are discarded; slower ones are written to ``output_dir`` in the
+    folded-stack format read by flamegraph.pl and speedscope. Only the newest
+    ``max_profiles`` files are kept.
+    """
+
+    def __init__(self, threshold_ms, interval_ms=5, output_dir='profiles', max_profiles=100):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.output_dir = output_dir
+        self.max_profiles = max_profiles
+        self._active = {}  # thread ident -> Counter of folded stacks
+        self._cond = threading.Condition()
+        self._thread = None
+        self.written = 0
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='slow-request-profiler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            with self._cond:
+                while not self._active:
+                    self._cond.wait()
+                active = list(self._active.items())
+            frames = sys._current_frames()
+            for ident, samples in active:
+                frame = frames.get(ident)
+                if frame is not None and ident != own:
+                    samples[_folded_stack(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+    @contextmanager
+    def profile(self, name):
+        ident = threading.get_ident()
+        samples = Counter()
+        with self._cond:
+            self._start()
+            self._active[ident] = samples
+            self._cond.notify()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._cond:
+                self._active.pop(ident, None)
+            if elapsed >= self.threshold and samples:
+                self._write(name, elapsed, samples)
+
+    def _write(self, name, elapsed, samples):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+            path = os.path.join(self.output_dir, f'{int(time.time() * 1000)}-{safe_name}-{int(elapsed * 1000)}ms.folded')
+            with open(path, 'w') as f:
+                for stack, count in samples.most_common():
+                    f.write(f'{stack} {count}\n')
+            self.written += 1
+            profiles = sorted(glob.glob(os.path.join(self.output_dir, '*.folded')))
+            for old in profiles[:-self.max_profiles]:
+                os.remove(old)
+            logger.warning('Slow request (%.0f ms) profile written to %s', elapsed * 1000, path)
+        except OSError as e:
+            logger.warning('Failed to write request profile: %s', e)
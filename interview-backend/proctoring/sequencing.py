@@ -0,0 +1,142 @@
+import threading
+import time
+
+
+class FrameDropped(RuntimeError):
+    """A frame was dropped without inference. ``reason`` is 'stale' or 'superseded'."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def parse_frame_order(seq, captured_at):
+    """(seq, captured_at) from client-supplied values: a non-negative integer sequence
+    number and a capture time in milliseconds since the epoch, returned in seconds.
+    Missing or malformed values become None."""
+    try:
+        seq = int(seq) if seq is not None and seq != '' else None
+    except (TypeError, ValueError):
+        seq = None
+    if seq is not None and seq < 0:
+        seq = None
+    try:
+        captured_at = float(captured_at) / 1000.0 if captured_at is not None and captured_at != '' else None
+    except (TypeError, ValueError):
+        captured_at = None
+    if captured_at is not None and not captured_at > 0:
+        captured_at = None
+    return seq, captured_at
+
+
+def is_newer_frame(seq, captured_at, last_seq, last_captured_at):
+    """Whether a frame comes after the last accepted frame of its session.
+
+    Sequence numbers decide. A lower number with a later capture time means the
+    client restarted its counter (a page reload), so the frame is newer. Frames
+    without ordering information are always accepted.
+    """
+    if seq is not None and last_seq is not None and seq > last_seq:
+        return True
+    if captured_at is not None and last_captured_at is not None:
+        return captured_at > last_captured_at
+    return seq is None or last_seq is None or seq > last_seq
+
+
+class _Lane:
+    __slots__ = ('cond', 'seq', 'captured_at', 'running', 'pending', 'running_since', 'pending_since', 'touched')
+
+    def __init__(self, lock, now):
+        self.cond = threading.Condition(lock)
+        self.seq = None
+        self.captured_at = None
+        self.running = False
+        self.pending = None
+        # Arrival times of the running and the waiting frame
+        self.running_since = None
+        self.pending_since = None
+        self.touched = now
+
+
+class FrameSequencer:
+    """Orders the frames of each session before they reach inference.
+
+    A session runs one frame at a time and keeps at most one frame waiting. A
+    newer frame takes the waiting slot and the frame it replaces is dropped as
+    ``superseded``. A frame older than one already accepted for the session is
+    dropped as ``stale``. Neither runs inference. Lanes live in this process
+    only and are dropped after ``ttl`` idle seconds.
+    """
+
+    def __init__(self, ttl=600):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._lanes = {}
+        self._next_sweep = 0.0
+        self.dropped = {'stale': 0, 'superseded': 0}
+
+    def _lane(self, session_id, now):
+        if now >= self._next_sweep:
+            self._next_sweep = now + min(self.ttl, 60)
+            for sid in [sid for sid, lane in self._lanes.items()
+                        if now - lane.touched > self.ttl and not lane.running and lane.pending is None]:
+                del self._lanes[sid]
+        lane = self._lanes.get(session_id)
+        if lane is None:
+            lane = self._lanes[session_id] = _Lane(self._lock, now)
+        lane.touched = now
+        return lane
+
+    def run(self, session_id, seq, captured_at, fn, *args):
+        """Run ``fn(*args)`` once the session's earlier frames are done and return its result
+        (raises FrameDropped when a newer frame makes this one pointless)"""
+        ticket = object()
+        now = time.time()
+        with self._lock:
+            lane = self._lane(session_id, now)
+            if not is_newer_frame(seq, captured_at, lane.seq, lane.captured_at):
+                self.dropped['stale'] += 1
+                raise FrameDropped('stale')
+            lane.seq, lane.captured_at = seq, captured_at
+            if lane.pending is not None:
+                lane.cond.notify_all()
+            lane.pending = ticket
+            lane.pending_since = now
+            while lane.running and lane.pending is ticket:
+                lane.cond.wait()
+            if lane.pending is not ticket:
+                self.dropped['superseded'] += 1
+                raise FrameDropped('superseded')
+            lane.pending = None
+            lane.running = True
+            lane.running_since = now
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                lane.running = False
+                lane.running_since = None
+                lane.touched = time.time()
+                lane.cond.notify_all()
+
+    def in_flight_since(self, session_id):
+        """Arrival time of the session's oldest frame that is running or waiting, or None"""
+        with self._lock:
+            lane = self._lanes.get(session_id)
+            if lane is None:
+                return None
+            times = [since for since, busy in ((lane.running_since, lane.running), (lane.pending_since, lane.pending is not None)) if busy]
+            return min(times) if times else None
+
+    def discard(self, session_id):
+        with self._lock:
+            self._lanes.pop(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._lanes),
+                'running': sum(lane.running for lane in self._lanes.values()),
+                'waiting': sum(lane.pending is not None for lane in self._lanes.values()),
+                'dropped': dict(self.dropped),
+            }
@@ -0,0 +1,314 @@
+import json
+import os
+import time
+from array import array
+from urllib.parse import quote
+
+from proctoring.sequencing import is_newer_frame
+
+# Compact per-session proctoring state. Event logs are kept as typed arrays
+# (one small integer or float per field) and only turned back into the
+# {'event': ..., 'time': ...} dicts the API returns when someone asks for them.
+
+EVENT_TYPES = ('correction_window_started', 'corrected_in_time', 'terminated', 'window_corrected', 'window_expired')
+INFRACTION_TYPES = (None, 'no_face', 'multiple_faces', 'profile_face')
+# Events reported as a session's infractions: the warnings and the termination
+INFRACTION_EVENTS = ('correction_window_started', 'terminated')
+
+# Keys each event type carries in the JSON shape (in order)
+EVENT_FIELDS = {
+    'correction_window_started': ('infraction', 'reason', 'time', 'warning_count'),
+    'corrected_in_time': ('infraction', 'time', 'warning_count'),
+    'terminated': ('reason', 'time', 'warning_count'),
+    # Correction window outcomes (correction_window_history)
+    'window_corrected': ('infraction', 'reason', 'time'),
+    'window_expired': ('infraction', 'reason', 'time'),
+}
+
+_EVENT_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+_INFRACTION_CODES = {name: code for code, name in enumerate(INFRACTION_TYPES)}
+_NO_WARNING_COUNT = -1
+
+
+class FileSpill:
+    """Spilled events of one log as JSON lines in a local file (line i is event i)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, entries):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+
+    def read(self, start, stop):
+        entries = []
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for i, line in enumerate(f):
+                    if i >= stop:
+                        break
+                    if i >= start:
+                        entries.append(json.loads(line))
+        return entries
+
+    def discard(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def file_spill(spill_dir):
+    """Spill factory (``spill(session_id, kind)``) keeping spilled events under ``spill_dir``,
+    or None when it is not set"""
+    if not spill_dir:
+        return None
+    return lambda session_id, kind: FileSpill(_spill_path(spill_dir, session_id, kind))
+
+
+class EventLog:
+    """Append-only, bounded log of proctoring events stored column by column.
+
+    Holds at most ``cap`` events in memory. When full, the oldest half is
+    appended to ``spill`` (a FileSpill, or a shared store's equivalent) or
+    dropped when there is none. Event indexes keep counting from the first
+    event ever appended, so ``offset`` is the index of the oldest event still
+    in memory.
+    """
+
+    __slots__ = ('cap', 'spill', 'offset', 'reasons', '_events', '_infractions', '_reasons', '_times', '_warning_counts')
+
+    def __init__(self, cap=512, spill=None):
+        self.cap = max(2, int(cap))
+        self.spill = spill
+        self.offset = 0
+        self.reasons = []  # distinct reason strings, referenced by index
+        self._events = array('B')
+        self._infractions = array('B')
+        self._reasons = array('H')
+        self._times = array('d')
+        self._warning_counts = array('h')
+
+    def __len__(self):
+        return self.offset + len(self._times)
+
+    def append(self, event, time, infraction=None, reason=None, warning_count=None):
+        if len(self._times) >= self.cap:
+            self._spill(self.cap // 2)
+        self._events.append(_EVENT_CODES[event])
+        self._infractions.append(_INFRACTION_CODES.get(infraction, 0))
+        self._reasons.append(self._reason_code(reason))
+        self._times.append(time)
+        self._warning_counts.append(_NO_WARNING_COUNT if warning_count is None else warning_count)
+
+    def _reason_code(self, reason):
+        try:
+            return self.reasons.index(reason)
+        except ValueError:
+            self.reasons.append(reason)
+            return len(self.reasons) - 1
+
+    def _entry(self, i):
+        event = EVENT_TYPES[self._events[i]]
+        values = {
+            'infraction': INFRACTION_TYPES[self._infractions[i]],
+            'reason': self.reasons[self._reasons[i]],
+            'time': self._times[i],
+            'warning_count': self._warning_counts[i],
+        }
+        entry = {'event': event}
+        for field in EVENT_FIELDS[event]:
+            if field == 'warning_count' and values[field] == _NO_WARNING_COUNT:
+                continue
+            entry[field] = values[field]
+        return entry
+
+    def _spill(self, count):
+        if self.spill:
+            self.spill.append([self._entry(i) for i in range(count)])
+        for column in (self._events, self._infractions, self._reasons, self._times, self._warning_counts):
+            del column[:count]
+        self.offset += count
+
+    def last(self):
+        """The newest event as a dict, or None"""
+        return self._entry(len(self._times) - 1) if self._times else None
+
+    @property
+    def first_index(self):
+        """Index of the oldest event that can still be read (spilled events included)"""
+        return 0 if self.spill else self.offset
+
+    def to_list(self, start=0, include_spilled=False, stop=None):
+        """Events with indexes from ``start`` up to ``stop`` (default: the end), in the JSON shape"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        entries = []
+        if include_spilled and start < self.offset and self.spill:
+            entries.extend(self.spill.read(start, min(stop, self.offset)))
+        first = max(0, start - self.offset)
+        entries.extend(self._entry(i) for i in range(first, stop - self.offset))
+        return entries
+
+    def discard_spill(self):
+        if self.spill:
+            self.spill.discard()
+
+    def to_state(self):
+        """Compact, JSON-serializable form (used by shared session stores)"""
+        return {
+            'offset': self.offset,
+            'reasons': self.reasons,
+            'columns': [list(self._events), list(self._infractions), list(self._reasons), list(self._times), list(self._warning_counts)],
+        }
+
+    @classmethod
+    def from_state(cls, state, cap=512, spill=None):
+        log = cls(cap, spill)
+        log.offset = state['offset']
+        log.reasons = list(state['reasons'])
+        events, infractions, reasons, times, warning_counts = state['columns']
+        log._events.extend(events)
+        log._infractions.extend(infractions)
+        log._reasons.extend(reasons)
+        log._times.extend(times)
+        log._warning_counts.extend(warning_counts)
+        return log
+
+
+# Correction window outcomes are kept in an EventLog too: 'window_corrected' or 'window_expired'
+def _history_entry(entry):
+    return {'infraction': entry.get('infraction'), 'reason': entry.get('reason'), 'corrected': entry['event'] == 'window_corrected', 'time': entry['time']}
+
+
+WARNING_BITS = {'no_face': 1, 'multiple_faces': 2, 'profile_face': 4}
+
+
+class SessionRecord:
+    """Proctoring state of one session"""
+
+    __slots__ = (
+        'session_id', 'warning_count', 'issued_warnings_mask', 'last_frontal_face_time',
+        'profile_face_resolved', 'terminated', 'quit_reason', 'termination_reason',
+        'no_face_timer_start', 'no_face_timer_active',
+        'correction_timer_active', 'correction_timer_start', 'correction_infraction', 'correction_reason',
+        'proctoring_event_log', 'correction_window_history',
+        'frame_seq', 'frame_captured_at', 'frame_time', 'clock_offset', 'infraction_state',
+    )
+
+    def __init__(self, session_id, now=None, event_log_cap=512, spill=None):
+        self.session_id = session_id
+        self.warning_count = 0
+        self.issued_warnings_mask = 0  # Track which warning types have been issued (WARNING_BITS)
+        self.last_frontal_face_time = time.time() if now is None else now
+        self.profile_face_resolved = True  # Track if profile face issue is resolved
+        self.terminated = False
+        self.quit_reason = ""
+        self.termination_reason = None
+        self.no_face_timer_start = None
+        self.no_face_timer_active = False
+        self.correction_timer_active = False
+        self.correction_timer_start = None
+        self.correction_infraction = None
+        self.correction_reason = None
+        self.proctoring_event_log = EventLog(event_log_cap, spill(session_id, 'events') if spill else None)
+        self.correction_window_history = EventLog(event_log_cap, spill(session_id, 'history') if spill else None)
+        # Ordering of applied frames (see frame_clock)
+        self.frame_seq = None
+        self.frame_captured_at = None
+        self.frame_time = None
+        self.clock_offset = None
+        # Votes and smoothed head pose of the infraction engine (InfractionEngine.new_state)
+        self.infraction_state = None
+
+    def has_warning(self, warning_type):
+        return bool(self.issued_warnings_mask & WARNING_BITS[warning_type])
+
+    def add_warning(self, warning_type):
+        self.issued_warnings_mask |= WARNING_BITS[warning_type]
+
+    def discard_warning(self, warning_type):
+        self.issued_warnings_mask &= ~WARNING_BITS[warning_type]
+
+    def issued_warnings(self):
+        return [name for name, bit in WARNING_BITS.items() if self.issued_warnings_mask & bit]
+
+    def log_event(self, event, time, infraction=None, reason=None, warning_count=None):
+        self.proctoring_event_log.append(event, time, infraction, reason, warning_count)
+
+    def log_correction(self, infraction, reason, corrected, time):
+        self.correction_window_history.append('window_corrected' if corrected else 'window_expired', time, infraction, reason)
+
+    def frame_clock(self, seq, captured_at, received_at):
+        """Session time of a frame about to be applied, or None when a newer frame was already applied.
+
+        Timers run on capture time, so a frame delayed in transit or in the queue is
+        judged by when it was taken. Capture times come from the client clock, so they
+        are shifted by the smallest transit delay seen in this session, which absorbs
+        clock skew and never puts a frame after its arrival. When a faster frame lowers
+        that offset, the running correction window is moved back by the same amount.
+        """
+        if not is_newer_frame(seq, captured_at, self.frame_seq, self.frame_captured_at):
+            return None
+        self.frame_seq, self.frame_captured_at = seq, captured_at
+        frame_time = received_at
+        if captured_at is not None:
+            delay = received_at - captured_at
+            if self.clock_offset is None:
+                self.clock_offset = delay
+            elif delay < self.clock_offset:
+                shift = self.clock_offset - delay
+                self.clock_offset = delay
+                if self.correction_timer_start is not None:
+                    self.correction_timer_start -= shift
+                if self.frame_time is not None:
+                    self.frame_time -= shift
+            frame_time = captured_at + self.clock_offset
+        if self.frame_time is not None:
+            frame_time = max(frame_time, self.frame_time)
+        self.frame_time = frame_time
+        return frame_time
+
+    def event_log(self, start=0, include_spilled=False):
+        return self.proctoring_event_log.to_list(start, include_spilled)
+
+    def infractions(self, include_spilled=False):
+        """The warning and termination entries of the event log"""
+        return [entry for entry in self.event_log(0, include_spilled) if entry['event'] in INFRACTION_EVENTS]
+
+    def events_since(self, cursor):
+        """(index of the first event returned, in-memory events) for a client that holds the
+        first ``cursor`` events. A cursor past the end (the session was reset) starts over."""
+        log = self.proctoring_event_log
+        if cursor > len(log):
+            cursor = 0
+        start = max(cursor, log.offset)
+        return start, log.to_list(start)
+
+    def correction_history(self, include_spilled=False):
+        return [_history_entry(entry) for entry in self.correction_window_history.to_list(0, include_spilled)]
+
+    def discard_spill(self):
+        self.proctoring_event_log.discard_spill()
+        self.correction_window_history.discard_spill()
+
+    def to_state(self):
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state['proctoring_event_log'] = self.proctoring_event_log.to_state()
+        state['correction_window_history'] = self.correction_window_history.to_state()
+        return state
+
+    @classmethod
+    def from_state(cls, state, event_log_cap=512, spill=None):
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(record, name, state.get(name))
+        session_id = state['session_id']
+        record.proctoring_event_log = EventLog.from_state(state['proctoring_event_log'], event_log_cap, spill(session_id, 'events') if spill else None)
+        record.correction_window_history = EventLog.from_state(state['correction_window_history'], event_log_cap, spill(session_id, 'history') if spill else None)
+        return record
+
+
+def _spill_path(spill_dir, session_id, kind):
+    # Percent-escaping keeps distinct ids (such as 'a/b' and 'a_b') in distinct files
+    safe_id = quote(str(session_id), safe='')
+    return os.path.join(spill_dir, f'{safe_id}.{kind}.jsonl')
@@ -0,0 +1,268 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from proctoring.session_record import SessionRecord, file_spill
+
+
+class SessionLockTimeout(RuntimeError):
+    pass
+
+
+class _Entry:
+    __slots__ = ('state', 'lock', 'touched')
+
+    def __init__(self, state, now):
+        self.state = state
+        self.lock = threading.Lock()
+        self.touched = now
+
+
+class _Shard:
+    __slots__ = ('lock', 'entries', 'next_sweep')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.next_sweep = 0.0
+
+
+class MemorySessionStore:
+    """In-process session store with idle-TTL and LRU eviction.
+
+    Sessions are spread over ``shards`` independently locked LRU maps, and each
+    session has its own lock so updates to one session are serialized without
+    blocking the others. Only safe with a single worker process; use
+    ``RedisSessionStore`` to share sessions between workers.
+
+    Evicted sessions have their spill files removed, and so does a new session
+    whose id left files behind (an earlier run of the service).
+    """
+
+    def __init__(self, idle_ttl=3 * 3600, max_sessions=50000, shards=16, event_log_cap=512, spill_dir=None):
+        self.idle_ttl = idle_ttl
+        self.event_log_cap = event_log_cap
+        self.spill_dir = spill_dir
+        self._spill = file_spill(spill_dir)
+        self._shards = [_Shard() for _ in range(max(1, shards))]
+        self._shard_capacity = max(1, max_sessions // len(self._shards))
+        self.evicted = 0
+
+    def _shard(self, session_id):
+        return self._shards[hash(session_id) % len(self._shards)]
+
+    def _entry(self, session_id, create):
+        now = time.time()
+        shard = self._shard(session_id)
+        with shard.lock:
+            self._sweep(shard, now)
+            entry = shard.entries.get(session_id)
+            if entry is not None and now - entry.touched > self.idle_ttl:
+                del shard.entries[session_id]
+                self._evict(entry)
+                entry = None
+            if entry is None:
+                if not create:
+                    return None
+                record = SessionRecord(session_id, now, self.event_log_cap, self._spill)
+                record.discard_spill()
+                entry = shard.entries[session_id] = _Entry(record, now)
+                while len(shard.entries) > self._shard_capacity:
+                    self._evict(shard.entries.popitem(last=False)[1])
+            else:
+                shard.entries.move_to_end(session_id)
+            entry.touched = now
+            return entry
+
+    def _sweep(self, shard, now):
+        # Entries are kept in access order, so expired ones are at the front
+        if now < shard.next_sweep:
+            return
+        shard.next_sweep = now + min(self.idle_ttl, 60)
+        while shard.entries:
+            session_id, entry = next(iter(shard.entries.items()))
+            if now - entry.touched <= self.idle_ttl:
+                break
+            del shard.entries[session_id]
+            self._evict(entry)
+
+    def _evict(self, entry):
+        self.evicted += 1
+        entry.state.discard_spill()
+
+    @contextmanager
+    def session(self, session_id):
+        """Lock a session (creating it if needed) and yield its state for in-place updates"""
+        entry = self._entry(session_id, create=True)
+        with entry.lock:
+            yield entry.state
+
+    def get(self, session_id):
+        """Session state for reading, or None"""
+        entry = self._entry(session_id, create=False)
+        return None if entry is None else entry.state
+
+    def delete(self, session_id):
+        shard = self._shard(session_id)
+        with shard.lock:
+            entry = shard.entries.pop(session_id, None)
+        if entry is not None:
+            entry.state.discard_spill()
+
+    def __len__(self):
+        return sum(len(shard.entries) for shard in self._shards)
+
+
+class _RedisSpill:
+    """Spilled events of one log as a Redis list (item i is event i).
+
+    Appends are buffered until the session is written back, so they are pushed
+    in the same transaction as the state that no longer holds them.
+    """
+
+    def __init__(self, client, key):
+        self.client = client
+        self.key = key
+        self.pending = []
+
+    def append(self, entries):
+        self.pending.extend(entries)
+
+    def read(self, start, stop):
+        stored = int(self.client.llen(self.key))
+        entries = []
+        if start < stored:
+            entries = [json.loads(raw) for raw in self.client.lrange(self.key, start, min(stop, stored) - 1)]
+        return entries + self.pending[max(start - stored, 0):max(stop - stored, 0)]
+
+    def flush(self, pipe, ttl):
+        if self.pending:
+            pipe.rpush(self.key, *(json.dumps(entry) for entry in self.pending))
+            self.pending = []
+        pipe.expire(self.key, ttl)
+
+    def discard(self):
+        self.pending = []
+        self.client.delete(self.key)
+
+
+class RedisSessionStore:
+    """Session store shared by every worker through a Redis-protocol server.
+
+    A session is a JSON document (``SessionRecord.to_state``) that expires after ``idle_ttl`` seconds without
+    updates. ``session`` holds a per-session lock key (SET NX PX) while the state
+    is read, modified and written back, so concurrent frames of one session are
+    applied one at a time across processes and nodes. Events spilled out of the
+    bounded event logs go to Redis lists next to the document, so every node can
+    page through a session's full log. ``client`` can be any redis-py compatible
+    client (e.g. a local fakeredis instance in tests).
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', idle_ttl=3 * 3600, prefix='proctor', client=None, lock_ttl_ms=5000, lock_timeout=5.0, event_log_cap=512):
+        import redis
+        if client is None:
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self._watch_error = redis.WatchError
+        self.idle_ttl = int(idle_ttl)
+        self.prefix = prefix
+        self.lock_ttl_ms = lock_ttl_ms
+        self.lock_timeout = lock_timeout
+        self.event_log_cap = event_log_cap
+
+    def _key(self, session_id):
+        return f'{self.prefix}:session:{session_id}'
+
+    def _lock_key(self, session_id):
+        return f'{self.prefix}:lock:{session_id}'
+
+    def _index_key(self):
+        return f'{self.prefix}:sessions'
+
+    def _spill_key(self, session_id, kind):
+        return f'{self.prefix}:spill:{session_id}:{kind}'
+
+    def _spill(self, session_id, kind):
+        return _RedisSpill(self.client, self._spill_key(session_id, kind))
+
+    def _acquire(self, session_id):
+        token = uuid.uuid4().hex.encode()
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.002
+        while not self.client.set(self._lock_key(session_id), token, nx=True, px=self.lock_ttl_ms):
+            if time.monotonic() > deadline:
+                raise SessionLockTimeout(f'Timed out waiting for session {session_id}')
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        return token
+
+    def _release(self, session_id, token):
+        # Delete the lock only if it still holds our token (it may have expired and
+        # been taken by another worker). WATCH/MULTI keeps this to plain commands.
+        key = self._lock_key(session_id)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if pipe.get(key) == token:
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.execute()
+                else:
+                    pipe.unwatch()
+            except self._watch_error:
+                pass
+
+    @contextmanager
+    def session(self, session_id):
+        """Lock a session (creating it if needed) and yield its state for in-place updates"""
+        token = self._acquire(session_id)
+        try:
+            raw = self.client.get(self._key(session_id))
+            if raw is None:
+                record = SessionRecord(session_id, None, self.event_log_cap, self._spill)
+                # Spilled events of an expired session with this id would be read as this one's
+                record.discard_spill()
+            else:
+                record = self._decode(raw)
+            yield record
+            now = time.time()
+            pipe = self.client.pipeline(transaction=True)
+            pipe.set(self._key(session_id), json.dumps(record.to_state()), ex=self.idle_ttl)
+            for log in (record.proctoring_event_log, record.correction_window_history):
+                log.spill.flush(pipe, self.idle_ttl)
+            pipe.zadd(self._index_key(), {session_id: now})
+            pipe.zremrangebyscore(self._index_key(), '-inf', now - self.idle_ttl)
+            pipe.execute()
+        finally:
+            self._release(session_id, token)
+
+    def get(self, session_id):
+        raw = self.client.get(self._key(session_id))
+        return None if raw is None else self._decode(raw)
+
+    def _decode(self, raw):
+        return SessionRecord.from_state(json.loads(raw), self.event_log_cap, self._spill)
+
+    def delete(self, session_id):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self._key(session_id), self._spill_key(session_id, 'events'), self._spill_key(session_id, 'history'))
+        pipe.zrem(self._index_key(), session_id)
+        pipe.execute()
+
+    def __len__(self):
+        return int(self.client.zcount(self._index_key(), time.time() - self.idle_ttl, '+inf'))
+
+
+def create_session_store(backend='memory', url=None, idle_ttl=3 * 3600, max_sessions=50000, event_log_cap=512, spill_dir=None):
+    """Session store for the configured backend ('memory' or 'redis').
+
+    ``spill_dir`` only applies to the memory store; the redis store spills into Redis.
+    """
+    if backend == 'redis':
+        return RedisSessionStore(url or 'redis://localhost:6379/0', idle_ttl=idle_ttl, event_log_cap=event_log_cap)
+    if backend == 'memory':
+        return MemorySessionStore(idle_ttl=idle_ttl, max_sessions=max_sessions, event_log_cap=event_log_cap, spill_dir=spill_dir)
+    raise ValueError(f'Unknown session store backend: {backend}')
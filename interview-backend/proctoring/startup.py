@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+def process_start_time():
+    """Wall-clock time this process was started (forked), from /proc; None where unavailable"""
+    try:
+        with open('/proc/self/stat') as f:
+            # The command name may contain spaces, so count fields after its closing parenthesis
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/stat') as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith('btime'))
+        return boot_time + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+
+
+class StartupReport:
+    """Time from process start to ready and to the first evaluated frame, with named phases.
+
+    Phases are timed with ``phase``. ``forked`` restarts the clock in a worker
+    forked from a preloading parent; the parent's phases stay in the report.
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.pid = os.getpid()
+        self.started_at = process_start_time() or time.time()
+        self.phases = {}
+        self.ready_at = None
+        self.first_frame_at = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = round(self.phases.get(name, 0.0) + time.perf_counter() - started, 3)
+
+    def mark(self, name, since=None):
+        """Record a phase that ran from ``since`` (default: process start) until now"""
+        with self._lock:
+            self.phases[name] = round(time.time() - (self.started_at if since is None else since), 3)
+
+    def forked(self):
+        with self._lock:
+            self.pid = os.getpid()
+            self.started_at = process_start_time() or time.time()
+            self.phases = {f'parent_{name}': seconds for name, seconds in self.phases.items()}
+            self.ready_at = None
+            self.first_frame_at = None
+
+    def ready(self):
+        with self._lock:
+            self.ready_at = time.time()
+        print(f'Proctoring worker {self.pid} ready: {self.summary()}')
+
+    def frame_done(self):
+        if self.first_frame_at is not None:
+            return
+        with self._lock:
+            if self.first_frame_at is not None:
+                return
+            self.first_frame_at = time.time()
+        print(f'Proctoring worker {self.pid} evaluated its first frame {self.first_frame_at - self.started_at:.2f} s after start')
+
+    @property
+    def is_ready(self):
+        return self.ready_at is not None
+
+    def summary(self):
+        with self._lock:
+            phases = ', '.join(f'{name} {seconds:.2f} s' for name, seconds in self.phases.items())
+            ready = f'{self.ready_at - self.started_at:.2f} s after start' if self.ready_at else 'not ready'
+        return f'{phases}; {ready}'
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'pid': self.pid,
+                'started_at': self.started_at,
+                'phases': dict(self.phases),
+                'ready_after': round(self.ready_at - self.started_at, 3) if self.ready_at else None,
+                'first_frame_after': round(self.first_frame_at - self.started_at, 3) if self.first_frame_at else None,
+            }
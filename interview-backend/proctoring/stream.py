@@ -0,0 +1,86 @@
+class StreamState:
+    """Turns full /proctor results into the change events sent over the stream.
+
+    The streaming client only hears about warnings, correction windows starting
+    or clearing, termination, frame pacing and, once it has set ``event_cursor``,
+    new event log entries; frames that change nothing produce no message at all.
+    """
+
+    def __init__(self, idle_interval_ms, active_interval_ms):
+        self.idle_interval_ms = idle_interval_ms
+        self.active_interval_ms = active_interval_ms
+        self._warning_count = None
+        self._window_key = None
+        self._terminated = False
+        self._interval_ms = None
+        self.event_cursor = None  # events the client holds; None until it asks for events
+
+    def snapshot(self, state):
+        """Initial 'state' event with everything the client needs to render."""
+        self._warning_count = state['warning_count']
+        self._window_key = _window_key(state.get('correction_window'))
+        self._terminated = state['terminated']
+        self._interval_ms = self.interval_for(state)
+        return {
+            'event': 'state',
+            'warning_count': state['warning_count'],
+            'max_warnings': state['max_warnings'],
+            'correction_window': state.get('correction_window'),
+            'terminated': state['terminated'],
+            'termination_reason': state.get('termination_reason'),
+            'interval_ms': self._interval_ms,
+            'event_cursor': state.get('event_cursor'),
+        }
+
+    def interval_for(self, state):
+        """Frame interval to ask for: faster inside a correction window, none once terminated."""
+        if state['terminated']:
+            return 0
+        if state.get('correction_window'):
+            return self.active_interval_ms
+        return self.idle_interval_ms
+
+    def updates(self, result):
+        """Events describing what changed since the previous result."""
+        events = []
+        if result.get('proctoring_events'):
+            events.append({'event': 'events', 'events': result['proctoring_events'], 'events_start': result['events_start'], 'event_cursor': result['event_cursor']})
+        if self.event_cursor is not None and 'event_cursor' in result:
+            self.event_cursor = result['event_cursor']
+        if result['terminated']:
+            if not self._terminated:
+                self._terminated = True
+                events.append({
+                    'event': 'terminated',
+                    'terminated': True,
+                    'termination_reason': result.get('termination_reason'),
+                    'warning_count': result['warning_count'],
+                    'correction_window': None,
+                })
+            if self._interval_ms != 0:
+                # Tell the client to stop sending, also over HTTP once the socket is gone
+                self._interval_ms = 0
+                events.append({'event': 'pace', 'interval_ms': 0})
+            return events
+        window = result.get('correction_window')
+        window_key = _window_key(window)
+        if window_key != self._window_key:
+            if window is None:
+                events.append({'event': 'correction_window_cleared', 'correction_window': None, 'warning_count': result['warning_count']})
+            else:
+                events.append({'event': 'correction_window_started', 'correction_window': window, 'warning_count': result['warning_count']})
+            self._window_key = window_key
+        if result.get('warning'):
+            events.append({'event': 'warning', 'warning': result['warning'], 'warning_count': result['warning_count']})
+        self._warning_count = result['warning_count']
+        interval_ms = self.interval_for(result)
+        if interval_ms != self._interval_ms:
+            self._interval_ms = interval_ms
+            events.append({'event': 'pace', 'interval_ms': interval_ms})
+        return events
+
+
+def _window_key(window):
+    if not window:
+        return None
+    return (window.get('infraction'), window.get('reason'), window.get('start_time'))
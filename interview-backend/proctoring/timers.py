@@ -0,0 +1,125 @@
+import math
+import threading
+import time
+
+
+class TimerWheel:
+    """Keyed one-shot timers on a hashed timing wheel, fired by one background thread.
+
+    A timer due at tick t lives in bucket ``t % slots`` and an index maps its key
+    to that bucket, so ``schedule`` (which replaces the key's previous timer) and
+    ``cancel`` are O(1) however many timers there are. Every ``tick`` seconds the
+    thread visits the buckets of the ticks that passed and fires their due timers;
+    timers a whole revolution or more away stay in their bucket until their turn.
+
+    Callbacks run on the wheel's thread, at most about one tick late, and must
+    not block for long. An exception in a callback is printed and counted.
+    """
+
+    def __init__(self, tick=0.1, slots=1024, clock=time.time):
+        self.tick = tick
+        self.slots = slots
+        self.clock = clock
+        self._buckets = [{} for _ in range(slots)]
+        self._index = {}  # key -> bucket
+        self._lock = threading.Lock()
+        self._cursor = math.floor(clock() / tick)  # first tick not visited yet
+        self._stop = threading.Event()
+        self._thread = None
+        self.fired = 0
+        self.errors = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='session-timers', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            self.advance()
+
+    def schedule(self, key, due, callback, *args):
+        """Call ``callback(*args)`` at ``due`` (a clock value); replaces any timer of ``key``"""
+        due_tick = math.ceil(due / self.tick)
+        with self._lock:
+            self._remove(key)
+            # Already due: the next visit fires it
+            due_tick = max(due_tick, self._cursor)
+            bucket = due_tick % self.slots
+            self._buckets[bucket][key] = (due_tick, callback, args)
+            self._index[key] = bucket
+
+    def cancel(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        bucket = self._index.pop(key, None)
+        if bucket is not None:
+            del self._buckets[bucket][key]
+
+    def advance(self, now=None):
+        """Fire the timers due by ``now`` (the thread calls this every tick)"""
+        now_tick = math.floor((self.clock() if now is None else now) / self.tick)
+        due = []
+        with self._lock:
+            # After a stall one revolution visits every bucket
+            for tick in range(max(self._cursor, now_tick - self.slots + 1), now_tick + 1):
+                bucket = self._buckets[tick % self.slots]
+                for key in [key for key, (due_tick, _, _) in bucket.items() if due_tick <= now_tick]:
+                    due.append(bucket.pop(key)[1:])
+                    del self._index[key]
+            self._cursor = max(self._cursor, now_tick + 1)
+        for callback, args in due:
+            try:
+                callback(*args)
+            except Exception as e:
+                self.errors += 1
+                print(f'Session timer {getattr(callback, "__name__", callback)}{args} failed: {e!r}')
+        self.fired += len(due)
+        return len(due)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._index)
+
+    def stats(self):
+        return {'timers': len(self), 'tick_ms': round(self.tick * 1000, 3), 'slots': self.slots, 'fired': self.fired, 'errors': self.errors}
+
+    def close(self):
+        self._stop.set()
+
+
+class SessionSubscribers:
+    """Callbacks told about a session's new state when the server changes it on its own
+    (a timer expired) rather than in answer to one of the session's frames"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = {}  # session id (None = every session) -> callbacks
+
+    def subscribe(self, session_id, callback):
+        """Call ``callback(state)`` on changes of ``session_id`` (None for every session, then
+        ``callback(session_id, state)``); returns a function that unsubscribes"""
+        with self._lock:
+            self._callbacks.setdefault(session_id, []).append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                callbacks = self._callbacks.get(session_id, [])
+                if callback in callbacks:
+                    callbacks.remove(callback)
+                if not callbacks:
+                    self._callbacks.pop(session_id, None)
+        return unsubscribe
+
+    def publish(self, session_id, state):
+        with self._lock:
+            callbacks = list(self._callbacks.get(session_id, ()))
+            everyone = list(self._callbacks.get(None, ()))
+        for callback, args in [(cb, (state,)) for cb in callbacks] + [(cb, (session_id, state)) for cb in everyone]:
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f'Session subscriber of {session_id} failed: {e!r}')
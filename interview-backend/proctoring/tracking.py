@@ -0,0 +1,196 @@
+import random
+import threading
+import time
+
+import cv2
+import numpy as np
+
+THUMBNAIL_SIZE = (64, 48)
+
+# Detection paths a frame can take
+PATHS = ('full', 'reuse', 'roi', 'lost')
+
+
+def thumbnail(frame):
+    """Small grayscale copy of a BGR frame used to measure scene changes"""
+    small = cv2.resize(frame, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+def frame_difference(a, b):
+    """Mean absolute per-pixel difference (0-255) between two thumbnails"""
+    return cv2.norm(a, b, cv2.NORM_L1) / a.size
+
+
+def landmarks_box(landmarks, frame_shape, margin):
+    """(x0, y0, x1, y1) pixel box around every face in a normalized landmark array, grown by ``margin``
+    of its size on each side and clipped to the frame. None when there are no faces."""
+    if len(landmarks) == 0:
+        return None
+    (h, w) = frame_shape[:2]
+    xy = landmarks[:, :, :2].reshape(-1, 2)
+    (x0, y0), (x1, y1) = xy.min(axis=0), xy.max(axis=0)
+    dx, dy = (x1 - x0) * margin, (y1 - y0) * margin
+    box = (int(max(0, (x0 - dx) * w)), int(max(0, (y0 - dy) * h)),
+           int(min(w, np.ceil((x1 + dx) * w))), int(min(h, np.ceil((y1 + dy) * h))))
+    if box[2] - box[0] < 16 or box[3] - box[1] < 16:
+        return None
+    return box
+
+
+def roi_landmarks_to_frame(landmarks, box, frame_shape):
+    """Map landmarks normalized to a crop ``box`` back to coordinates normalized to the full frame"""
+    (h, w) = frame_shape[:2]
+    (x0, y0, x1, y1) = box
+    mapped = landmarks.copy()
+    mapped[:, :, 0] = (landmarks[:, :, 0] * (x1 - x0) + x0) / w
+    mapped[:, :, 1] = (landmarks[:, :, 1] * (y1 - y0) + y0) / h
+    mapped[:, :, 2] = landmarks[:, :, 2] * (x1 - x0) / w
+    return mapped
+
+
+class _Track:
+    __slots__ = ('shape', 'thumbnail', 'detections', 'box', 'faces', 'since_keyframe', 'touched')
+
+    def __init__(self):
+        self.shape = None
+        self.thumbnail = None
+        self.detections = None
+        self.box = None
+        self.faces = 0
+        self.since_keyframe = 0
+        self.touched = 0.0
+
+
+class FrameTracker:
+    """Per-session temporal tracking in front of the detection pipeline.
+
+    Consecutive frames of one candidate are closely related, so full detection
+    only runs on keyframes: a session's first frame, every ``keyframe_interval``
+    frames, after a frame size change, and whenever the cheaper paths lose the face.
+    Between keyframes a frame takes the first path that applies:
+
+    - ``reuse``: the scene has barely changed since the last detected frame
+      (thumbnail difference below ``diff_threshold``), so its detections are reused.
+    - ``roi``: FaceMesh runs on a crop around the last face box (``roi_margin`` of
+      the box size added on each side). If the crop finds fewer faces than the
+      last frame, or a face touching the crop edge, the frame is ``lost`` and
+      gets a full detection.
+      FaceMesh costs about the same on a crop as on the whole frame, so this
+      mostly helps with small faces in large frames and is off by default (0).
+
+    A fraction (``audit_rate``) of the reuse/roi frames is also run through the
+    full detection, and the two verdicts are compared to report an agreement rate.
+    Tracks live in this process only and are dropped after ``ttl`` idle seconds.
+    """
+
+    def __init__(self, keyframe_interval=10, diff_threshold=3.0, roi_margin=0.0, audit_rate=0.0, ttl=600):
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.diff_threshold = diff_threshold
+        self.roi_margin = roi_margin
+        self.audit_rate = audit_rate
+        self.ttl = ttl
+        self._tracks = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+        # Statistics
+        self._frames = dict.fromkeys(PATHS, 0)
+        self._seconds = dict.fromkeys(PATHS, 0.0)
+        self._audits = 0
+        self._agreements = 0
+
+    def _track(self, session_id, now):
+        with self._lock:
+            if now >= self._next_sweep:
+                self._next_sweep = now + min(self.ttl, 60)
+                for sid in [sid for sid, track in self._tracks.items() if now - track.touched > self.ttl]:
+                    del self._tracks[sid]
+            track = self._tracks.get(session_id)
+            if track is None:
+                track = self._tracks[session_id] = _Track()
+            track.touched = now
+            return track
+
+    def detect(self, session_id, frame, full, roi, verdict):
+        """Detections for one frame and the path that produced them.
+
+        ``full(frame)`` and ``roi(frame, box)`` return detections with a normalized
+        ``landmarks`` array; ``verdict(frame_shape, detections)`` is the decision
+        the audit compares.
+        """
+        started = time.perf_counter()
+        track = self._track(session_id, time.time())
+        thumb = thumbnail(frame)
+        path = 'full'
+        detections = None
+        if track.detections is not None and track.shape == frame.shape and track.since_keyframe < self.keyframe_interval:
+            if self.diff_threshold > 0 and frame_difference(thumb, track.thumbnail) < self.diff_threshold:
+                path = 'reuse'
+                detections = track.detections
+            elif self.roi_margin > 0 and track.box is not None:
+                detections = roi(frame, track.box)
+                if self._lost(detections['landmarks'], track):
+                    path, detections = 'lost', None
+                else:
+                    path = 'roi'
+        if detections is None:
+            detections = full(frame)
+            track.since_keyframe = 0
+        else:
+            track.since_keyframe += 1
+        if path != 'reuse':
+            track.shape = frame.shape
+            track.thumbnail = thumb
+            track.detections = detections
+            track.faces = len(detections['landmarks'])
+            track.box = landmarks_box(detections['landmarks'], frame.shape, self.roi_margin) if self.roi_margin > 0 else None
+        elapsed = time.perf_counter() - started
+
+        agreed = None
+        if path in ('reuse', 'roi') and self.audit_rate > 0 and random.random() < self.audit_rate:
+            agreed = verdict(frame.shape, detections) == verdict(frame.shape, full(frame))
+        with self._lock:
+            self._frames[path] += 1
+            self._seconds[path] += elapsed
+            if agreed is not None:
+                self._audits += 1
+                self._agreements += agreed
+        return detections, path
+
+    def _lost(self, landmarks, track):
+        if len(landmarks) < track.faces:
+            return True
+        # A face cut by the crop edge has probably moved out of it
+        (x0, y0, x1, y1) = track.box
+        (h, w) = track.shape[:2]
+        xy = landmarks[:, :, :2].reshape(-1, 2) * (w, h)
+        edge = 2
+        return bool(len(xy)) and bool(
+            (x0 > 0 and xy[:, 0].min() <= x0 + edge) or (x1 < w and xy[:, 0].max() >= x1 - edge) or
+            (y0 > 0 and xy[:, 1].min() <= y0 + edge) or (y1 < h and xy[:, 1].max() >= y1 - edge))
+
+    def discard(self, session_id):
+        with self._lock:
+            self._tracks.pop(session_id, None)
+
+    def stats(self):
+        """Frames and average detection time per path, and the audited agreement rate"""
+        with self._lock:
+            frames = dict(self._frames)
+            seconds = dict(self._seconds)
+            audits = self._audits
+            agreements = self._agreements
+            sessions = len(self._tracks)
+        total = sum(frames.values())
+        return {
+            'sessions': sessions,
+            'frames': total,
+            'paths': {path: {
+                'frames': frames[path],
+                'share': round(frames[path] / total, 4) if total else 0.0,
+                'detect_ms_avg': round(seconds[path] / frames[path] * 1000, 3) if frames[path] else 0.0,
+            } for path in PATHS},
+            'detect_ms_avg': round(sum(seconds.values()) / total * 1000, 3) if total else 0.0,
+            'audits': audits,
+            'agreement_rate': round(agreements / audits, 4) if audits else None,
+        }
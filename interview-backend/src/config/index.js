@@ -10,5 +10,7 @@ module.exports = {
     jwtExpiresIn: process.env.JWT_EXPIRES_IN || '30d',
     groqApiKey: process.env.GROQ_API_KEY || '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',
     whisperApiUrl: process.env.WHISPER_API_URL || 'https://api.groq.com/openai/v1/audio/transcriptions',
-    uploadPath: process.env.UPLOAD_PATH || 'uploads/'
+    uploadPath: process.env.UPLOAD_PATH || 'uploads/',
+    // Shared secret the proctoring service sends with its event batches
+    proctorIngestToken: process.env.PROCTOR_INGEST_TOKEN
 };
\ No newline at end of file
@@ -220,6 +220,11 @@ const markSessionCompletedOrTerminated = async (req, res) => {
     res.status(200).json({ success: true, data: session });
 };
 
+const ingestProctoringEvents = async (req, res) => {
+    const result = await interviewService.ingestProctoringEvents(req.body.events);
+    res.status(200).json({ success: true, data: result });
+};
+
 const submitDecision = async (req, res) => {
     const { sessionId } = req.params;
     const { decision, comments } = req.body;
@@ -249,5 +254,6 @@ module.exports = {
     getCompletedSessions,
     getSessionDetailsForAdmin,
     markSessionCompletedOrTerminated,
+    ingestProctoringEvents,
     submitDecision,
 };
\ No newline at end of file
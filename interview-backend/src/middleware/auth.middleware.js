@@ -1,3 +1,4 @@
+const crypto = require('crypto');
 const jwt = require('jsonwebtoken');
 const asyncHandler = require('./asyncHandler');
 const User = require('../models/user.model');
@@ -59,8 +60,24 @@ const authorize = (...roles) => {
     };
 };
 
+/**
+ * Admits the proctoring service, which sends the shared PROCTOR_INGEST_TOKEN
+ * in the X-Ingest-Token header instead of a user's JWT.
+ */
+const requireIngestToken = (req, res, next) => {
+    if (!config.proctorIngestToken) {
+        return next(new AppError(503, 'Proctoring event ingest is not configured.'));
+    }
+    const expected = Buffer.from(config.proctorIngestToken);
+    const received = Buffer.from(req.headers['x-ingest-token'] || '');
+    if (received.length !== expected.length || !crypto.timingSafeEqual(received, expected)) {
+        return next(new AppError(401, 'Not authorized, invalid ingest token.'));
+    }
+    next();
+};
 
 module.exports = {
     protect,
-    authorize
+    authorize,
+    requireIngestToken
 };
\ No newline at end of file
@@ -121,6 +121,12 @@ const interviewSessionSchema = new mongoose.Schema({
         type: [mongoose.Schema.Types.Mixed],
         default: []
     },
+    // IDs of the events the proctoring service delivered, so redelivered batches are ignored
+    ingestedEventIds: {
+        type: [String],
+        default: [],
+        select: false
+    },
     // Add decision field for admin's decision (approved/rejected)
     decision: {
         status: { type: String, enum: ['approved', 'rejected'], default: null },
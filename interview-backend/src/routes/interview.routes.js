@@ -4,7 +4,7 @@ const multer = require('multer');
 const path = require('path');
 const fs = require('fs');
 
-const { protect, authorize } = require('../middleware/auth.middleware');
+const { protect, authorize, requireIngestToken } = require('../middleware/auth.middleware');
 const asyncHandler = require('../middleware/asyncHandler');
 const {
     transcribeResponse,
@@ -15,6 +15,7 @@ const {
     getCompletedSessions,
     getSessionDetailsForAdmin,
     markSessionCompletedOrTerminated,
+    ingestProctoringEvents,
     submitDecision
 } = require('../controllers/interview.controller');
 
@@ -70,6 +71,13 @@ router.get(
 // Add route for marking session as completed/terminated
 router.post('/sessions/:sessionId/complete', protect, asyncHandler(markSessionCompletedOrTerminated));
 
+/**
+ * @desc    Bulk ingest of proctoring events from the proctoring service's event journal
+ * @route   POST /api/interview/proctoring-events/bulk
+ * @access  Proctoring service (X-Ingest-Token)
+ */
+router.post('/proctoring-events/bulk', requireIngestToken, asyncHandler(ingestProctoringEvents));
+
 // This dynamic route must be last to avoid catching specific routes like '/completed' or '/details'
 router.get('/sessions/:uniqueLink', protect, asyncHandler(getSessionByLink));
 
@@ -1,3 +1,4 @@
+const mongoose = require('mongoose');
 const InterviewTemplate = require('../models/interviewTemplate.model');
 const InterviewSession = require('../models/interviewSession.model');
 const InterviewResponse = require('../models/interviewResponse.model');
@@ -179,7 +180,11 @@ const markSessionCompletedOrTerminated = async ({ sessionId, terminated, termina
     }
     if (Array.isArray(proctoringInfractions)) session.proctoringInfractions = proctoringInfractions;
     if (typeof warningCount === 'number') session.warningCount = Math.min(warningCount, 3);
-    if (Array.isArray(proctoringEventLog)) session.proctoringEventLog = proctoringEventLog;
+    if (Array.isArray(proctoringEventLog)) {
+        // Both logs are in event order from the first event: the page's copy wins, and events the
+        // journal delivered beyond it are kept. Ingest leaves closed sessions alone from here on.
+        session.proctoringEventLog = proctoringEventLog.concat((session.proctoringEventLog || []).slice(proctoringEventLog.length));
+    }
     await session.save();
     if (session.status === 'completed') {
         // Generate the final report
@@ -195,6 +200,100 @@ const markSessionCompletedOrTerminated = async ({ sessionId, terminated, termina
     return session;
 };
 
+const MAX_INGEST_BATCH = 5000;
+// Sessions the event journal still writes to. Once a session is completed or terminated,
+// its log is the one merged by markSessionCompletedOrTerminated.
+const OPEN_STATUSES = ['scheduled', 'in_progress'];
+
+/**
+ * Appends proctoring events delivered by the proctoring service's event journal
+ * to their sessions. Each event has an eventId; events already ingested are
+ * skipped, so a batch the service retries is applied only once. Events of
+ * closed sessions are skipped too. A 'terminated' event ends a session that
+ * is still open.
+ */
+const ingestProctoringEvents = async (events) => {
+    if (!Array.isArray(events) || events.length > MAX_INGEST_BATCH) {
+        throw new AppError(400, `events must be an array of at most ${MAX_INGEST_BATCH} events.`);
+    }
+    const bySession = new Map();
+    for (const record of events) {
+        if (!record || typeof record.eventId !== 'string' || !record.event || typeof record.event !== 'object') {
+            throw new AppError(400, 'Each event needs an eventId and an event.');
+        }
+        if (!bySession.has(record.sessionId)) bySession.set(record.sessionId, []);
+        bySession.get(record.sessionId).push(record);
+    }
+
+    const result = { accepted: 0, duplicates: 0, closedSessions: 0, unknownSessions: 0 };
+    for (const [sessionId, records] of bySession) {
+        if (!mongoose.Types.ObjectId.isValid(sessionId)) {
+            result.unknownSessions += records.length;
+            continue;
+        }
+        records.sort((a, b) => (a.index || 0) - (b.index || 0));
+        const eventIds = records.map((record) => record.eventId);
+        // The $nin filter makes the push all-or-nothing against a concurrent delivery of the same events
+        let session = null;
+        let closed = false;
+        let fresh = records;
+        for (let attempt = 0; attempt < 3 && !session; attempt++) {
+            const existing = await InterviewSession.findById(sessionId).select('+ingestedEventIds status');
+            if (!existing) break;
+            if (!OPEN_STATUSES.includes(existing.status)) {
+                closed = true;
+                break;
+            }
+            const seen = new Set(existing.ingestedEventIds);
+            fresh = records.filter((record) => !seen.has(record.eventId));
+            if (!fresh.length) {
+                session = existing;
+                break;
+            }
+            session = await InterviewSession.findOneAndUpdate(
+                { _id: sessionId, status: { $in: OPEN_STATUSES }, ingestedEventIds: { $nin: fresh.map((record) => record.eventId) } },
+                {
+                    $push: {
+                        proctoringEventLog: { $each: fresh.map((record) => record.event) },
+                        ingestedEventIds: { $each: fresh.map((record) => record.eventId) },
+                    },
+                },
+                { new: true }
+            );
+        }
+        if (closed) {
+            result.closedSessions += eventIds.length;
+            continue;
+        }
+        if (!session) {
+            result.unknownSessions += eventIds.length;
+            continue;
+        }
+        result.accepted += fresh.length;
+        result.duplicates += records.length - fresh.length;
+
+        const warningCounts = fresh.map((record) => record.event.warning_count).filter((count) => typeof count === 'number');
+        const terminated = fresh.find((record) => record.event.event === 'terminated');
+        if (terminated) {
+            await InterviewSession.updateOne(
+                { _id: sessionId, status: { $in: OPEN_STATUSES } },
+                {
+                    status: 'terminated',
+                    terminationReason: terminated.event.reason || 'Terminated by proctoring.',
+                    completedAt: new Date(),
+                    ...(warningCounts.length && { warningCount: Math.min(Math.max(...warningCounts), 3) }),
+                }
+            );
+        } else if (warningCounts.length) {
+            await InterviewSession.updateOne(
+                { _id: sessionId, status: { $in: OPEN_STATUSES } },
+                { $max: { warningCount: Math.min(Math.max(...warningCounts), 3) } }
+            );
+        }
+    }
+    return result;
+};
+
 const submitDecision = async ({ sessionId, decision, comments, adminId }) => {
     if (!['approved', 'rejected'].includes(decision)) {
         throw new AppError(400, 'Decision must be either "approved" or "rejected".');
@@ -466,6 +565,7 @@ module.exports = {
     finalizeAndGenerateReport,
     getSessionResponses,
     markSessionCompletedOrTerminated,
+    ingestProctoringEvents,
     submitDecision,
     exportReportCSV,
     exportReportPDF,
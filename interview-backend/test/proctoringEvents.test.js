@@ -0,0 +1,107 @@
+// Run with `npm test` (node:test). The InterviewSession queries of the two event log writers,
+// /complete and the journal's bulk ingest, run against an in-memory stand-in instead of MongoDB.
+const { test, beforeEach } = require('node:test');
+const assert = require('node:assert/strict');
+const mongoose = require('mongoose');
+const InterviewSession = require('../src/models/interviewSession.model');
+const interviewService = require('../src/services/interview.service');
+
+let sessions;
+
+const query = (doc) => {
+    const promise = Promise.resolve(doc);
+    promise.select = () => promise;
+    return promise;
+};
+
+const matches = (doc, filter) =>
+    String(filter._id) === doc.id &&
+    (!filter.status || filter.status.$in.includes(doc.status)) &&
+    (!filter.ingestedEventIds || !filter.ingestedEventIds.$nin.some((id) => doc.ingestedEventIds.includes(id)));
+
+InterviewSession.findById = (id) => query(sessions.get(String(id)) || null);
+
+InterviewSession.findOneAndUpdate = async (filter, update) => {
+    const doc = sessions.get(String(filter._id));
+    if (!doc || !matches(doc, filter)) return null;
+    for (const [field, { $each }] of Object.entries(update.$push)) doc[field].push(...$each);
+    return doc;
+};
+
+InterviewSession.updateOne = async (filter, update) => {
+    const doc = sessions.get(String(filter._id));
+    if (!doc || !matches(doc, filter)) return { modifiedCount: 0 };
+    const { $max, ...fields } = update;
+    Object.assign(doc, fields);
+    for (const [field, value] of Object.entries($max || {})) doc[field] = Math.max(doc[field], value);
+    return { modifiedCount: 1 };
+};
+
+const addSession = () => {
+    const id = new mongoose.Types.ObjectId().toString();
+    sessions.set(id, { id, status: 'in_progress', proctoringEventLog: [], ingestedEventIds: [], warningCount: 0, save: async () => {} });
+    return sessions.get(id);
+};
+
+const event = (index) => ({ event: 'correction_window_started', infraction: 'no_face', time: index, warning_count: 1 });
+
+const batch = (sessionId, indexes) =>
+    indexes.map((index) => ({ eventId: `${sessionId}-${index}`, sessionId, index, event: event(index) }));
+
+const complete = (sessionId, indexes) =>
+    interviewService.markSessionCompletedOrTerminated({
+        sessionId,
+        terminated: true,
+        terminationReason: 'Terminated by proctoring.',
+        warningCount: 1,
+        proctoringEventLog: indexes.map(event),
+    });
+
+beforeEach(() => {
+    sessions = new Map();
+});
+
+test('a journal batch delivered after /complete is not added again', async () => {
+    const session = addSession();
+    await interviewService.ingestProctoringEvents(batch(session.id, [0, 1]));
+    await complete(session.id, [0, 1, 2]);
+    const result = await interviewService.ingestProctoringEvents(batch(session.id, [2, 3]));
+    assert.deepEqual(result, { accepted: 0, duplicates: 0, closedSessions: 2, unknownSessions: 0 });
+    assert.deepEqual(session.proctoringEventLog, [0, 1, 2].map(event));
+    assert.equal(session.status, 'terminated');
+});
+
+test('/complete keeps the events the journal delivered beyond the page\'s copy', async () => {
+    const session = addSession();
+    await interviewService.ingestProctoringEvents(batch(session.id, [0, 1, 2]));
+    await complete(session.id, [0]);
+    assert.deepEqual(session.proctoringEventLog, [0, 1, 2].map(event));
+});
+
+test('/complete without delivered events stores the page\'s log', async () => {
+    const session = addSession();
+    await complete(session.id, [0, 1]);
+    assert.deepEqual(session.proctoringEventLog, [0, 1].map(event));
+});
+
+test('a redelivered batch is stored once', async () => {
+    const session = addSession();
+    await interviewService.ingestProctoringEvents(batch(session.id, [0, 1]));
+    const result = await interviewService.ingestProctoringEvents(batch(session.id, [0, 1, 2]));
+    assert.deepEqual(result, { accepted: 1, duplicates: 2, closedSessions: 0, unknownSessions: 0 });
+    assert.deepEqual(session.proctoringEventLog, [0, 1, 2].map(event));
+});
+
+test('a delivered termination closes the session to later batches', async () => {
+    const session = addSession();
+    await interviewService.ingestProctoringEvents([
+        ...batch(session.id, [0]),
+        { eventId: `${session.id}-1`, sessionId: session.id, index: 1, event: { event: 'terminated', reason: 'Too many warnings.', time: 1, warning_count: 3 } },
+    ]);
+    assert.equal(session.status, 'terminated');
+    assert.equal(session.terminationReason, 'Too many warnings.');
+    assert.equal(session.warningCount, 3);
+    const result = await interviewService.ingestProctoringEvents(batch(session.id, [2]));
+    assert.equal(result.closedSessions, 1);
+    assert.equal(session.proctoringEventLog.length, 2);
+});
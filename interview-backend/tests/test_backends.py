@@ -0,0 +1,68 @@
+import os
+
+import cv2
+import pytest
+
+import proctor_convert
+from proctor_convert import ConversionError, convert, plan
+from proctoring.backends import SSD_VARIANTS, ModelBackend
+
+
+def touch(directory, *names):
+    for name in names:
+        (directory / name).write_bytes(b'')
+
+
+def files(backend, model):
+    found = backend.ssd_files(model)
+    return found and (found[0], os.path.basename(found[1]), found[2] and os.path.basename(found[2]))
+
+
+def test_missing_variant_files_fall_back_to_caffe(tmp_path):
+    touch(tmp_path, *SSD_VARIANTS['face']['caffe'])
+    for variant in ('fp16', 'onnx', 'int8'):
+        assert files(ModelBackend(str(tmp_path), ssd_variant=variant), 'face') == (
+            'caffe', 'res10_300x300_ssd_iter_140000.caffemodel', 'deploy.prototxt')
+
+
+def test_present_variant_files_are_used(tmp_path):
+    touch(tmp_path, *SSD_VARIANTS['face']['caffe'], 'res10_300x300_ssd_iter_140000_int8.onnx',
+          'res10_300x300_ssd_iter_140000_fp16.caffemodel')
+    assert files(ModelBackend(str(tmp_path), ssd_variant='int8'), 'face') == ('int8', 'res10_300x300_ssd_iter_140000_int8.onnx', None)
+    assert files(ModelBackend(str(tmp_path), ssd_variant='fp16'), 'face') == (
+        'fp16', 'res10_300x300_ssd_iter_140000_fp16.caffemodel', 'deploy.prototxt')
+    # int8 does not fall back to onnx, only to caffe
+    assert files(ModelBackend(str(tmp_path), ssd_variant='onnx'), 'face')[0] == 'caffe'
+
+
+def test_variants_a_model_lacks_use_caffe(tmp_path):
+    touch(tmp_path, *SSD_VARIANTS['person']['caffe'])
+    assert files(ModelBackend(str(tmp_path), ssd_variant='fp16'), 'person')[0] == 'caffe'
+
+
+def test_caffe_weights_without_their_config_are_not_used(tmp_path):
+    touch(tmp_path, 'MobileNetSSD_deploy.caffemodel')
+    assert ModelBackend(str(tmp_path)).ssd_files('person') is None
+    assert ModelBackend(str(tmp_path)).describe()['ssd'] == {'person': None, 'face': None}
+
+
+def test_conversion_plan_follows_the_variants_each_model_has():
+    assert plan(['int8', 'fp16', 'onnx'], ['person', 'face']) == [
+        ('face', 'fp16'), ('person', 'onnx'), ('face', 'onnx'), ('person', 'int8'), ('face', 'int8')]
+    assert plan(['fp16'], ['person']) == []
+
+
+def test_conversion_needs_the_original_model(tmp_path):
+    with pytest.raises(ConversionError, match='original face model'):
+        convert(str(tmp_path), 'face', 'onnx', [])
+
+
+def test_existing_variant_files_are_kept(tmp_path):
+    touch(tmp_path, 'res10_300x300_ssd_iter_140000.onnx')
+    assert convert(str(tmp_path), 'face', 'onnx', []) == 'exists'
+
+
+def test_fp16_without_shrink_caffe_model_is_reported(monkeypatch):
+    monkeypatch.delattr(cv2.dnn, 'shrinkCaffeModel', raising=False)
+    with pytest.raises(ConversionError, match='shrinkCaffeModel'):
+        proctor_convert.convert_fp16('in.caffemodel', 'out.caffemodel')
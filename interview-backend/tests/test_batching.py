@@ -0,0 +1,106 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from proctoring.batching import InferenceBatcher, split_ssd_detections
+
+
+class FakeSSD:
+    """Answers each image of the batch with as many detections as its blob's first value,
+    tagged with the image's index like the SSD DetectionOutput layer"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def setInput(self, blob):
+        self.blob = blob
+
+    def forward(self):
+        self.batch_sizes.append(len(self.blob))
+        rows = []
+        for index, image in enumerate(self.blob):
+            for k in range(int(image[0, 0, 0])):
+                rows.append([index, 15, 0.9, k, image[0, 0, 0], 0.5, 0.5])
+        return np.array(rows, np.float32).reshape(1, 1, -1, 7)
+
+
+def blob(detections):
+    return np.full((1, 3, 4, 4), detections, np.float32)
+
+
+def infer_concurrently(batcher, counts):
+    results = {}
+
+    def call(i, count):
+        results[i] = batcher.infer(blob(count))
+
+    threads = [threading.Thread(target=call, args=(i, count)) for i, count in enumerate(counts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_split_ssd_detections():
+    detections = np.array([[0, 1, .9, 0, 0, 1, 1], [2, 1, .8, 0, 0, 1, 1], [0, 1, .7, 0, 0, 1, 1]], np.float32).reshape(1, 1, 3, 7)
+    assert split_ssd_detections(detections, 0)[0, 0, :, 2].tolist() == pytest.approx([.9, .7])
+    assert split_ssd_detections(detections, 1).shape == (1, 1, 0, 7)
+
+
+def test_each_caller_gets_only_its_own_detections():
+    net = FakeSSD()
+    batcher = InferenceBatcher('ssd', lambda: net, max_batch_size=4, max_wait_ms=1000)
+    batcher.fill()
+    try:
+        counts = [2, 0, 3, 1]
+        results = infer_concurrently(batcher, counts)
+    finally:
+        batcher.close()
+    assert net.batch_sizes == [4]
+    for i, count in enumerate(counts):
+        detections = results[i]
+        assert detections.shape == (1, 1, count, 7)
+        # Every row is one of this caller's detections
+        assert (detections[0, 0, :, 4] == count).all()
+        assert detections[0, 0, :, 3].tolist() == list(range(count))
+    assert batcher.stats()['batch_sizes'] == {4: 1}
+
+
+def test_a_lone_frame_is_flushed_after_max_wait():
+    net = FakeSSD()
+    batcher = InferenceBatcher('ssd', lambda: net, max_batch_size=8, max_wait_ms=50)
+    try:
+        started = time.perf_counter()
+        detections = batcher.infer(blob(1))
+        waited = time.perf_counter() - started
+    finally:
+        batcher.close()
+    assert detections.shape == (1, 1, 1, 7)
+    assert net.batch_sizes == [1]
+    assert 0.04 <= waited < 1.0
+
+
+def test_forward_errors_reach_every_caller():
+    class BrokenNet(FakeSSD):
+        def forward(self):
+            raise RuntimeError('bad blob')
+
+    batcher = InferenceBatcher('ssd', BrokenNet, max_batch_size=2, max_wait_ms=1000)
+    errors = []
+
+    def call():
+        try:
+            batcher.infer(blob(1))
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+    assert errors == ['bad blob', 'bad blob']
@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from proctoring.event_journal import EventJournal
+
+
+class IngestServer:
+    """Local bulk-ingest endpoint that answers with the queued status codes (then 200)"""
+
+    def __init__(self):
+        self.batches = []
+        self.tokens = []
+        self.statuses = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                status = server.statuses.pop(0) if server.statuses else 200
+                server.tokens.append(self.headers.get('X-Ingest-Token'))
+                if status == 200:
+                    server.batches.append(body['events'])
+                self.send_response(status)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/bulk'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def events(self):
+        return [record for batch in self.batches for record in batch]
+
+
+@pytest.fixture
+def server():
+    server = IngestServer()
+    yield server
+    server.httpd.shutdown()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.01)
+
+
+def journal(directory, url=None, **options):
+    return EventJournal(str(directory), url, 'secret', flush_interval=0.02, max_backoff=0.05, **options).start()
+
+
+def append(journal, session_id, count, start=0):
+    """Queue ``count`` events in one call, so they are written together"""
+    journal.append(session_id, start, [{'event': 'correction_window_started', 'time': float(i)} for i in range(start, start + count)])
+
+
+def test_events_are_delivered_in_batches(tmp_path, server):
+    j = journal(tmp_path, server.url, batch_size=4)
+    try:
+        append(j, 's1', 10)
+        wait_for(lambda: j.delivered == 10)
+    finally:
+        j.close()
+    events = server.events()
+    assert [record['index'] for record in events] == list(range(10))
+    assert all(len(batch) <= 4 for batch in server.batches)
+    assert len({record['eventId'] for record in events}) == 10
+    assert events[0]['sessionId'] == 's1' and events[0]['event']['time'] == 0.0
+    assert set(server.tokens) == {'secret'}
+    assert j.pending() == 0
+
+
+def test_failed_posts_are_retried(tmp_path, server):
+    server.statuses = [503, 429]
+    j = journal(tmp_path, server.url)
+    try:
+        append(j, 's1', 3)
+        wait_for(lambda: j.delivered == 3)
+    finally:
+        j.close()
+    assert j.retries == 2
+    # The retried batch went through once
+    assert [record['index'] for record in server.events()] == [0, 1, 2]
+
+
+def test_refused_batches_are_skipped(tmp_path, server):
+    server.statuses = [400]
+    j = journal(tmp_path, server.url)
+    try:
+        append(j, 's1', 2)
+        wait_for(lambda: j.rejected == 2)
+        append(j, 's1', 2, start=2)
+        wait_for(lambda: j.delivered == 2)
+    finally:
+        j.close()
+    assert [record['index'] for record in server.events()] == [2, 3]
+
+
+def test_a_restart_delivers_from_the_saved_cursor(tmp_path, server):
+    j = journal(tmp_path, server.url)
+    append(j, 's1', 3)
+    wait_for(lambda: j.delivered == 3)
+    j.close()
+    # Offline: the events are only journaled
+    j = journal(tmp_path)
+    append(j, 's2', 4)
+    wait_for(lambda: j.written == 4)
+    j.close()
+    assert server.events() and len(server.events()) == 3
+    j = journal(tmp_path, server.url)
+    try:
+        wait_for(lambda: j.delivered == 4)
+    finally:
+        j.close()
+    assert [(r['sessionId'], r['index']) for r in server.events()] == [('s1', i) for i in range(3)] + [('s2', i) for i in range(4)]
+
+
+def test_delivered_segments_are_deleted(tmp_path, server):
+    j = journal(tmp_path, server.url, segment_bytes=300)
+    try:
+        for i in range(12):
+            append(j, 's1', 1, start=i)
+            wait_for(lambda: j.written == i + 1)
+        wait_for(lambda: j.delivered == 12)
+        wait_for(lambda: len([name for name in os.listdir(j.directory) if name.startswith('segment-')]) == 1)
+    finally:
+        j.close()
+    with open(os.path.join(j.directory, 'delivered.json')) as f:
+        assert json.load(f)['segment'] == j._segment
+
+
+def test_torn_and_corrupt_lines_are_skipped(tmp_path, server):
+    j = journal(tmp_path)
+    append(j, 's1', 2)
+    wait_for(lambda: j.written == 2)
+    j.close()
+    segment = os.path.join(j.directory, 'segment-000000000001.jsonl')
+    with open(segment, 'ab') as f:
+        f.write(b'not json\n{"eventId": "cut off by a cra')
+    j = journal(tmp_path, server.url)
+    try:
+        append(j, 's1', 1, start=2)
+        wait_for(lambda: j.delivered == 3)
+    finally:
+        j.close()
+    assert [record['index'] for record in server.events()] == [0, 1, 2]
+    assert j.rejected == 1
+
+
+def test_each_journal_claims_its_own_directory(tmp_path):
+    first, second = journal(tmp_path), journal(tmp_path)
+    try:
+        assert {first.directory, second.directory} == {str(tmp_path / '0'), str(tmp_path / '1')}
+    finally:
+        first.close()
+        second.close()
+    # Closing releases the directory
+    third = journal(tmp_path)
+    third.close()
+    assert third.directory == str(tmp_path / '0')
+
+
+def test_a_full_buffer_drops_events(tmp_path):
+    j = EventJournal(str(tmp_path), None, max_buffered=2)
+    append(j, 's1', 2)
+    append(j, 's1', 2, start=2)
+    assert j.dropped == 2 and j.appended == 2
+
+
+def test_pending_counts_a_predecessors_events_still_to_deliver(tmp_path, server):
+    j = journal(tmp_path)
+    append(j, 's1', 3)
+    wait_for(lambda: j.written == 3)
+    assert j.pending() == 3
+    j.close()
+    segment = os.path.join(j.directory, 'segment-000000000001.jsonl')
+    with open(segment, 'ab') as f:
+        f.write(b'not json\n{"eventId": "cut off by a cra')
+    # Offline again: the predecessor's three events and the corrupt line are still ahead
+    j = journal(tmp_path)
+    append(j, 's1', 2, start=3)
+    wait_for(lambda: j.written == 2)
+    assert j.pending() == 6
+    j.close()
+    j = journal(tmp_path, server.url)
+    try:
+        wait_for(lambda: j.delivered == 5)
+        wait_for(lambda: j.pending() == 0)
+        append(j, 's1', 1, start=5)
+        wait_for(lambda: j.delivered == 6)
+        wait_for(lambda: j.pending() == 0)
+    finally:
+        j.close()
+    assert j.rejected == 1
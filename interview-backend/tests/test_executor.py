@@ -0,0 +1,112 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from proctoring.executor import STEADY, URGENT, FrameExecutor, FrameRejected
+
+
+def test_runs_frames_and_returns_results():
+    executor = FrameExecutor(2)
+    try:
+        assert executor.run('a', lambda x: x * 2, 21) == 42
+        with pytest.raises(ZeroDivisionError):
+            executor.run('a', lambda: 1 / 0)
+        assert executor.stats()['completed'] == 2
+    finally:
+        executor.shutdown()
+
+
+def test_no_threads_until_the_first_frame():
+    executor = FrameExecutor(2)
+    try:
+        assert not any(t.name.startswith('inference_') and t.is_alive() for t in executor._threads)
+        executor.run('a', lambda: None)
+        assert sum(t.is_alive() for t in executor._threads) == 2
+    finally:
+        executor.shutdown()
+
+
+def _run_in_child(executor, results):
+    try:
+        results.put(executor.run('child', lambda: 'done'))
+    except BaseException as e:
+        results.put(repr(e))
+
+
+def test_forked_child_gets_its_own_threads():
+    """An executor created (and used) before a fork still answers frames in the child"""
+    executor = FrameExecutor(2)
+    try:
+        executor.run('parent', lambda: None)
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        child = context.Process(target=_run_in_child, args=(executor, results))
+        child.start()
+        child.join(15)
+        if child.is_alive():
+            child.kill()
+            pytest.fail('frame in the forked child did not finish')
+        assert results.get(timeout=1) == 'done'
+    finally:
+        executor.shutdown()
+
+
+def test_session_busy_and_overloaded():
+    executor = FrameExecutor(1, max_queued=0)
+    release = threading.Event()
+    try:
+        thread = threading.Thread(target=executor.run, args=('a', release.wait))
+        thread.start()
+        while executor.depth() == 0:
+            time.sleep(0.001)
+        with pytest.raises(FrameRejected) as busy:
+            executor.run('a', lambda: None)
+        assert busy.value.reason == 'session_busy'
+        with pytest.raises(FrameRejected) as overloaded:
+            executor.run('b', lambda: None)
+        assert overloaded.value.reason == 'overloaded'
+        release.set()
+        thread.join()
+    finally:
+        executor.shutdown()
+
+
+def test_deadline_frames_go_first_and_displace_steady_frames():
+    executor = FrameExecutor(1, max_queued=2)
+    release = threading.Event()
+    order = []
+    outcomes = {}
+
+    def submit(session_id):
+        try:
+            executor.run(session_id, order.append, session_id)
+            outcomes[session_id] = 'ran'
+        except FrameRejected as e:
+            outcomes[session_id] = e.reason
+
+    try:
+        blocker = threading.Thread(target=executor.run, args=('blocker', release.wait))
+        blocker.start()
+        threads = []
+        for session_id in ('steady1', 'steady2'):
+            threads.append(threading.Thread(target=submit, args=(session_id,)))
+            threads[-1].start()
+            while executor.depth() < len(threads) + 1:
+                time.sleep(0.001)
+        executor.set_deadline('urgent', time.time() + 5)
+        threads.append(threading.Thread(target=submit, args=('urgent',)))
+        threads[-1].start()
+        while 'steady2' not in outcomes:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads + [blocker]:
+            thread.join()
+        assert outcomes == {'steady1': 'ran', 'steady2': 'overloaded', 'urgent': 'ran'}
+        assert order == ['urgent', 'steady1']
+        assert executor.rejected['displaced'] == 1
+        assert executor.deadline_results[URGENT]['met'] == 1
+        assert sum(executor.deadline_results[STEADY].values()) == 2
+    finally:
+        executor.shutdown()
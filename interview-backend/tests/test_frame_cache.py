@@ -0,0 +1,64 @@
+import numpy as np
+
+from proctoring.frame_cache import FrameResultCache, dhash, hamming
+
+
+def gradient(height=480, width=640):
+    """BGR frame whose brightness rises left to right in every row"""
+    row = np.linspace(0, 255, width, dtype=np.uint8)
+    return np.repeat(np.repeat(row[None, :, None], height, axis=0), 3, axis=2)
+
+
+def test_dhash_sets_a_bit_per_rising_step():
+    assert dhash(gradient()) == (1 << 64) - 1
+    assert dhash(gradient()[:, ::-1].copy()) == 0
+    assert dhash(np.zeros((480, 640, 3), np.uint8)) == 0
+
+
+def test_dhash_ignores_resizing_and_small_noise():
+    frame = gradient()
+    noisy = np.clip(frame.astype(np.int16) + np.random.default_rng(0).integers(-3, 4, frame.shape), 0, 255).astype(np.uint8)
+    assert hamming(dhash(frame), dhash(noisy)) <= 4
+    assert hamming(dhash(frame), dhash(gradient(240, 320))) <= 4
+
+
+def test_hit_within_the_hamming_threshold():
+    cache = FrameResultCache(ttl=5.0, max_distance=4)
+    cache.put('a', 0b0000, {'success': True}, now=0.0)
+    assert cache.get('a', 0b1111, now=1.0) == {'success': True}
+    assert cache.stats() == {'clients': 1, 'hits': 1, 'misses': 0}
+
+
+def test_miss_past_the_hamming_threshold():
+    cache = FrameResultCache(ttl=5.0, max_distance=4)
+    cache.put('a', 0b00000, {'success': True}, now=0.0)
+    assert cache.get('a', 0b11111, now=1.0) is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_miss_after_the_ttl():
+    cache = FrameResultCache(ttl=5.0, max_distance=4)
+    cache.put('a', 0, {'success': True}, now=0.0)
+    assert cache.get('a', 0, now=5.0) is not None
+    assert cache.get('a', 0, now=5.1) is None
+
+
+def test_near_duplicate_frames_of_different_clients_do_not_share_results():
+    cache = FrameResultCache(ttl=5.0, max_distance=4)
+    frame = gradient()
+    cache.put(('a', 640, 480), dhash(frame), {'owner': 'a'}, now=0.0)
+    assert cache.get(('b', 640, 480), dhash(frame), now=1.0) is None
+    # Nor does one client's upload at another size, whose answer is in other pixels
+    assert cache.get(('a', 1280, 960), dhash(frame), now=1.0) is None
+    assert cache.get(('a', 640, 480), dhash(frame), now=1.0) == {'owner': 'a'}
+
+
+def test_least_recently_used_clients_are_dropped():
+    cache = FrameResultCache(max_entries=2)
+    cache.put('a', 0, 'A', now=0.0)
+    cache.put('b', 0, 'B', now=0.0)
+    cache.get('a', 0, now=1.0)
+    cache.put('c', 0, 'C', now=1.0)
+    assert cache.get('b', 0, now=1.0) is None
+    assert cache.get('a', 0, now=1.0) == 'A'
+    assert cache.stats()['clients'] == 2
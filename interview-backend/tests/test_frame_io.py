@@ -0,0 +1,130 @@
+import base64
+import io
+
+import cv2
+import numpy as np
+import pytest
+
+from proctoring.frame_io import IMAGE_CONTENT_TYPES, FrameTooLargeError, decode_data_url, decode_frame, jpeg_size, read_stream
+
+
+def encode(ext, width=64, height=48, params=()):
+    frame = np.zeros((height, width, 3), np.uint8)
+    frame[:, : width // 2] = (0, 128, 255)
+    return cv2.imencode(ext, frame, list(params))[1].tobytes()
+
+
+class Chunked(io.RawIOBase):
+    """A stream that returns at most ``chunk`` bytes per read, like a socket"""
+
+    def __init__(self, data, chunk=1000):
+        self.data = memoryview(data)
+        self.chunk = chunk
+
+    def readinto(self, buf):
+        n = min(len(buf), self.chunk, len(self.data))
+        buf[:n] = self.data[:n]
+        self.data = self.data[n:]
+        return n
+
+
+# --- jpeg_size ---
+def test_baseline_jpeg_size():
+    data = encode('.jpg', 640, 360)
+    assert data[data.index(b'\xff\xc0') + 1] == 0xC0
+    assert jpeg_size(data) == (640, 360)
+
+
+def test_progressive_jpeg_size():
+    data = encode('.jpg', 320, 200, (cv2.IMWRITE_JPEG_PROGRESSIVE, 1))
+    assert b'\xff\xc2' in data and b'\xff\xc0' not in data
+    assert jpeg_size(data) == (320, 200)
+
+
+def test_fill_bytes_before_a_marker_are_skipped():
+    data = encode('.jpg', 100, 50)
+    # Insert padding 0xFF bytes before the first marker after SOI
+    padded = data[:2] + b'\xff\xff' + data[2:]
+    assert jpeg_size(padded) == (100, 50)
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    b'\xff\xd8',
+    b'garbage' * 10,
+    b'\xff\xd8\x00\x01\x02\x03\x04\x05\x06\x07\x08\x09',
+])
+def test_garbage_has_no_jpeg_size(data):
+    assert jpeg_size(data) is None
+
+
+def test_truncated_jpeg_has_no_size():
+    data = encode('.jpg', 640, 360)
+    assert jpeg_size(data[:data.index(b'\xff\xc0') + 5]) is None
+    assert decode_frame(data[:20]) is None
+
+
+@pytest.mark.parametrize('ext', ['.png', '.webp'])
+def test_other_formats_decode_without_a_jpeg_size(ext):
+    data = encode(ext, 64, 48)
+    assert jpeg_size(data) is None
+    frame = decode_frame(data, max_width=32)
+    assert frame.shape == (24, 32, 3)
+
+
+def test_content_types():
+    assert {'image/jpeg', 'image/webp'} <= set(IMAGE_CONTENT_TYPES)
+    assert 'image/png' not in IMAGE_CONTENT_TYPES
+    assert 'application/json' not in IMAGE_CONTENT_TYPES
+
+
+# --- decode_frame ---
+def test_reduced_decode_of_wide_jpegs():
+    frame = decode_frame(encode('.jpg', 1280, 720), max_width=320)
+    assert frame.shape == (180, 320, 3)
+    # Not wide enough to reduce: resized instead
+    assert decode_frame(encode('.jpg', 400, 200), max_width=320).shape == (160, 320, 3)
+    assert decode_frame(encode('.jpg', 200, 100), max_width=320).shape == (100, 200, 3)
+
+
+def test_resize_writes_into_the_given_array():
+    slot = np.zeros((200, 400, 3), np.uint8)
+    sizes = []
+
+    def out(height, width):
+        sizes.append((height, width))
+        return slot[:height, :width] if width == 400 else None
+
+    frame = decode_frame(encode('.jpg', 600, 300), max_width=320, out=out)
+    assert sizes == [(160, 320)]
+    assert frame.shape == (160, 320, 3)
+    assert not np.shares_memory(frame, slot)
+    # A contiguous array of the right shape is written in place
+    exact = np.zeros((160, 320, 3), np.uint8)
+    frame = decode_frame(encode('.jpg', 600, 300), max_width=320, out=lambda height, width: exact)
+    assert frame is exact and exact.any()
+    # Nothing to resize: the allocator is not asked
+    assert decode_frame(encode('.jpg', 200, 100), max_width=320, out=lambda height, width: 1 / 0).shape == (100, 200, 3)
+
+
+def test_data_urls():
+    data = encode('.jpg')
+    assert decode_data_url('data:image/jpeg;base64,' + base64.b64encode(data).decode()) == data
+    assert decode_data_url(base64.b64encode(data).decode()) == data
+
+
+# --- read_stream ---
+@pytest.mark.parametrize('max_bytes', [1000, 300 * 1024])
+@pytest.mark.parametrize('with_length', [True, False])
+def test_size_limit_at_and_past_the_cap(max_bytes, with_length):
+    at_cap = bytes(range(256)) * (max_bytes // 256) + b'x' * (max_bytes % 256)
+    body = read_stream(Chunked(at_cap), len(at_cap) if with_length else None, max_bytes)
+    assert bytes(body) == at_cap
+    past_cap = at_cap + b'y'
+    with pytest.raises(FrameTooLargeError):
+        read_stream(Chunked(past_cap), len(past_cap) if with_length else None, max_bytes)
+
+
+def test_short_body_stops_at_end_of_stream():
+    assert bytes(read_stream(Chunked(b'abc'), 10, 100)) == b'abc'
+    assert bytes(read_stream(Chunked(b''), None, 100)) == b''
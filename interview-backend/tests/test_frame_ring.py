@@ -0,0 +1,111 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from proctoring.frame_ring import FrameRing
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(2, 48, 64)
+    yield ring
+    ring.close()
+
+
+def test_slot_round_trip(ring):
+    handle = ring.acquire(32, 40)
+    handle.frame[:] = 7
+    lend = ring.lend(handle)
+    view = ring.borrow(handle.index, handle.generation)
+    assert view.shape == (32, 40, 3) and (view == 7).all()
+    assert not view.flags.writeable
+    assert ring.stats()['lent'] == 1
+    ring.give_back(handle.index, lend)
+    ring.release(handle)
+    assert ring.stats()['free'] == 2
+    del view, handle
+
+
+def test_full_ring_and_oversized_frames(ring):
+    handles = [ring.acquire(48, 64), ring.acquire(10, 10)]
+    assert all(handles)
+    assert ring.acquire(10, 10) is None
+    assert ring.acquire(49, 64) is None
+    ring.release(handles[0])
+    assert ring.acquire(10, 10).index == handles[0].index
+    del handles
+
+
+def test_orphaned_slot_is_reused_only_after_it_comes_back(ring):
+    first = ring.acquire(10, 10)
+    lend = ring.lend(first)
+    # The front end gives up (a timeout) while the worker still reads the frame
+    ring.release(first)
+    assert ring.stats()['orphaned'] == 1
+    second = ring.acquire(10, 10)
+    assert second.index != first.index
+    assert ring.acquire(10, 10) is None
+    ring.give_back(first.index, lend)
+    third = ring.acquire(10, 10)
+    assert third.index == first.index and third.generation == first.generation + 1
+    del first, second, third
+
+
+def test_old_generations_are_ignored(ring):
+    handle = ring.acquire(10, 10)
+    ring.lend(handle)
+    assert ring.borrow(handle.index, handle.generation - 1) is None
+    # A release of an earlier generation does not free the slot again
+    stale = type(handle)(handle.index, handle.generation - 1, handle.frame)
+    ring.release(stale)
+    assert ring.stats()['lent'] == 1
+    # A stopped worker's lends are taken back
+    ring.reclaim(handle.index)
+    assert ring.borrow(handle.index, handle.generation) is None
+    assert ring.stats()['held'] == 1
+    del handle, stale
+
+
+def test_lookup_finds_held_slot_frames(ring):
+    handle = ring.acquire(10, 12)
+    assert ring.lookup(handle.frame).index == handle.index
+    assert ring.lookup(np.zeros((10, 12, 3), np.uint8)) is None
+    assert ring.lookup(handle.frame[:5]) is None
+    ring.release(handle)
+    assert ring.lookup(handle.frame) is None
+    del handle
+
+
+# Inference workers are separate interpreters (see inference_processes), with their own
+# resource tracker
+_WORKER = """
+import json, sys
+from proctoring.frame_ring import FrameRing
+description, index, generation, lend = json.loads(sys.argv[1])
+ring = FrameRing.attach(**description)
+view = ring.borrow(index, generation)
+print(int(view.sum()))
+del view
+ring.give_back(index, lend)
+ring.close()
+"""
+
+
+def test_worker_process_reads_and_returns_the_slot(ring):
+    handle = ring.acquire(4, 4)
+    handle.frame[:] = 1
+    lend = ring.lend(handle)
+    worker = subprocess.run([sys.executable, '-c', _WORKER, json.dumps([ring.describe(), handle.index, handle.generation, lend])],
+                            cwd=BACKEND_DIR, capture_output=True, text=True, timeout=60)
+    assert worker.returncode == 0, worker.stderr
+    assert worker.stdout.strip() == str(4 * 4 * 3)
+    assert ring.stats()['orphaned'] == 0 and ring.stats()['held'] == 1
+    ring.release(handle)
+    assert ring.stats()['free'] == 2
+    del handle
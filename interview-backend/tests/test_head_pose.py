@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+import pytest
+
+from proctoring import head_pose
+from proctoring.head_pose import LANDMARK_IDXS, MODEL_POINTS, _euler_angles, _rotation_matrices, camera_intrinsics, estimate_head_poses, landmarks_array
+
+WIDTH, HEIGHT = 640, 480
+
+
+def _wrap(angle):
+    return (angle + 180.0) % 360.0 - 180.0
+
+
+def face_landmarks(yaw=0.0, pitch=0.0):
+    """(1, 478, 3) landmarks of the model face 300 units in front of the camera, turned by
+    ``yaw`` and tilted by ``pitch`` degrees"""
+    camera_matrix, dist_coeffs = camera_intrinsics(WIDTH, HEIGHT)
+    # The model's y axis points up, the image's down
+    facing_camera = np.diag([1.0, -1.0, -1.0])
+    turn = cv2.Rodrigues(np.array([0.0, np.radians(yaw), 0.0]))[0]
+    tilt = cv2.Rodrigues(np.array([np.radians(pitch), 0.0, 0.0]))[0]
+    rotation = cv2.Rodrigues(tilt @ turn @ facing_camera)[0]
+    points, _ = cv2.projectPoints(MODEL_POINTS, rotation, np.array([0.0, 0.0, 300.0]), camera_matrix, dist_coeffs)
+    landmarks = np.full((1, 478, 3), 0.5, dtype=np.float32)
+    landmarks[0, LANDMARK_IDXS, :2] = points.reshape(-1, 2) / (WIDTH, HEIGHT)
+    return landmarks
+
+
+def test_landmark_33_is_the_image_left_eye_corner():
+    landmarks = face_landmarks()
+    assert landmarks[0, 33, 0] < 0.5 < landmarks[0, 263, 0]
+
+
+def test_frontal_face_has_no_yaw():
+    pose = estimate_head_poses(face_landmarks(), WIDTH, HEIGHT)[0]
+    assert pose['valid']
+    assert abs(pose['yaw']) < 1.5
+    # The image's y axis is flipped against the model's, so a level face reads +-180
+    assert abs(_wrap(pose['pitch'] - 180)) < 1.5
+
+
+@pytest.mark.parametrize('yaw', [-30.0, -15.0, 15.0, 30.0])
+def test_yaw_follows_head_turns(yaw):
+    pose = estimate_head_poses(face_landmarks(yaw=yaw), WIDTH, HEIGHT)[0]
+    assert pose['yaw'] == pytest.approx(yaw, abs=1.5)
+
+
+@pytest.mark.parametrize('pitch', [-15.0, 15.0])
+def test_pitch_follows_head_tilts(pitch):
+    level = estimate_head_poses(face_landmarks(), WIDTH, HEIGHT)[0]
+    tilted = estimate_head_poses(face_landmarks(pitch=pitch), WIDTH, HEIGHT)[0]
+    assert abs(_wrap(tilted['pitch'] - level['pitch'])) == pytest.approx(abs(pitch), abs=2)
+
+
+def test_vectorized_angles_match_cv2_rodrigues():
+    rng = np.random.default_rng(0)
+    rotation_vectors = rng.uniform(-1.5, 1.5, size=(20, 3))
+    pitch, yaw, roll = _euler_angles(_rotation_matrices(rotation_vectors))
+    for i, vector in enumerate(rotation_vectors):
+        rmat = cv2.Rodrigues(vector)[0]
+        sy = np.sqrt(rmat[0, 0] ** 2 + rmat[1, 0] ** 2)
+        assert pitch[i] == pytest.approx(np.degrees(np.arctan2(rmat[2, 1], rmat[2, 2])), abs=1e-6)
+        assert yaw[i] == pytest.approx(np.degrees(np.arctan2(-rmat[2, 0], sy)), abs=1e-6)
+        assert roll[i] == pytest.approx(np.degrees(np.arctan2(rmat[1, 0], rmat[0, 0])), abs=1e-6)
+
+
+def test_no_faces():
+    assert len(estimate_head_poses(np.zeros((0, 478, 3), dtype=np.float32), WIDTH, HEIGHT)) == 0
+
+
+@pytest.fixture
+def landmark_list():
+    landmark_pb2 = pytest.importorskip('mediapipe.framework.formats.landmark_pb2')
+
+    def build(count=478, visibility=False):
+        face = landmark_pb2.NormalizedLandmarkList()
+        for i in range(count):
+            landmark = face.landmark.add()
+            landmark.x, landmark.y, landmark.z = i / count, 1.0 - i / count, 0.0 if i % 5 == 0 else -i / 1000
+            if visibility:
+                landmark.visibility = 0.9
+        return face
+    return build
+
+
+def test_decoded_landmarks_match_the_accessors(landmark_list, monkeypatch):
+    monkeypatch.setattr(head_pose, '_decode_checked', None)
+    face = landmark_list()
+    decoded = head_pose._decode_landmarks(face)
+    assert decoded is not None
+    np.testing.assert_array_equal(decoded, head_pose._read_landmarks(face))
+    assert landmarks_array([face, face]).shape == (2, 478, 3)
+    assert head_pose._decode_checked is True
+
+
+def test_landmarks_with_visibility_are_read_one_by_one(landmark_list, monkeypatch):
+    monkeypatch.setattr(head_pose, '_decode_checked', None)
+    face = landmark_list(visibility=True)
+    assert head_pose._decode_landmarks(face) is None
+    np.testing.assert_array_equal(landmarks_array([face])[0], head_pose._read_landmarks(face))
+    assert head_pose._decode_checked is None
+
+
+def test_decoding_is_turned_off_when_the_self_check_fails(landmark_list, monkeypatch):
+    monkeypatch.setattr(head_pose, '_decode_checked', None)
+    monkeypatch.setattr(head_pose, '_decode_landmarks', lambda face: np.zeros((478, 3), dtype=np.float32))
+    face = landmark_list()
+    expected = head_pose._read_landmarks(face)
+    np.testing.assert_array_equal(landmarks_array([face])[0], expected)
+    assert head_pose._decode_checked is False
+    np.testing.assert_array_equal(landmarks_array([face])[0], expected)
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from proctoring.frame_ring import FrameRing
+from proctoring.inference_processes import InferenceProcesses, _Worker
+
+
+class FakeConnection:
+    """A child's end of the connection: reads the lent slot and answers with a scripted reply"""
+
+    def __init__(self, ring, reply):
+        self.ring = ring
+        self.reply = reply
+        self.seen = []
+
+    def send(self, message):
+        index, generation, lend, roi, working_width = message
+        frame = self.ring.borrow(index, generation)
+        self.seen.append((index, frame.copy()))
+        del frame
+        self.ring.give_back(index, lend)
+
+    def poll(self, timeout):
+        return True
+
+    def recv(self):
+        return self.reply
+
+
+@pytest.fixture
+def processes():
+    ring = FrameRing(2, 48, 64)
+    processes = InferenceProcesses(ring, 1, '.')
+    yield processes
+    processes._listener.close()
+    ring.close()
+
+
+def add_worker(processes, reply):
+    worker = _Worker(0, None)
+    worker.conn = FakeConnection(processes.ring, reply)
+    processes._idle.put(worker)
+    return worker.conn
+
+
+def test_child_stage_timings_reach_the_observers(processes):
+    conn = add_worker(processes, ('ok', {'landmarks': 'detections'}, [('person_detection', 0.02), ('face_mesh', 0.01)]))
+    observed = []
+    processes.add_observer(lambda stage, seconds: observed.append((stage, seconds)))
+    assert processes.run(np.full((10, 12, 3), 5, np.uint8)) == {'landmarks': 'detections'}
+    assert observed == [('person_detection', 0.02), ('face_mesh', 0.01)]
+    assert (conn.seen[0][1] == 5).all()
+    # A frame outside the ring was copied into a slot, which is free again
+    assert processes.stats()['copied'] == 1
+    assert processes.ring.stats()['free'] == 2
+
+
+def test_timings_of_failed_frames_are_kept(processes):
+    add_worker(processes, ('error', "ValueError('bad')", [('person_detection', 0.03)]))
+    observed = []
+    processes.add_observer(lambda stage, seconds: observed.append(stage))
+    with pytest.raises(RuntimeError, match='bad'):
+        processes.run(np.zeros((10, 12, 3), np.uint8))
+    assert observed == ['person_detection']
+
+
+def test_frames_written_into_a_slot_are_shared_without_a_copy(processes):
+    add_worker(processes, ('ok', {}, []))
+    slot = processes.slot(10, 12)
+    slot[:] = 9
+    assert processes.share(slot) is slot
+    processes.run(slot)
+    assert processes.stats()['copied'] == 0
+    processes.release(slot)
+    assert processes.ring.stats()['free'] == 2
+
+
+def test_share_copies_other_frames_into_a_slot(processes):
+    frame = np.full((10, 12, 3), 3, np.uint8)
+    shared = processes.share(frame)
+    assert shared is not frame and processes.ring.lookup(shared) is not None
+    assert (shared == 3).all()
+    processes.release(shared)
+    # Too large for any slot: the frame itself
+    large = np.zeros((49, 64, 3), np.uint8)
+    assert processes.share(large) is large
@@ -0,0 +1,131 @@
+import pytest
+
+from proctoring.infractions import DEFAULT_REASONS, InfractionEngine, merge_thresholds
+
+PER_FRAME = {name: {'window': 1, 'enter': 1, 'exit': 1} for name in ('multiple_faces', 'profile_face', 'no_face')}
+
+
+def feed(engine, state, frames):
+    """Infraction after each of ``frames`` (candidate, or (candidate, reason, pose))"""
+    active = []
+    for frame in frames:
+        candidate, reason, pose = frame if isinstance(frame, tuple) else (frame, None, None)
+        active.append(engine.update(state, candidate, reason, pose)[0])
+    return active
+
+
+# --- Votes ---
+def test_two_of_three_votes_enter_and_exit():
+    engine = InfractionEngine()
+    state = engine.new_state()
+    # One frame against does not end it, two of the last three do
+    assert feed(engine, state, ['no_face', 'no_face', None, 'no_face', 'no_face', None, None]) == [
+        None, 'no_face', 'no_face', 'no_face', 'no_face', 'no_face', None]
+    # Two of three in any order start it
+    assert feed(engine, state, ['no_face', None, 'no_face']) == [None, None, 'no_face']
+
+
+def test_a_single_frame_never_starts_an_infraction():
+    engine = InfractionEngine()
+    state = engine.new_state()
+    assert feed(engine, state, ['multiple_faces', None, None, 'no_face', None, None]) == [None] * 6
+
+
+def test_per_frame_thresholds_follow_every_verdict():
+    engine = InfractionEngine(PER_FRAME)
+    state = engine.new_state()
+    verdicts = ['no_face', None, 'multiple_faces', 'no_face', None]
+    assert feed(engine, state, verdicts) == verdicts
+
+
+def test_higher_priority_infraction_takes_over():
+    engine = InfractionEngine()
+    state = engine.new_state()
+    assert feed(engine, state, ['no_face', 'no_face', 'multiple_faces', 'multiple_faces']) == [
+        None, 'no_face', 'no_face', 'multiple_faces']
+    # A lower-priority infraction does not take over while the active one holds
+    assert feed(engine, state, ['no_face', 'multiple_faces']) == ['multiple_faces'] * 2
+    # Once it ends, the lower-priority infraction with enough votes follows
+    assert feed(engine, state, ['no_face']) == ['no_face']
+
+
+def test_reason_stays_fixed_while_the_infraction_lasts():
+    engine = InfractionEngine()
+    state = engine.new_state()
+    engine.update(state, 'no_face', 'first reason')
+    assert engine.update(state, 'no_face', 'first reason') == ('no_face', 'first reason')
+    assert engine.update(state, 'no_face', 'second reason') == ('no_face', 'first reason')
+    engine.update(state, None)
+    assert engine.update(state, None) == (None, None)
+
+
+def test_disabled_infractions_are_ignored():
+    engine = InfractionEngine(PER_FRAME, enabled=('no_face',))
+    state = engine.new_state()
+    assert feed(engine, state, ['multiple_faces', 'no_face']) == [None, 'no_face']
+
+
+# --- Pose ---
+def test_turned_head_enters_and_exits_with_hysteresis():
+    engine = InfractionEngine({**PER_FRAME, 'pose': {'alpha': 1.0, 'baseline_alpha': 0.0}})
+    state = engine.new_state()
+    frames = [(None, None, (yaw, 0.0)) for yaw in (0.0, 20.0, 30.0, 20.0, 16.0, 14.0, 20.0)]
+    # Enter above 25 degrees from the baseline, exit below 15
+    assert feed(engine, state, frames) == [None, None, 'profile_face', 'profile_face', 'profile_face', None, None]
+    assert state['reason'] is None
+
+
+def test_pitch_has_its_own_hysteresis():
+    engine = InfractionEngine({**PER_FRAME, 'pose': {'alpha': 1.0, 'baseline_alpha': 0.0}})
+    state = engine.new_state()
+    frames = [(None, None, (0.0, pitch)) for pitch in (180.0, -158.0, -164.0, -170.0)]
+    # Angles are compared across the +-180 seam: -158 is 22 degrees from 180
+    assert feed(engine, state, frames) == [None, 'profile_face', 'profile_face', None]
+
+
+def test_pose_smoothing_decays_towards_new_angles():
+    engine = InfractionEngine()
+    state = engine.new_state()
+    engine.update(state, None, pose=(0.0, 0.0))
+    engine.update(state, None, pose=(50.0, 0.0))
+    assert state['yaw'] == pytest.approx(20.0)
+    for expected in (12.0, 7.2, 4.32):
+        engine.update(state, None, pose=(0.0, 0.0))
+        assert state['yaw'] == pytest.approx(expected)
+
+
+def test_pose_smoothing_wraps_around_180():
+    engine = InfractionEngine()
+    state = engine.new_state()
+    engine.update(state, None, pose=(0.0, 179.0))
+    engine.update(state, None, pose=(0.0, -179.0))
+    assert state['pitch'] == pytest.approx(179.8)
+
+
+def test_a_brief_glance_does_not_vote():
+    engine = InfractionEngine()
+    state = engine.new_state()
+    frames = [(None, None, (yaw, 0.0)) for yaw in (0.0, 0.0, 40.0, 0.0, 0.0)]
+    assert feed(engine, state, frames) == [None] * 5
+    assert state['votes']['profile_face'] == 0
+
+
+def test_sustained_turn_becomes_profile_face():
+    engine = InfractionEngine()
+    state = engine.new_state()
+    frames = [(None, None, (yaw, 0.0)) for yaw in (0.0,) + (40.0,) * 6]
+    # The smoothed yaw passes 25 degrees on the third turned frame, then 3 of 4 votes are needed
+    assert feed(engine, state, frames) == [None] * 5 + ['profile_face'] * 2
+    assert state['reason'] == DEFAULT_REASONS['profile_face']
+
+
+# --- Thresholds ---
+def test_merge_thresholds():
+    thresholds = merge_thresholds({'no_face': {'window': 5, 'enter': 4}})
+    assert thresholds['no_face'] == {'window': 5, 'enter': 4, 'exit': 2}
+    with pytest.raises(ValueError):
+        merge_thresholds({'looking_away': {}})
+    with pytest.raises(ValueError):
+        merge_thresholds({'no_face': {'delay': 1}})
+    with pytest.raises(ValueError):
+        merge_thresholds({'no_face': {'enter': 4}})
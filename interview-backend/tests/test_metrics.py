@@ -0,0 +1,81 @@
+import logging
+import os
+import time
+
+from proctoring.metrics import MetricsRegistry
+from proctoring.profiler import SlowRequestProfiler
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', 'Latency', labels=('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, 'decode')
+    lines = registry.render().splitlines()
+    assert lines == [
+        '# HELP latency_seconds Latency',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{stage="decode",le="0.1"} 2',
+        'latency_seconds_bucket{stage="decode",le="1"} 3',
+        'latency_seconds_bucket{stage="decode",le="+Inf"} 4',
+        'latency_seconds_sum{stage="decode"} 3.65',
+        'latency_seconds_count{stage="decode"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter('requests_total', 'Requests', labels=('path',)).inc('a"b\\c\nd')
+    assert 'requests_total{path="a\\"b\\\\c\\nd"} 1' in registry.render().splitlines()
+
+
+def test_gauge_renders_labelled_values():
+    registry = MetricsRegistry()
+    registry.gauge('pool_idle', 'Idle models', lambda: {'ssd': 2, 'facemesh': 1.5}, labels=('model',))
+    assert registry.render().splitlines()[2:] == ['pool_idle{model="facemesh"} 1.5', 'pool_idle{model="ssd"} 2']
+
+
+def test_failing_gauge_is_logged_and_skipped(caplog):
+    def read():
+        raise RuntimeError('gone')
+
+    registry = MetricsRegistry()
+    registry.gauge('broken', 'Broken', read)
+    with caplog.at_level(logging.WARNING, logger='proctoring.metrics'):
+        assert registry.render().splitlines() == ['# HELP broken Broken', '# TYPE broken gauge']
+    assert 'Failed to read gauge broken: gone' in caplog.text
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_slow_requests_are_written_and_pruned(tmp_path, caplog):
+    profiler = SlowRequestProfiler(threshold_ms=1, interval_ms=1, output_dir=str(tmp_path), max_profiles=2)
+    with caplog.at_level(logging.WARNING, logger='proctoring.profiler'):
+        for _ in range(4):
+            with profiler.profile('/process-frame'):
+                busy(0.03)
+            # Profile names start with a millisecond timestamp
+            time.sleep(0.002)
+    assert profiler.written == 4
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) == 2
+    assert all(name.endswith('.folded') and '-_process-frame-' in name for name in files)
+    with open(tmp_path / files[-1]) as f:
+        lines = f.read().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) > 0
+    assert 'busy (test_metrics.py:' in stack
+    assert 'profile written to' in caplog.text
+
+
+def test_fast_requests_are_discarded(tmp_path):
+    profiler = SlowRequestProfiler(threshold_ms=10_000, interval_ms=1, output_dir=str(tmp_path))
+    with profiler.profile('fast'):
+        busy(0.01)
+    assert profiler.written == 0
+    assert not os.listdir(tmp_path)
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from proctoring.model_pool import ModelPool, PoolClosedError
+
+
+def slow_factory(seconds, created):
+    def factory():
+        time.sleep(seconds)
+        created.append(object())
+        return created[-1]
+    return factory
+
+
+def test_creation_is_not_counted_as_wait():
+    pool = ModelPool('slow', slow_factory(0.2, []), size=1)
+    with pool.checkout():
+        pass
+    stats = pool.stats()
+    assert stats['checkouts'] == 1 and stats['created'] == 1
+    assert stats['wait_ms_max'] < 50
+    assert stats['create_ms_max'] >= 200
+
+
+def test_waiting_for_a_busy_instance_is_counted():
+    pool = ModelPool('one', lambda: object(), size=1)
+    pool.fill()
+    release = threading.Event()
+
+    def hold():
+        with pool.checkout():
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    while pool.stats()['idle']:
+        time.sleep(0.001)
+    threading.Timer(0.1, release.set).start()
+    with pool.checkout():
+        pass
+    holder.join()
+    assert pool.stats()['wait_ms_max'] >= 80
+
+
+def test_stats_do_not_wait_for_a_model_being_built():
+    started = threading.Event()
+    finish = threading.Event()
+
+    def factory():
+        started.set()
+        finish.wait()
+        return object()
+
+    pool = ModelPool('building', factory, size=2)
+    builder = threading.Thread(target=pool.fill)
+    builder.start()
+    started.wait()
+    begun = time.perf_counter()
+    assert pool.stats()['created'] == 0
+    assert time.perf_counter() - begun < 0.05
+    finish.set()
+    builder.join()
+    assert pool.stats()['created'] == 2
+
+
+def test_pool_never_grows_past_its_size():
+    created = []
+    pool = ModelPool('bounded', slow_factory(0.02, created), size=2)
+
+    def use():
+        with pool.checkout(timeout=5):
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 2
+    assert pool.stats()['checkouts'] == 8
+
+
+def test_failed_creation_frees_its_slot():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError('model files missing')
+        return object()
+
+    pool = ModelPool('flaky', factory, size=1)
+    with pytest.raises(RuntimeError):
+        with pool.checkout():
+            pass
+    with pool.checkout() as model:
+        assert model is not None
+
+
+def test_closed_pool_refuses_new_instances():
+    pool = ModelPool('closed', lambda: object(), size=1)
+    pool.close()
+    with pytest.raises(PoolClosedError):
+        with pool.checkout():
+            pass
@@ -0,0 +1,93 @@
+import threading
+
+import numpy as np
+import pytest
+
+from proctoring.normalize import InputNormalizer
+
+
+def frame(height=480, width=640):
+    image = np.zeros((height, width, 3), np.uint8)
+    image[..., 0] = 255  # blue in BGR
+    return image
+
+
+def test_frames_at_or_below_the_working_width_are_not_resized():
+    normalizer = InputNormalizer(working_width=640)
+    image = frame()
+    model_frame, rgb_frame, region = normalizer.prepare(image)
+    assert model_frame is image
+    assert rgb_frame.shape == (480, 640, 3)
+    assert region is None
+    # Never enlarged
+    small = frame(240, 320)
+    assert normalizer.prepare(small)[0] is small
+    assert normalizer.stats()['resized'] == 0
+
+
+def test_wider_frames_are_resized_keeping_the_aspect_ratio():
+    normalizer = InputNormalizer(working_width=320)
+    model_frame, rgb_frame, _ = normalizer.prepare(frame(481, 641))
+    assert model_frame.shape == (240, 320, 3)
+    assert rgb_frame.shape == (240, 320, 3)
+    assert (rgb_frame[..., 2] == 255).all() and (rgb_frame[..., 0] == 0).all()
+
+
+def test_working_width_argument_overrides_the_default():
+    normalizer = InputNormalizer(working_width=320)
+    assert normalizer.prepare(frame(), working_width=0)[0].shape == (480, 640, 3)
+
+
+def test_roi_is_cropped_in_model_pixels_and_reported_in_frame_pixels():
+    normalizer = InputNormalizer(working_width=320)
+    _, rgb_frame, region = normalizer.prepare(frame(), roi=(100, 50, 301, 251))
+    assert rgb_frame.shape == (101, 101, 3)
+    assert region == (100.0, 50.0, 302.0, 252.0)
+    assert normalizer.stats()['cropped'] == 1
+
+
+def test_roi_is_clipped_to_the_frame():
+    normalizer = InputNormalizer()
+    _, rgb_frame, region = normalizer.prepare(frame(), roi=(-50, -20, 900, 100))
+    assert region == (0.0, 0.0, 640.0, 100.0)
+    assert rgb_frame.shape == (100, 640, 3)
+
+
+@pytest.mark.parametrize('roi', [(10, 10, 25, 200), (630, 400, 700, 500), (700, 500, 800, 600)])
+def test_tiny_or_outside_roi_uses_the_whole_frame(roi):
+    normalizer = InputNormalizer()
+    _, rgb_frame, region = normalizer.prepare(frame(), roi=roi)
+    assert region is None
+    assert rgb_frame.shape == (480, 640, 3)
+
+
+def test_buffers_are_reused_per_thread():
+    normalizer = InputNormalizer(working_width=320)
+    first = normalizer.prepare(frame())
+    second = normalizer.prepare(frame())
+    assert np.shares_memory(first[0], second[0]) and np.shares_memory(first[1], second[1])
+    other = []
+    thread = threading.Thread(target=lambda: other.append(normalizer.prepare(frame())))
+    thread.start()
+    thread.join()
+    assert not np.shares_memory(first[1], other[0][1])
+
+
+def test_stats_report_the_pixel_ratio():
+    normalizer = InputNormalizer(working_width=320)
+    normalizer.prepare(frame())
+    stats = normalizer.stats()
+    assert stats['frames'] == 1 and stats['resized'] == 1
+    assert stats['pixel_ratio'] == 0.25
+
+
+def test_only_resized_frames_are_audited(monkeypatch):
+    monkeypatch.setattr('proctoring.normalize.random.random', lambda: 0.0)
+    assert InputNormalizer(working_width=320, audit_rate=0.5).should_audit(frame())
+    assert not InputNormalizer(working_width=640, audit_rate=0.5).should_audit(frame())
+    assert not InputNormalizer(working_width=0, audit_rate=0.5).should_audit(frame())
+    assert not InputNormalizer(working_width=320, audit_rate=0.0).should_audit(frame())
+    normalizer = InputNormalizer(working_width=320, audit_rate=1.0)
+    normalizer.record_audit(True)
+    normalizer.record_audit(False)
+    assert normalizer.stats()['agreement_rate'] == 0.5
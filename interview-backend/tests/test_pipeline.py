@@ -0,0 +1,31 @@
+from proctoring.pipeline import DetectionPipeline, Stage
+
+
+def make_pipeline(calls):
+    def stage(name, result):
+        def run(model, *args):
+            calls.append(name)
+            return result(*args)
+        return run
+
+    return DetectionPipeline([
+        Stage('normalize', ['frame'], ['small'], stage('normalize', lambda frame: (frame * 2,))),
+        Stage('detect', ['small'], ['boxes'], stage('detect', lambda small: (small + 1,))),
+        Stage('mesh', ['small'], ['landmarks'], stage('mesh', lambda small: (small + 2,))),
+    ])
+
+
+def test_only_the_required_stages_run():
+    calls = []
+    values = make_pipeline(calls).run({'frame': 1}, ['landmarks'])
+    assert calls == ['normalize', 'mesh']
+    assert values == {'frame': 1, 'small': 2, 'landmarks': 4}
+
+
+def test_a_second_run_continues_from_the_first_ones_values():
+    calls = []
+    pipeline = make_pipeline(calls)
+    values = pipeline.run({'frame': 1}, ['boxes'])
+    values = pipeline.run(values, ['landmarks'])
+    assert calls == ['normalize', 'detect', 'mesh']
+    assert values['boxes'] == 3 and values['landmarks'] == 4
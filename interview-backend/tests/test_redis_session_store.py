@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from proctoring.session_store import RedisSessionStore, SessionLockTimeout
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def make_store(server, **kwargs):
+    kwargs.setdefault('lock_timeout', 0.2)
+    return RedisSessionStore(client=fakeredis.FakeRedis(server=server), **kwargs)
+
+
+def test_get_of_unknown_session_is_none(server):
+    store = make_store(server)
+    assert store.get('missing') is None
+    assert len(store) == 0
+
+
+def test_state_round_trip(server):
+    store = make_store(server)
+    with store.session('a') as session:
+        session.log_event('correction_window_started', 1.0, infraction='no_face', reason='gone', warning_count=1)
+        session.log_correction('no_face', 'gone', False, 2.0)
+        session.terminated = True
+    record = store.get('a')
+    assert record.session_id == 'a'
+    assert record.terminated is True
+    assert record.event_log() == [
+        {'event': 'correction_window_started', 'infraction': 'no_face', 'reason': 'gone', 'time': 1.0, 'warning_count': 1}]
+    assert len(record.correction_history()) == 1
+    assert record.to_state() == store.get('a').to_state()
+
+
+def test_session_expires_after_idle_ttl(server):
+    store = make_store(server, idle_ttl=60)
+    with store.session('a'):
+        pass
+    assert 0 < store.client.ttl(store._key('a')) <= 60
+    assert len(store) == 1
+
+
+def test_delete_removes_state_and_spilled_events(server):
+    store = make_store(server, event_log_cap=2)
+    with store.session('a') as session:
+        for i in range(5):
+            session.log_event('terminated', float(i), reason='x')
+    assert store.client.exists(store._spill_key('a', 'events'))
+    store.delete('a')
+    assert store.get('a') is None
+    assert len(store) == 0
+    assert not store.client.exists(store._spill_key('a', 'events'))
+
+
+def test_held_lock_times_out(server):
+    store = make_store(server)
+    other = make_store(server)
+    with store.session('a'):
+        with pytest.raises(SessionLockTimeout):
+            with other.session('a'):
+                pass
+    # Released once the holder is done
+    with other.session('a'):
+        pass
+
+
+def test_concurrent_updates_are_serialized(server):
+    def worker():
+        store = make_store(server, lock_timeout=10.0)
+        for _ in range(20):
+            with store.session('a') as session:
+                session.warning_count += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert make_store(server).get('a').warning_count == 80
+
+
+def test_spilled_events_are_readable_from_another_node(server):
+    store = make_store(server, event_log_cap=4)
+    with store.session('a') as session:
+        for i in range(6):
+            session.log_event('terminated', float(i), reason='x')
+    with store.session('a') as session:
+        for i in range(6, 10):
+            session.log_event('terminated', float(i), reason='x')
+    log = make_store(server, event_log_cap=4).get('a').proctoring_event_log
+    assert log.first_index == 0
+    assert len(log) == 10
+    assert [e['time'] for e in log.to_list(0, include_spilled=True)] == [float(i) for i in range(10)]
+    assert [e['time'] for e in log.to_list(2, include_spilled=True, stop=8)] == [2.0, 3.0, 4.0, 5.0, 6.0, 7.0]
+    assert store.client.ttl(store._spill_key('a', 'events')) > 0
+
+
+def test_new_session_does_not_read_an_expired_sessions_spill(server):
+    store = make_store(server, event_log_cap=2)
+    store.client.rpush(store._spill_key('a', 'events'), '{"event": "terminated", "time": 0.0}')
+    with store.session('a') as session:
+        session.log_event('terminated', 100.0, reason='new run')
+    assert [e['time'] for e in store.get('a').event_log(include_spilled=True)] == [100.0]
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from proctoring.sequencing import FrameDropped, FrameSequencer, is_newer_frame, parse_frame_order
+from proctoring.session_record import SessionRecord
+
+
+@pytest.mark.parametrize('seq, captured_at, expected', [
+    ('7', '1700000000000', (7, 1700000000.0)),
+    (7, 1700000000500, (7, 1700000000.5)),
+    (None, None, (None, None)),
+    ('', '', (None, None)),
+    ('-1', '0', (None, None)),
+    ('x', 'y', (None, None)),
+])
+def test_parse_frame_order(seq, captured_at, expected):
+    assert parse_frame_order(seq, captured_at) == expected
+
+
+def test_is_newer_frame():
+    assert is_newer_frame(5, 10.0, 4, 9.0)
+    assert not is_newer_frame(4, 9.0, 5, 10.0)
+    assert not is_newer_frame(5, 10.0, 5, 10.0)
+    # A restarted counter with a later capture time (page reload)
+    assert is_newer_frame(0, 20.0, 5, 10.0)
+    # Frames without ordering information are accepted
+    assert is_newer_frame(None, None, 5, 10.0)
+    assert is_newer_frame(3, None, None, None)
+
+
+def test_stale_frames_are_dropped():
+    sequencer = FrameSequencer()
+    assert sequencer.run('a', 2, None, lambda: 'ran') == 'ran'
+    with pytest.raises(FrameDropped) as dropped:
+        sequencer.run('a', 1, None, lambda: 'ran')
+    assert dropped.value.reason == 'stale'
+    # Other sessions are ordered independently
+    assert sequencer.run('b', 1, None, lambda: 'ran') == 'ran'
+    assert sequencer.dropped == {'stale': 1, 'superseded': 0}
+
+
+def test_only_the_newest_waiting_frame_runs():
+    sequencer = FrameSequencer()
+    release = threading.Event()
+    ran = []
+    outcomes = {}
+
+    def submit(seq, fn):
+        try:
+            outcomes[seq] = sequencer.run('a', seq, None, fn)
+        except FrameDropped as e:
+            outcomes[seq] = e.reason
+
+    running = threading.Thread(target=submit, args=(1, lambda: release.wait() and ran.append(1)))
+    running.start()
+    while sequencer.stats()['running'] == 0:
+        time.sleep(0.001)
+    waiting = []
+    for seq in (2, 3):
+        waiting.append(threading.Thread(target=submit, args=(seq, lambda seq=seq: ran.append(seq))))
+        waiting[-1].start()
+        while sequencer.stats()['waiting'] == 0 or (seq == 3 and 2 not in outcomes):
+            time.sleep(0.001)
+    release.set()
+    for thread in [running] + waiting:
+        thread.join()
+    assert outcomes[2] == 'superseded'
+    assert ran == [1, 3]
+    assert sequencer.dropped['superseded'] == 1
+    assert sequencer.stats()['sessions'] == 1
+
+
+def test_frame_clock_absorbs_clock_skew():
+    record = SessionRecord('a', now=0.0)
+    # The client clock is 100 s behind; the first frame took 0.5 s to arrive
+    assert record.frame_clock(1, 900.0, 1000.5) == 1000.5
+    # A frame delayed 2 s is judged by when it was taken
+    assert record.frame_clock(2, 901.0, 1003.0) == 1001.5
+    # A faster frame lowers the offset and moves the running window back
+    record.correction_timer_start = 1001.5
+    assert record.frame_clock(3, 902.0, 1002.1) == pytest.approx(1002.1)
+    assert record.correction_timer_start == pytest.approx(1001.1)
+    # Frames older than the last applied one are refused
+    assert record.frame_clock(2, 901.5, 1003.0) is None
+
+
+def test_in_flight_since_reports_the_oldest_running_or_waiting_frame(monkeypatch):
+    sequencer = FrameSequencer()
+    assert sequencer.in_flight_since('a') is None
+    release = threading.Event()
+    clock = iter([100.0, 101.0])
+    monkeypatch.setattr('proctoring.sequencing.time.time', lambda: next(clock, 102.0))
+    running = threading.Thread(target=sequencer.run, args=('a', 1, None, release.wait))
+    running.start()
+    while sequencer.stats()['running'] == 0:
+        time.sleep(0.001)
+    assert sequencer.in_flight_since('a') == 100.0
+    waiting = threading.Thread(target=sequencer.run, args=('a', 2, None, lambda: None))
+    waiting.start()
+    while sequencer.stats()['waiting'] == 0:
+        time.sleep(0.001)
+    assert sequencer.in_flight_since('a') == 100.0
+    assert sequencer.in_flight_since('b') is None
+    release.set()
+    running.join()
+    waiting.join()
+    assert sequencer.in_flight_since('a') is None
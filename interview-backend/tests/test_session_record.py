@@ -0,0 +1,90 @@
+import os
+
+from proctoring.session_record import EventLog, FileSpill, SessionRecord, _spill_path, file_spill
+from proctoring.session_store import MemorySessionStore
+
+
+def fill(log, count, start=0):
+    for i in range(start, start + count):
+        log.append('correction_window_started', float(i), infraction='no_face', reason=f'r{i % 3}', warning_count=i)
+
+
+def test_spilled_events_keep_their_indexes(tmp_path):
+    log = EventLog(cap=4, spill=FileSpill(str(tmp_path / 's.events.jsonl')))
+    fill(log, 10)
+    assert len(log) == 10
+    assert log.offset == 6
+    assert [e['time'] for e in log.to_list(0)] == [6.0, 7.0, 8.0, 9.0]
+    assert [e['time'] for e in log.to_list(0, include_spilled=True)] == [float(i) for i in range(10)]
+    # A page that crosses from the spill file into memory
+    assert [e['time'] for e in log.to_list(4, include_spilled=True, stop=8)] == [4.0, 5.0, 6.0, 7.0]
+    assert log.to_list(3, include_spilled=True, stop=4) == [
+        {'event': 'correction_window_started', 'infraction': 'no_face', 'reason': 'r0', 'time': 3.0, 'warning_count': 3}]
+
+
+def test_without_spill_old_events_are_dropped():
+    log = EventLog(cap=4)
+    fill(log, 10)
+    assert log.first_index == 6
+    assert [e['time'] for e in log.to_list(0, include_spilled=True)] == [6.0, 7.0, 8.0, 9.0]
+
+
+def test_state_round_trip():
+    log = EventLog(cap=8)
+    fill(log, 5)
+    log.append('terminated', 9.0, reason='done')
+    copy = EventLog.from_state(log.to_state(), cap=8)
+    assert copy.to_list() == log.to_list()
+    assert copy.last() == {'event': 'terminated', 'reason': 'done', 'time': 9.0}
+
+
+def test_spill_paths_of_distinct_ids_differ(tmp_path):
+    paths = {_spill_path(str(tmp_path), session_id, 'events') for session_id in ('a/b', 'a_b', 'a%2Fb', 'a b')}
+    assert len(paths) == 4
+    assert all(os.path.dirname(path) == str(tmp_path) for path in paths)
+
+
+def test_evicted_sessions_lose_their_spill_files(tmp_path):
+    store = MemorySessionStore(max_sessions=1, shards=1, event_log_cap=2, spill_dir=str(tmp_path))
+    with store.session('a') as session:
+        for i in range(5):
+            session.log_event('terminated', float(i), reason='x')
+    assert os.listdir(tmp_path) == ['a.events.jsonl']
+    with store.session('b'):
+        pass
+    assert store.evicted == 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_new_session_does_not_read_an_earlier_runs_spill_file(tmp_path):
+    old = SessionRecord('a', 0.0, event_log_cap=2, spill=file_spill(str(tmp_path)))
+    for i in range(5):
+        old.log_event('terminated', float(i), reason='old run')
+    store = MemorySessionStore(event_log_cap=2, spill_dir=str(tmp_path))
+    with store.session('a') as session:
+        for i in range(3):
+            session.log_event('terminated', 100.0 + i, reason='new run')
+    events = store.get('a').event_log(include_spilled=True)
+    assert [e['time'] for e in events] == [100.0, 101.0, 102.0]
+    assert {e['reason'] for e in events} == {'new run'}
+
+
+def test_reset_removes_spill_files(tmp_path):
+    store = MemorySessionStore(event_log_cap=2, spill_dir=str(tmp_path))
+    with store.session('a') as session:
+        for i in range(5):
+            session.log_correction('no_face', 'gone', False, float(i))
+    assert os.listdir(tmp_path) == ['a.history.jsonl']
+    store.delete('a')
+    assert os.listdir(tmp_path) == []
+
+
+def test_infractions_are_the_warnings_and_the_termination(tmp_path):
+    record = SessionRecord('a', 0.0, event_log_cap=2, spill=file_spill(str(tmp_path)))
+    record.log_event('correction_window_started', 1.0, infraction='no_face', reason='gone', warning_count=1)
+    record.log_event('corrected_in_time', 2.0, infraction='no_face', warning_count=1)
+    record.log_event('correction_window_started', 3.0, infraction='multiple_faces', reason='two', warning_count=2)
+    record.log_event('terminated', 4.0, reason='done', warning_count=2)
+    assert [(e['event'], e['time']) for e in record.infractions(include_spilled=True)] == [
+        ('correction_window_started', 1.0), ('correction_window_started', 3.0), ('terminated', 4.0)]
+    assert len(record.event_log(include_spilled=True)) == 4
@@ -0,0 +1,56 @@
+from proctoring.stream import StreamState
+
+
+def result(**changes):
+    base = {'warning_count': 0, 'max_warnings': 4, 'correction_window': None, 'terminated': False, 'warning': None}
+    return {**base, **changes}
+
+
+WINDOW = {'infraction': 'no_face', 'reason': 'No face detected.', 'start_time': 10.0, 'seconds_left': 5.0}
+
+
+def test_snapshot_sets_the_pace():
+    stream = StreamState(1500, 500)
+    snapshot = stream.snapshot(result())
+    assert snapshot['event'] == 'state' and snapshot['interval_ms'] == 1500
+    assert stream.snapshot(result(terminated=True))['interval_ms'] == 0
+
+
+def test_unchanged_frames_send_nothing():
+    stream = StreamState(1500, 500)
+    stream.snapshot(result())
+    assert stream.updates(result()) == []
+
+
+def test_correction_window_speeds_up_and_clears():
+    stream = StreamState(1500, 500)
+    stream.snapshot(result())
+    events = stream.updates(result(correction_window=WINDOW, warning_count=1, warning='No face detected.'))
+    assert [e['event'] for e in events] == ['correction_window_started', 'warning', 'pace']
+    assert events[-1]['interval_ms'] == 500
+    # The countdown changing does not restart the window
+    assert stream.updates(result(correction_window={**WINDOW, 'seconds_left': 3.0}, warning_count=1)) == []
+    events = stream.updates(result(warning_count=1))
+    assert [e['event'] for e in events] == ['correction_window_cleared', 'pace']
+    assert events[-1]['interval_ms'] == 1500
+
+
+def test_termination_stops_the_client():
+    stream = StreamState(1500, 500)
+    stream.snapshot(result())
+    events = stream.updates(result(terminated=True, termination_reason='Too many warnings.', warning_count=4))
+    assert [e['event'] for e in events] == ['terminated', 'pace']
+    assert events[0]['termination_reason'] == 'Too many warnings.'
+    assert events[1]['interval_ms'] == 0
+    # Later results of the terminated session send nothing more
+    assert stream.updates(result(terminated=True, warning_count=4)) == []
+
+
+def test_new_log_entries_are_forwarded():
+    stream = StreamState(1500, 500)
+    stream.snapshot(result())
+    stream.event_cursor = 0
+    entries = [{'event': 'correction_window_started', 'time': 1.0}]
+    events = stream.updates(result(proctoring_events=entries, events_start=0, event_cursor=1))
+    assert events == [{'event': 'events', 'events': entries, 'events_start': 0, 'event_cursor': 1}]
+    assert stream.event_cursor == 1
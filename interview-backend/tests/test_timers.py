@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+
+from proctoring.timers import SessionSubscribers, TimerWheel
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def wheel():
+    return TimerWheel(tick=0.1, slots=8, clock=FakeClock())
+
+
+def test_timers_fire_once_when_due(wheel):
+    fired = []
+    wheel.schedule('a', 1000.25, fired.append, 'a')
+    assert wheel.advance(1000.22) == 0
+    assert wheel.advance(1000.32) == 1
+    assert wheel.advance(1000.42) == 0
+    assert fired == ['a']
+    assert len(wheel) == 0
+
+
+def test_schedule_replaces_and_cancel_removes(wheel):
+    fired = []
+    wheel.schedule('a', 1000.2, fired.append, 'first')
+    wheel.schedule('a', 1000.5, fired.append, 'second')
+    wheel.schedule('b', 1000.2, fired.append, 'b')
+    wheel.cancel('b')
+    wheel.cancel('missing')
+    assert len(wheel) == 1
+    wheel.advance(1000.3)
+    assert fired == []
+    wheel.advance(1000.5)
+    assert fired == ['second']
+
+
+def test_timers_beyond_one_revolution_wait_their_turn(wheel):
+    fired = []
+    # 8 slots of 0.1 s: due after 2.5 revolutions, in the same bucket as a tick that passes earlier
+    wheel.schedule('far', 1002.0, fired.append, 'far')
+    wheel.advance(1001.2)
+    assert fired == []
+    wheel.advance(1002.0)
+    assert fired == ['far']
+
+
+def test_past_due_timers_fire_on_the_next_visit(wheel):
+    fired = []
+    wheel.advance(1000.52)
+    wheel.schedule('late', 999.0, fired.append, 'late')
+    assert wheel.advance(1000.58) == 0
+    wheel.advance(1000.62)
+    assert fired == ['late']
+
+
+def test_a_stall_longer_than_a_revolution_fires_everything_due(wheel):
+    fired = []
+    for i in range(20):
+        wheel.schedule(i, 1000.0 + i * 0.1, fired.append, i)
+    wheel.advance(1010.0)
+    assert sorted(fired) == list(range(20))
+
+
+def test_callback_errors_are_counted(wheel):
+    wheel.schedule('bad', 1000.1, lambda: 1 / 0)
+    wheel.schedule('good', 1000.1, lambda: None)
+    assert wheel.advance(1000.2) == 2
+    assert wheel.stats()['errors'] == 1 and wheel.stats()['fired'] == 2
+
+
+def test_callbacks_may_reschedule_themselves(wheel):
+    fired = []
+
+    def again(n):
+        fired.append(n)
+        if n < 3:
+            wheel.schedule('loop', 1000.0 + (n + 1) * 0.1, again, n + 1)
+
+    wheel.schedule('loop', 1000.0, again, 0)
+    for step in range(1, 6):
+        wheel.advance(1000.0 + step * 0.1)
+    assert fired == [0, 1, 2, 3]
+
+
+def test_background_thread_fires_timers():
+    wheel = TimerWheel(tick=0.01).start()
+    done = threading.Event()
+    try:
+        wheel.schedule('a', wheel.clock() + 0.05, done.set)
+        assert done.wait(2)
+    finally:
+        wheel.close()
+
+
+def test_session_subscribers():
+    subscribers = SessionSubscribers()
+    seen = []
+    unsubscribe = subscribers.subscribe('a', lambda state: seen.append(('a', state)))
+    subscribers.subscribe(None, lambda session_id, state: seen.append(('*', session_id, state)))
+    subscribers.subscribe('b', lambda state: 1 / 0)
+    subscribers.publish('a', 1)
+    subscribers.publish('b', 2)
+    unsubscribe()
+    unsubscribe()
+    subscribers.publish('a', 3)
+    assert seen == [('a', 1), ('*', 'a', 1), ('*', 'b', 2), ('*', 'a', 3)]
@@ -0,0 +1,165 @@
+import numpy as np
+import pytest
+
+from proctoring import tracking
+from proctoring.tracking import FrameTracker, landmarks_box, roi_landmarks_to_frame
+
+HEIGHT, WIDTH = 480, 640
+
+
+def frame(value=100, shape=(HEIGHT, WIDTH, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def face(x0=0.4, y0=0.4, x1=0.6, y1=0.6, count=1):
+    """(count, 4, 3) landmarks spanning a box, normalized to the frame"""
+    corners = np.array([[x0, y0, 0.0], [x1, y0, 0.0], [x0, y1, 0.0], [x1, y1, 0.0]], dtype=np.float32)
+    return np.repeat(corners[None], count, axis=0)
+
+
+class FakeDetectors:
+    """Full and ROI detectors returning scripted landmarks, recording their calls"""
+
+    def __init__(self, full_landmarks=None):
+        self.full_landmarks = face() if full_landmarks is None else full_landmarks
+        self.roi_landmarks = []
+        self.calls = []
+
+    def full(self, image):
+        self.calls.append('full')
+        return {'landmarks': self.full_landmarks, 'source': 'full'}
+
+    def roi(self, image, box):
+        self.calls.append(('roi', box))
+        return {'landmarks': self.roi_landmarks.pop(0), 'source': 'roi'}
+
+    def verdict(self, shape, detections):
+        return len(detections['landmarks'])
+
+
+def detect(tracker, detectors, image, session_id='s'):
+    detections, path = tracker.detect(session_id, image, detectors.full, detectors.roi, detectors.verdict)
+    return detections['source'], path
+
+
+def test_first_frame_is_a_full_detection():
+    detectors = FakeDetectors()
+    assert detect(FrameTracker(), detectors, frame()) == ('full', 'full')
+    assert detectors.calls == ['full']
+
+
+def test_unchanged_scene_reuses_detections():
+    tracker, detectors = FrameTracker(diff_threshold=3.0), FakeDetectors()
+    detect(tracker, detectors, frame(100))
+    assert detect(tracker, detectors, frame(101)) == ('full', 'reuse')
+    assert detectors.calls == ['full']
+
+
+def test_keyframe_interval_forces_a_full_detection():
+    tracker, detectors = FrameTracker(keyframe_interval=3), FakeDetectors()
+    paths = [detect(tracker, detectors, frame(100))[1] for _ in range(5)]
+    assert paths == ['full', 'reuse', 'reuse', 'reuse', 'full']
+
+
+def test_frame_size_change_forces_a_full_detection():
+    tracker, detectors = FrameTracker(), FakeDetectors()
+    detect(tracker, detectors, frame())
+    assert detect(tracker, detectors, frame(shape=(240, 320, 3)))[1] == 'full'
+
+
+def test_changed_scene_without_roi_is_a_full_detection():
+    tracker, detectors = FrameTracker(roi_margin=0.0), FakeDetectors()
+    detect(tracker, detectors, frame(100))
+    assert detect(tracker, detectors, frame(200))[1] == 'full'
+    assert detectors.calls == ['full', 'full']
+
+
+def test_changed_scene_runs_facemesh_on_the_last_face_box():
+    tracker, detectors = FrameTracker(roi_margin=0.5), FakeDetectors()
+    detect(tracker, detectors, frame(100))
+    detectors.roi_landmarks.append(face(0.42, 0.42, 0.62, 0.62))
+    assert detect(tracker, detectors, frame(200)) == ('roi', 'roi')
+    assert detectors.calls == ['full', ('roi', landmarks_box(face(), (HEIGHT, WIDTH), 0.5))]
+
+
+def test_fewer_faces_in_the_roi_falls_back_to_full_detection():
+    tracker, detectors = FrameTracker(roi_margin=0.5), FakeDetectors()
+    detect(tracker, detectors, frame(100))
+    detectors.roi_landmarks.append(np.zeros((0, 4, 3), dtype=np.float32))
+    assert detect(tracker, detectors, frame(200)) == ('full', 'lost')
+    assert detectors.calls[1:] == [('roi', landmarks_box(face(), (HEIGHT, WIDTH), 0.5)), 'full']
+
+
+def test_face_at_the_roi_edge_falls_back_to_full_detection():
+    tracker, detectors = FrameTracker(roi_margin=0.5), FakeDetectors()
+    detect(tracker, detectors, frame(100))
+    # The box spans x 0.3-0.7; a face reaching its left edge has probably moved out
+    detectors.roi_landmarks.append(face(0.3, 0.45, 0.5, 0.55))
+    assert detect(tracker, detectors, frame(200)) == ('full', 'lost')
+
+
+def test_roi_after_a_lost_frame_uses_the_new_full_detection():
+    tracker, detectors = FrameTracker(roi_margin=0.5), FakeDetectors()
+    detect(tracker, detectors, frame(100))
+    detectors.roi_landmarks.append(np.zeros((0, 4, 3), dtype=np.float32))
+    detectors.full_landmarks = face(0.1, 0.1, 0.3, 0.3)
+    assert detect(tracker, detectors, frame(200))[1] == 'lost'
+    detectors.roi_landmarks.append(face(0.12, 0.12, 0.32, 0.32))
+    assert detect(tracker, detectors, frame(50)) == ('roi', 'roi')
+    assert detectors.calls[-1] == ('roi', landmarks_box(face(0.1, 0.1, 0.3, 0.3), (HEIGHT, WIDTH), 0.5))
+
+
+def test_no_face_box_means_full_detection():
+    tracker = FrameTracker(roi_margin=0.5)
+    detectors = FakeDetectors(np.zeros((0, 4, 3), dtype=np.float32))
+    detect(tracker, detectors, frame(100))
+    assert detect(tracker, detectors, frame(200))[1] == 'full'
+
+
+def test_audit_compares_against_full_detection(monkeypatch):
+    monkeypatch.setattr(tracking.random, 'random', lambda: 0.0)
+    tracker, detectors = FrameTracker(roi_margin=0.5, audit_rate=0.5), FakeDetectors()
+    detect(tracker, detectors, frame(100))
+    assert detect(tracker, detectors, frame(101))[1] == 'reuse'
+    detectors.roi_landmarks.append(face(0.42, 0.42, 0.62, 0.62, count=2))
+    assert detect(tracker, detectors, frame(200))[1] == 'roi'
+    assert detectors.calls.count('full') == 3
+    stats = tracker.stats()
+    assert stats['audits'] == 2
+    # The ROI found two faces where the full detection found one
+    assert stats['agreement_rate'] == 0.5
+
+
+def test_full_and_lost_frames_are_not_audited(monkeypatch):
+    monkeypatch.setattr(tracking.random, 'random', lambda: 0.0)
+    tracker, detectors = FrameTracker(roi_margin=0.5, audit_rate=1.0), FakeDetectors()
+    detect(tracker, detectors, frame(100))
+    detectors.roi_landmarks.append(np.zeros((0, 4, 3), dtype=np.float32))
+    detect(tracker, detectors, frame(200))
+    assert tracker.stats()['audits'] == 0
+    assert tracker.stats()['agreement_rate'] is None
+
+
+def test_stats_count_frames_per_path():
+    tracker, detectors = FrameTracker(), FakeDetectors()
+    for value in (100, 100, 200):
+        detect(tracker, detectors, frame(value))
+    stats = tracker.stats()
+    assert stats['sessions'] == 1
+    assert stats['frames'] == 3
+    assert stats['paths']['full']['frames'] == 2
+    assert stats['paths']['reuse']['frames'] == 1
+    assert stats['paths']['reuse']['share'] == pytest.approx(1 / 3, abs=1e-4)
+
+
+def test_sessions_are_tracked_separately_and_discarded():
+    tracker, detectors = FrameTracker(), FakeDetectors()
+    detect(tracker, detectors, frame(), 'a')
+    assert detect(tracker, detectors, frame(), 'b')[1] == 'full'
+    tracker.discard('a')
+    assert detect(tracker, detectors, frame(), 'a')[1] == 'full'
+
+
+def test_roi_landmarks_map_back_to_the_frame():
+    mapped = roi_landmarks_to_frame(face(0.0, 0.0, 1.0, 1.0), (160, 120, 480, 360), (HEIGHT, WIDTH))
+    np.testing.assert_allclose(mapped[0, [0, 3], :2], [[0.25, 0.25], [0.75, 0.75]])
@@ -126,7 +126,8 @@ const InterviewPage = ({ uniqueLink, onInterviewComplete }) => {
     const [autoSubmitMessage, setAutoSubmitMessage] = useState('');
     const [terminated, setTerminated] = useState(false);
     const [warningCount, setWarningCount] = useState(0);
-    const [maxWarnings, setMaxWarnings] = useState(3);
+    // Reported by the proctoring service with every result; null until the first one
+    const [maxWarnings, setMaxWarnings] = useState(null);
     const [showWarning, setShowWarning] = useState(false);
     const [lastWarning, setLastWarning] = useState('');
     const [correctiveSeconds, setCorrectiveSeconds] = useState(null);
@@ -320,106 +321,245 @@ const InterviewPage = ({ uniqueLink, onInterviewComplete }) => {
     }, [sessionData]);
 
     useEffect(() => {
-        let interval;
-        if (mediaStream && videoRef.current && sessionData) {
-            interval = setInterval(async () => {
-                if (!videoRef.current || videoRef.current.paused || videoRef.current.ended) {
-                    return; // Don't proctor if video isn't playing
+        if (!(mediaStream && videoRef.current && sessionData)) return undefined;
+        let stopped = false;
+        let frameTimer = null;
+        let socket = null;
+        // The server paces streaming clients (slower when calm, faster inside a correction window)
+        let frameIntervalMs = 1500;
+        // Stream messages only carry what changed, so keep the last known state here
+        let streamState = { warning_count: 0, max_warnings: null, correction_window: null, terminated: false, termination_reason: null };
+        let windowReceivedAt = Date.now();
+        // When the server sheds a frame it says how long to back off
+        let retryAfterMs = 0;
+        // Frames are numbered so the server can drop ones that arrive after a newer frame
+        let frameSeq = 0;
+        // The server only sends the events after the ones held here (see applyEvents)
+        let eventLog = JSON.parse(localStorage.getItem(getSessionKey(sessionData._id, 'proctoringEventLog')) || '[]');
+        let fetchingEvents = false;
+
+        const storeEventLog = (events) => {
+            eventLog = events;
+            setProctoringEventLog(events);
+            localStorage.setItem(getSessionKey(sessionData._id, 'proctoringEventLog'), JSON.stringify(events));
+        };
+
+        const fetchEventHistory = async () => {
+            fetchingEvents = true;
+            try {
+                const events = [];
+                let cursor = 0;
+                while (cursor !== null) {
+                    const res = await fetch(`http://localhost:5001/session-events/${sessionData._id}?cursor=${cursor}`);
+                    if (!res.ok) return;
+                    const page = await res.json();
+                    events.push(...page.events);
+                    cursor = page.next_cursor;
                 }
-                const canvas = document.createElement('canvas');
-                canvas.width = videoRef.current.videoWidth;
-                canvas.height = videoRef.current.videoHeight;
-                const ctx = canvas.getContext('2d');
-                ctx.drawImage(videoRef.current, 0, 0, canvas.width, canvas.height);
-                const imageData = canvas.toDataURL('image/jpeg', 0.7);
-
-                try {
-                    const res = await fetch('http://localhost:5001/proctor', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({ image: imageData, session_id: sessionData._id }),
-                    });
-                    const result = await res.json();
-                    setWarningCount(result.warning_count);
-                    setMaxWarnings(result.max_warnings);
-                    
-                    // Log debug information
-                    if (result.debug_info) {
-                        console.log('🔍 Proctoring Debug Info:', result.debug_info);
-                    }
-                    
-                    if (result.terminated) {
-                        setTerminated(true);
-                        // Immediately clear correction window state on termination
-                        setInfractionType(null);
-                        setCorrectiveSeconds(null);
-                        if (correctionTimerRef.current) {
-                            clearInterval(correctionTimerRef.current);
-                            correctionTimerRef.current = null;
-                        }
-                    }
-                    if (result.warning) {
-                        setShowWarning(true);
-                        setLastWarning(result.warning);
-                        setTimeout(() => setShowWarning(false), 3000);
-                    }
+                storeEventLog(events);
+            } catch (err) {
+                // Keep the local log; the next gap triggers another attempt
+            } finally {
+                fetchingEvents = false;
+            }
+        };
 
-                    // Handle correction window state from backend
-                    const correctionWindow = result.correction_window;
-                    if (correctionWindow && correctionWindow.infraction) {
-                        // Only set correction window if there's an actual infraction
-                        setInfractionType(correctionWindow.infraction);
-                        setCorrectiveSeconds(correctionWindow.seconds_left);
-                        
-                        // Start local timer if not already running
-                        if (!correctionTimerRef.current) {
-                            correctionTimerRef.current = setInterval(() => {
-                                setCorrectiveSeconds(prev => {
-                                    if (prev === null || prev <= 0) {
-                                        clearInterval(correctionTimerRef.current);
-                                        correctionTimerRef.current = null;
-                                        return null;
-                                    }
-                                    return Math.max(0, prev - 0.05);
-                                });
-                            }, 50);
-                        }
-                    } else {
-                        // No correction window or cleared - reset all state
-                        setInfractionType(null);
-                        setCorrectiveSeconds(null);
-                        // Clear the local timer
-                        if (correctionTimerRef.current) {
-                            clearInterval(correctionTimerRef.current);
-                            correctionTimerRef.current = null;
-                        }
-                    }
-                    
-                    // Update history and logs
-                    setProctoringEventLog(result.proctoring_event_log || []);
-                    setTerminationReason(result.termination_reason || null);
-                    
-                    // Persist correction window state to localStorage
-                    const sessionId = sessionData._id;
-                    if (correctionWindow && correctionWindow.infraction) {
-                        localStorage.setItem(getSessionKey(sessionId, 'correctionWindow'), JSON.stringify({
-                            start: correctionWindow.start_time,
-                            duration: correctionWindow.duration,
-                            infraction: correctionWindow.infraction,
-                        }));
-                    } else {
-                        localStorage.removeItem(getSessionKey(sessionId, 'correctionWindow'));
-                    }
-                    
-                    localStorage.setItem(getSessionKey(sessionId, 'proctoringEventLog'), JSON.stringify(result.proctoring_event_log || []));
-                    if (result.termination_reason) localStorage.setItem(getSessionKey(sessionId, 'terminationReason'), result.termination_reason);
-                } catch (err) {
-                    setError('Camera or proctoring service failed to load. Please check your connection and refresh.');
+        const applyEvents = (eventsStart, events, cursor) => {
+            if (cursor < eventLog.length || eventsStart > eventLog.length) {
+                // The server's log restarted or some events were missed: reload the full history
+                if (!fetchingEvents) fetchEventHistory();
+                return;
+            }
+            // Responses can overlap when several frames were sent with the same cursor
+            const fresh = events.slice(eventLog.length - eventsStart);
+            if (fresh.length) storeEventLog([...eventLog, ...fresh]);
+        };
+
+        const captureFrame = () => {
+            if (!videoRef.current || videoRef.current.paused || videoRef.current.ended) {
+                return Promise.resolve(null); // Don't proctor if video isn't playing
+            }
+            const canvas = document.createElement('canvas');
+            canvas.width = videoRef.current.videoWidth;
+            canvas.height = videoRef.current.videoHeight;
+            const ctx = canvas.getContext('2d');
+            ctx.drawImage(videoRef.current, 0, 0, canvas.width, canvas.height);
+            // Send the JPEG as a raw binary body instead of a base64 data URL
+            return new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg', 0.7));
+        };
+
+        const handleProctorResult = (result) => {
+            setWarningCount(result.warning_count);
+            if (result.max_warnings != null) setMaxWarnings(result.max_warnings);
+            
+            // Log debug information
+            if (result.debug_info) {
+                console.log('🔍 Proctoring Debug Info:', result.debug_info);
+            }
+            
+            if (result.terminated) {
+                setTerminated(true);
+                // Immediately clear correction window state on termination
+                setInfractionType(null);
+                setCorrectiveSeconds(null);
+                if (correctionTimerRef.current) {
+                    clearInterval(correctionTimerRef.current);
+                    correctionTimerRef.current = null;
+                }
+            }
+            if (result.warning) {
+                setShowWarning(true);
+                setLastWarning(result.warning);
+                setTimeout(() => setShowWarning(false), 3000);
+            }
+
+            // Handle correction window state from backend
+            const correctionWindow = result.correction_window;
+            if (correctionWindow && correctionWindow.infraction) {
+                // Only set correction window if there's an actual infraction
+                setInfractionType(correctionWindow.infraction);
+                setCorrectiveSeconds(correctionWindow.seconds_left);
+                
+                // Start local timer if not already running
+                if (!correctionTimerRef.current) {
+                    correctionTimerRef.current = setInterval(() => {
+                        setCorrectiveSeconds(prev => {
+                            if (prev === null || prev <= 0) {
+                                clearInterval(correctionTimerRef.current);
+                                correctionTimerRef.current = null;
+                                return null;
+                            }
+                            return Math.max(0, prev - 0.05);
+                        });
+                    }, 50);
+                }
+            } else {
+                // No correction window or cleared - reset all state
+                setInfractionType(null);
+                setCorrectiveSeconds(null);
+                // Clear the local timer
+                if (correctionTimerRef.current) {
+                    clearInterval(correctionTimerRef.current);
+                    correctionTimerRef.current = null;
+                }
+            }
+            
+            // Update history and logs
+            if (result.proctoring_events) applyEvents(result.events_start, result.proctoring_events, result.event_cursor);
+            setTerminationReason(result.termination_reason || null);
+            
+            // Persist correction window state to localStorage
+            const sessionId = sessionData._id;
+            if (correctionWindow && correctionWindow.infraction) {
+                localStorage.setItem(getSessionKey(sessionId, 'correctionWindow'), JSON.stringify({
+                    start: correctionWindow.start_time,
+                    duration: correctionWindow.duration,
+                    infraction: correctionWindow.infraction,
+                }));
+            } else {
+                localStorage.removeItem(getSessionKey(sessionId, 'correctionWindow'));
+            }
+            
+            if (result.termination_reason) localStorage.setItem(getSessionKey(sessionId, 'terminationReason'), result.termination_reason);
+        };
+
+        const sendFrameOverHttp = async (imageBlob, seq, capturedAt) => {
+            try {
+                const res = await fetch(`http://localhost:5001/proctor/${sessionData._id}`, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'image/jpeg',
+                        'X-Frame-Seq': String(seq),
+                        'X-Captured-At': String(capturedAt),
+                        'X-Event-Cursor': String(eventLog.length),
+                    },
+                    body: imageBlob,
+                });
+                if (res.status === 503 || res.status === 429) {
+                    retryAfterMs = (parseInt(res.headers.get('Retry-After'), 10) || 1) * 1000;
+                    return;
                 }
-            }, 1500); // Increased interval from 100ms to 1500ms
+                handleProctorResult(await res.json());
+            } catch (err) {
+                setError('Camera or proctoring service failed to load. Please check your connection and refresh.');
+            }
+        };
+
+        const sendFrame = async () => {
+            const capturedAt = Date.now();
+            const imageBlob = await captureFrame();
+            if (!imageBlob || stopped) return;
+            frameSeq += 1;
+            if (socket && socket.readyState === WebSocket.OPEN) {
+                // Skip this frame if the previous one is still being sent
+                if (socket.bufferedAmount === 0) {
+                    socket.send(JSON.stringify({ seq: frameSeq, captured_at: capturedAt }));
+                    socket.send(imageBlob);
+                }
+            } else {
+                await sendFrameOverHttp(imageBlob, frameSeq, capturedAt);
+            }
+        };
+
+        let sending = false;
+        const scheduleNextFrame = () => {
+            clearTimeout(frameTimer);
+            if (stopped || frameIntervalMs <= 0) return;
+            const delayMs = Math.max(frameIntervalMs, retryAfterMs);
+            retryAfterMs = 0;
+            frameTimer = setTimeout(async () => {
+                sending = true;
+                await sendFrame();
+                sending = false;
+                scheduleNextFrame();
+            }, delayMs);
+        };
+
+        // Prefer the streaming channel; if it fails to open or drops, frames go over HTTP
+        try {
+            socket = new WebSocket(`ws://localhost:5001/proctor-stream/${sessionData._id}`);
+            socket.onopen = () => {
+                // From here on the server pushes new events as they are logged
+                socket.send(JSON.stringify({ event_cursor: eventLog.length }));
+            };
+            socket.onmessage = (message) => {
+                const { event, warning, interval_ms: intervalMs, retry_after_ms: backoffMs, ...changes } = JSON.parse(message.data);
+                if (event === 'events') {
+                    applyEvents(changes.events_start, changes.events, changes.event_cursor);
+                    return;
+                }
+                if (event === 'busy') {
+                    // Frame was shed; wait before sending the next one
+                    retryAfterMs = backoffMs || 1000;
+                    if (!sending) scheduleNextFrame();
+                    return;
+                }
+                if (intervalMs !== undefined && intervalMs !== frameIntervalMs) {
+                    frameIntervalMs = intervalMs;
+                    // A frame in flight reschedules itself with the new interval when it finishes
+                    if (!sending) scheduleNextFrame();
+                }
+                if (event === 'pace' || event === 'error') return;
+                if ('correction_window' in changes) windowReceivedAt = Date.now();
+                streamState = { ...streamState, ...changes };
+                const correctionWindow = streamState.correction_window && {
+                    ...streamState.correction_window,
+                    seconds_left: Math.max(0, streamState.correction_window.seconds_left - (Date.now() - windowReceivedAt) / 1000),
+                };
+                handleProctorResult({ ...streamState, correction_window: correctionWindow, warning: warning || null });
+            };
+            socket.onclose = () => {
+                socket = null;
+            };
+        } catch (err) {
+            socket = null;
         }
+        scheduleNextFrame();
+
         return () => {
-            if (interval) clearInterval(interval);
+            stopped = true;
+            clearTimeout(frameTimer);
+            if (socket) socket.close();
         };
     }, [mediaStream, sessionData, videoHasPlayed]);
 
@@ -656,7 +796,7 @@ const InterviewPage = ({ uniqueLink, onInterviewComplete }) => {
             </Box>
             <Snackbar open={showWarning} anchorOrigin={{ vertical: 'top', horizontal: 'center' }} autoHideDuration={3000} onClose={() => setShowWarning(false)}>
                 <Alert severity="warning" sx={{ background: '#2d1a1a', color: '#FFE066', fontWeight: 700, fontSize: '1.1rem', border: '2px solid #FFE066', letterSpacing: 1 }}>
-                    {lastWarning} (Warning {warningCount} of {maxWarnings})
+                    {lastWarning} (Warning {warningCount}{maxWarnings != null && ` of ${maxWarnings}`})
                 </Alert>
             </Snackbar>
         </Box>
@@ -3,11 +3,15 @@ import { Box, Typography, Paper, Button, Alert, CircularProgress } from '@mui/ma
 import CheckCircleIcon from '@mui/icons-material/CheckCircle';
 import CancelIcon from '@mui/icons-material/Cancel';
 
+// Identifies this page load to the server, which reuses its last answer while the camera image stays the same
+const preflightClientId = Math.random().toString(36).slice(2);
+
 // Simple API client for this page
 const apiClient = {
     analyzeFrame: async (imageBlob) => {
         const formData = new FormData();
         formData.append('frame', imageBlob, 'frame.jpg');
+        formData.append('client_id', preflightClientId);
         
         // This endpoint will need to be created in your Flask proctoring API
         const response = await fetch('http://localhost:5001/analyze_frame', {